@@ -0,0 +1,388 @@
+"""
+Cache jawaban (exact + semantic) di depan generasi LLM
+
+Lookup berurutan:
+    1. exact    : teks pertanyaan yang dinormalisasi (lowercase, tanda baca & spasi dirapikan)
+    2. semantic : nearest neighbour cosine atas embedding pertanyaan yang sudah di-cache,
+                  hanya dipakai jika skor >= threshold dan angka / gelombang / bulan / bank
+                  yang disebut kedua pertanyaan sama (consistency.question_entities);
+                  selain itu diteruskan ke generate
+
+Entry berasal dari dataset (question + variations di variants/*.json, tanpa TTL) atau
+dari jawaban model (dengan TTL). Kapasitas dibatasi LRU. Jika file dataset berubah,
+entry dataset yang jawabannya berubah/hilang di-invalidate.
+
+Usage:
+    python answer_cache.py "berapa biaya pendaftaran?"
+    python answer_cache.py --semantic-model sentence-transformers/paraphrase-multilingual-mpnet-base-v2 "..."
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from consistency import question_entities
+from convert_all import load_variant_file, unique_files
+from embedding_cache import EmbeddingCache, normalize_text
+
+VARIANTS_PATTERN = "variants/variations_q*.json"
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL_SECONDS = 6 * 3600
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+
+SOURCE_DATASET = "dataset"
+SOURCE_GENERATED = "generated"
+
+
+def normalize_question(text: str) -> str:
+    """Key exact: lowercase, tanda baca dibuang, spasi dirapikan"""
+    text = normalize_text(text).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def answer_hash(answer: str) -> str:
+    return hashlib.sha1(normalize_text(answer).encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# 📖 Sumber dataset
+# ============================================================
+
+def iter_faq_pairs(paths: List[str]) -> Iterator[Tuple[str, str]]:
+    """(pertanyaan, jawaban) untuk pertanyaan dasar dan setiap variasinya"""
+    for path in paths:
+        for item in load_variant_file(path):
+            answer = item.get("answer", "").strip()
+            if not answer:
+                continue
+            if item.get("question"):
+                yield item["question"], answer
+            for variation in item.get("variations", []):
+                # variations_q*_styled: {"style", "question"}; file lama: string biasa
+                question = variation.get("question") if isinstance(variation, dict) else variation
+                if question:
+                    yield question, answer
+
+
+class DatasetSource:
+    """Daftar file dataset + deteksi perubahan murah (mtime_ns, size)"""
+
+    def __init__(self, pattern: str = VARIANTS_PATTERN):
+        self.pattern = pattern
+        self._signature = None
+
+    def paths(self) -> List[str]:
+        return sorted(glob.glob(self.pattern))
+
+    def signature(self) -> Tuple:
+        result = []
+        for path in self.paths():
+            st = os.stat(path)
+            result.append((path, st.st_mtime_ns, st.st_size))
+        return tuple(result)
+
+    def changed(self) -> bool:
+        return self.signature() != self._signature
+
+    def load(self) -> List[Tuple[str, str]]:
+        self._signature = self.signature()
+        return list(iter_faq_pairs(unique_files(self.paths())))
+
+
+# ============================================================
+# 🗃️ Cache
+# ============================================================
+
+class _Entry:
+    __slots__ = ("question", "answer", "answer_hash", "source", "expires_at", "vector")
+
+    def __init__(self, question, answer, source, expires_at, vector):
+        self.question = question
+        self.answer = answer
+        self.answer_hash = answer_hash(answer)
+        self.source = source
+        self.expires_at = expires_at
+        self.vector = vector
+
+
+class AnswerCache:
+    """
+    Cache jawaban thread-safe dengan LRU (OrderedDict) + TTL
+
+    embed_fn: fungsi list[str] -> np.ndarray (n, dim); None = hanya exact lookup
+    """
+
+    def __init__(self, embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.lock = threading.RLock()
+        self.counters = {
+            "exact_hits": 0, "semantic_hits": 0, "semantic_rejected": 0, "misses": 0,
+            "evictions": 0, "expirations": 0, "invalidations": 0,
+        }
+        # matriks embedding ter-normalisasi, dibangun ulang lazily setelah ada perubahan
+        self._keys: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._dirty = True
+
+    # ------------------------------------------------------------------
+    # Embedding
+    # ------------------------------------------------------------------
+    def _embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        if self.embed_fn is None or not texts:
+            return None
+        vectors = np.asarray(self.embed_fn(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _semantic_index(self) -> Tuple[List[str], Optional[np.ndarray]]:
+        if self._dirty:
+            self._keys = [k for k, e in self.entries.items() if e.vector is not None]
+            self._matrix = np.stack([self.entries[k].vector for k in self._keys]) if self._keys else None
+            self._dirty = False
+        return self._keys, self._matrix
+
+    # ------------------------------------------------------------------
+    # Put / remove
+    # ------------------------------------------------------------------
+    def _put(self, key: str, entry: _Entry) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self._dirty = True
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        if self.entries.pop(key, None) is not None:
+            self._dirty = True
+
+    def put(self, question: str, answer: str, source: str = SOURCE_GENERATED) -> None:
+        """Simpan satu jawaban; entry hasil generasi kedaluwarsa setelah ttl_seconds"""
+        self.put_many([(question, answer)], source)
+
+    def put_many(self, pairs: List[Tuple[str, str]], source: str = SOURCE_GENERATED) -> int:
+        pairs = [(q, a) for q, a in pairs if normalize_question(q)]
+        vectors = self._embed([q for q, _ in pairs])
+        expires_at = None if source == SOURCE_DATASET else time.time() + self.ttl_seconds
+        with self.lock:
+            for i, (question, answer) in enumerate(pairs):
+                vector = vectors[i] if vectors is not None else None
+                self._put(normalize_question(question), _Entry(question, answer, source, expires_at, vector))
+        return len(pairs)
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def _alive(self, key: str, entry: _Entry, now: float) -> bool:
+        if entry.expires_at is not None and entry.expires_at < now:
+            self._remove(key)
+            self.counters["expirations"] += 1
+            return False
+        return True
+
+    def get(self, question: str) -> Optional[Dict]:
+        """
+        Return {"answer", "match", "score", "cached_question"} atau None jika miss
+        """
+        key = normalize_question(question)
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self._alive(key, entry, now):
+                self.entries.move_to_end(key)
+                self.counters["exact_hits"] += 1
+                return {"answer": entry.answer, "match": "exact", "score": 1.0, "cached_question": entry.question}
+            has_index = self.embed_fn is not None and bool(self.entries)
+
+        if has_index:
+            entities = question_entities(question)
+            query = self._embed([question])[0]
+            with self.lock:
+                keys, matrix = self._semantic_index()
+                if matrix is not None:
+                    scores = matrix @ query
+                    for best in np.argsort(-scores)[:4]:
+                        score = float(scores[best])
+                        if score < self.similarity_threshold:
+                            break
+                        best_key = keys[best]
+                        entry = self.entries.get(best_key)
+                        if entry is None or not self._alive(best_key, entry, now):
+                            continue
+                        if question_entities(entry.question) != entities:
+                            # mis. "Gelombang 1" vs "Gelombang 2": mirip secara embedding, jawaban beda
+                            self.counters["semantic_rejected"] += 1
+                            continue
+                        self.entries.move_to_end(best_key)
+                        self.counters["semantic_hits"] += 1
+                        return {"answer": entry.answer, "match": "semantic", "score": round(score, 4),
+                                "cached_question": entry.question}
+
+        with self.lock:
+            self.counters["misses"] += 1
+        return None
+
+    # ------------------------------------------------------------------
+    # Sinkronisasi dataset
+    # ------------------------------------------------------------------
+    def sync_dataset(self, pairs: List[Tuple[str, str]]) -> Dict[str, int]:
+        """
+        Samakan entry dataset dengan isi dataset terbaru:
+        entry yang jawabannya berubah / pertanyaannya hilang di-invalidate,
+        entry baru/berubah dimasukkan (embedding hanya dihitung untuk yang baru)
+        """
+        latest: Dict[str, Tuple[str, str]] = {}
+        for question, answer in pairs:
+            key = normalize_question(question)
+            if key:
+                latest[key] = (question, answer)
+
+        with self.lock:
+            invalidated = 0
+            for key, entry in list(self.entries.items()):
+                if key in latest:
+                    # jawaban generated untuk pertanyaan dataset diganti jawaban dataset
+                    if entry.source == SOURCE_DATASET and entry.answer_hash == answer_hash(latest[key][1]):
+                        del latest[key]
+                        continue
+                    self._remove(key)
+                    invalidated += 1
+                elif entry.source == SOURCE_DATASET:
+                    self._remove(key)
+                    invalidated += 1
+            self.counters["invalidations"] += invalidated
+
+        added = self.put_many(list(latest.values()), SOURCE_DATASET)
+        return {"invalidated": invalidated, "added": added}
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self.lock:
+            expired = [k for k, e in self.entries.items() if e.expires_at is not None and e.expires_at < now]
+            for key in expired:
+                self._remove(key)
+            self.counters["expirations"] += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            hits = self.counters["exact_hits"] + self.counters["semantic_hits"]
+            lookups = hits + self.counters["misses"]
+            by_source = {SOURCE_DATASET: 0, SOURCE_GENERATED: 0}
+            for entry in self.entries.values():
+                by_source[entry.source] += 1
+            return dict(
+                self.counters,
+                entries=len(self.entries),
+                dataset_entries=by_source[SOURCE_DATASET],
+                generated_entries=by_source[SOURCE_GENERATED],
+                lookups=lookups,
+                hit_rate=round(hits / lookups, 4) if lookups else 0.0,
+            )
+
+
+class DatasetAnswerCache(AnswerCache):
+    """AnswerCache yang di-seed dari variants/*.json dan otomatis sync jika file berubah"""
+
+    def __init__(self, source: DatasetSource = None, check_interval_s: float = 5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.source = source or DatasetSource()
+        self.check_interval_s = check_interval_s
+        self._last_check = 0.0
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> Optional[Dict[str, int]]:
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval_s:
+            return None
+        self._last_check = now
+        if not force and not self.source.changed():
+            return None
+        result = self.sync_dataset(self.source.load())
+        if not force and result["invalidated"]:
+            print(f"🔄 Dataset berubah: {result['invalidated']} entry cache di-invalidate")
+        return result
+
+    def get(self, question: str) -> Optional[Dict]:
+        self.refresh()
+        return super().get(question)
+
+
+def make_embed_fn(model_name: str, cache_dir: str = None) -> Callable[[List[str]], np.ndarray]:
+    """
+    embed_fn berbasis sentence-transformers; embedding pertanyaan dataset disimpan di
+    EmbeddingCache (persisten), query baru di-encode langsung
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+    disk_cache = EmbeddingCache(model_name, cache_dir) if cache_dir else EmbeddingCache(model_name)
+
+    def embed(texts: List[str]) -> np.ndarray:
+        if len(texts) == 1:
+            return model.encode(texts, convert_to_numpy=True)
+        return disk_cache.encode(texts, model, batch_size=32, show_progress_bar=False)
+
+    return embed
+
+
+def add_cache_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--variants", default=VARIANTS_PATTERN, help="Glob file variasi untuk seed cache")
+    parser.add_argument("--semantic-model", help="Model sentence-transformers untuk lookup semantic")
+    parser.add_argument("--similarity-threshold", type=float, default=DEFAULT_SIMILARITY_THRESHOLD)
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL_SECONDS, help="TTL jawaban generated (detik)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES)
+
+
+def build_cache(args) -> DatasetAnswerCache:
+    embed_fn = make_embed_fn(args.semantic_model) if args.semantic_model else None
+    return DatasetAnswerCache(
+        source=DatasetSource(args.variants),
+        embed_fn=embed_fn,
+        max_entries=args.cache_size,
+        ttl_seconds=args.cache_ttl,
+        similarity_threshold=args.similarity_threshold,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cek lookup cache jawaban PMB")
+    add_cache_args(parser)
+    parser.add_argument("questions", nargs="+")
+    args = parser.parse_args()
+
+    cache = build_cache(args)
+    print(f"📦 {cache.stats()['entries']} entry dataset dari {args.variants}")
+    for question in args.questions:
+        started = time.perf_counter()
+        hit = cache.get(question)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"\n❓ {question}  ({elapsed_ms:.2f} ms)")
+        if hit is None:
+            print("   ✗ miss")
+        else:
+            print(f"   ✓ {hit['match']} ({hit['score']}) <- {hit['cached_question']}")
+            print(f"   {hit['answer'][:200]}")
+    print(f"\n📊 {json.dumps(cache.stats())}")
+
+
+if __name__ == "__main__":
+    main()
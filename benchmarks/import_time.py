@@ -0,0 +1,142 @@
+"""
+Benchmark & guard cold-start: waktu import modul/CLI ringan dan modul berat yang ikut ter-load
+
+Setiap target dijalankan di interpreter baru (cold), diulang --repeat kali, diambil median.
+Gagal (exit 1) jika:
+    - modul berat (torch, sentence_transformers, transformers, ...) ikut ter-import, atau
+    - median waktu melebihi budget target (dikali --budget-scale untuk mesin lambat)
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 10 --json run_reports/import_time.json
+    python benchmarks/import_time.py --budget-scale 2     # CI / laptop lambat
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "tokenizers", "sklearn", "scipy", "pandas")
+
+# (nama, kode yang dijalankan, budget ms) — budget termasuk startup interpreter (~20-40 ms)
+IMPORT_TARGETS = [
+    ("import similarity", "import similarity", 400),
+    ("import embedding_backend", "import embedding_backend", 300),
+    ("import convert", "import convert", 250),
+    ("import convert_all", "import convert_all", 250),
+    ("import p", "import p", 250),
+    ("import gemma_format", "import gemma_format", 200),
+    ("import qa_parser", "import qa_parser", 150),
+    ("import profiling", "import profiling", 150),
+    ("import eval_runner", "import eval_runner", 400),
+    ("import answer_cache", "import answer_cache", 400),
+]
+
+# CLI yang seharusnya tidak pernah menyentuh model
+CLI_TARGETS = [
+    ("similarity.py parse", ["similarity.py", "parse", "dataset_v3.txt", "--run-report", "/dev/null"], 500),
+    ("similarity.py --help", ["similarity.py", "--help"], 400),
+    ("convert_all.py --help", ["convert_all.py", "--help"], 300),
+]
+
+PROBE = """
+import sys, time
+t = time.perf_counter()
+{code}
+elapsed = (time.perf_counter() - t) * 1000
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+print("__PROBE__", elapsed, ",".join(heavy))
+"""
+
+
+def run_import(code: str):
+    """Return (wall ms proses, ms import saja, modul berat yang ter-load)"""
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    wall = (time.perf_counter() - started) * 1000
+    line = next(l for l in out.splitlines() if l.startswith("__PROBE__"))
+    _, import_ms, heavy = line.split(" ", 2)
+    return wall, float(import_ms), [m for m in heavy.split(",") if m]
+
+
+def run_cli(argv):
+    """Return (wall ms proses, modul berat yang ter-load) untuk satu perintah CLI"""
+    # modul berat dideteksi dengan mengecek sys.modules saat interpreter selesai
+    code = (
+        "import atexit, runpy, sys\n"
+        f"sys.argv = {argv!r}\n"
+        f"atexit.register(lambda: print('__HEAVY__', ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules)))\n"
+        f"runpy.run_path({argv[0]!r}, run_name='__main__')\n"
+    )
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    wall = (time.perf_counter() - started) * 1000
+    if proc.returncode not in (0,) and "__HEAVY__" not in proc.stdout:
+        raise RuntimeError(f"{' '.join(argv)} gagal:\n{proc.stderr[-2000:]}")
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("__HEAVY__")), "__HEAVY__ ")
+    heavy = line.split(" ", 1)[1].strip()
+    return wall, [m for m in heavy.split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waktu import / startup CLI")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="Pengali budget (mesin lambat)")
+    parser.add_argument("--json", help="Simpan hasil ke file JSON")
+    args = parser.parse_args()
+
+    baseline = statistics.median(run_import("pass")[0] for _ in range(args.repeat))
+    print(f"🐍 Startup interpreter kosong: {baseline:.0f} ms (median {args.repeat}x)\n")
+    print(f"{'target':28s} {'wall ms':>8s} {'import ms':>10s} {'budget':>7s}  status")
+
+    results, failures = [], []
+    for name, code, budget in IMPORT_TARGETS:
+        runs = [run_import(code) for _ in range(args.repeat)]
+        wall = statistics.median(r[0] for r in runs)
+        import_ms = statistics.median(r[1] for r in runs)
+        heavy = sorted(set(m for r in runs for m in r[2]))
+        results.append({"target": name, "wall_ms": round(wall, 1), "import_ms": round(import_ms, 1),
+                        "budget_ms": budget, "heavy_modules": heavy})
+
+    for name, argv, budget in CLI_TARGETS:
+        runs = [run_cli(argv) for _ in range(args.repeat)]
+        wall = statistics.median(r[0] for r in runs)
+        heavy = sorted(set(m for r in runs for m in r[1]))
+        results.append({"target": name, "wall_ms": round(wall, 1), "import_ms": None,
+                        "budget_ms": budget, "heavy_modules": heavy})
+
+    for result in results:
+        budget = result["budget_ms"] * args.budget_scale
+        problems = []
+        if result["heavy_modules"]:
+            problems.append("modul berat: " + ", ".join(result["heavy_modules"]))
+        if result["wall_ms"] > budget:
+            problems.append(f"melebihi budget {budget:.0f} ms")
+        status = "✅" if not problems else "❌ " + "; ".join(problems)
+        if problems:
+            failures.append(result["target"])
+        import_ms = f"{result['import_ms']:.1f}" if result["import_ms"] is not None else "-"
+        print(f"{result['target']:28s} {result['wall_ms']:8.0f} {import_ms:>10s} {budget:7.0f}  {status}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"baseline_ms": round(baseline, 1), "results": results}, f, ensure_ascii=False, indent=2)
+
+    if failures:
+        print(f"\n❌ {len(failures)} target gagal: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n✅ Semua target dalam budget, tanpa import modul berat")
+
+
+if __name__ == "__main__":
+    main()
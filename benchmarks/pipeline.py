@@ -0,0 +1,373 @@
+"""
+Benchmark pipeline data pada korpus sintetis mirip PMB (10k / 100k / 1M record)
+
+Korpus dibangkitkan deterministik (seed tetap) untuk tiap format input yang didukung:
+    txt       : Q:/A: teks (dataset_v*.txt, data/data_group_N.txt), termasuk jawaban multi-baris
+    messages  : JSONL {"messages": [user, model], "metadata": {topic, subtopic}} (dataset.json / p.py)
+    variants  : variations_qN_styled.json {question, answer, variations: [{style, question}]}
+
+Stage yang diukur per format:
+    txt       : parse (similarity.parse_qa_pairs) -> format (convert.format_clean_gemma)
+                -> embed + score (similarity.calculate_similarity_stats, embedder stub)
+    messages  : parse + format (p.iter_formatted) -> write JSONL
+    variants  : convert (convert_all, ekspansi variasi) -> write JSONL
+
+Embedder stub = retrieval.HashingEmbedder (char n-gram hashing, tanpa model/jaringan).
+Setiap kasus (format, ukuran) jalan di proses terpisah agar peak RSS tidak tercampur.
+Hasil dibandingkan dengan baseline tersimpan: waktu/peak RSS yang naik lebih dari --tolerance
+dan digest output yang berubah dilaporkan sebagai regresi.
+
+Usage:
+    python benchmarks/pipeline.py                               # 10k & 100k, semua format
+    python benchmarks/pipeline.py --sizes 10k 100k 1m --formats txt variants
+    python benchmarks/pipeline.py --save-baseline               # simpan hasil sebagai baseline
+    python benchmarks/pipeline.py --strict --tolerance 0.2      # exit 1 jika ada regresi
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DATA_DIR = ROOT / ".bench_data"
+BASELINE_FILE = Path(__file__).resolve().parent / "pipeline_baseline.json"
+REPORT_FILE = ROOT / "run_reports" / "bench_pipeline.json"
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+FORMATS = ("txt", "messages", "variants")
+DEFAULT_SIZES = ("10k", "100k")
+SEED = 2025
+# Naikkan jika generator berubah, agar korpus lama di .bench_data dibangkitkan ulang
+GENERATOR_VERSION = 1
+VARIATIONS_PER_ITEM = 10
+ITEMS_PER_VARIANT_FILE = 100
+TOLERANCE = 0.25
+
+# ============================================================
+# 🧪 Generator korpus sintetis
+# ============================================================
+
+PRODI = ["Teknik Informatika", "Manajemen", "Pendidikan Agama Islam", "Ilmu Al-Qur'an dan Tafsir",
+         "Hukum Keluarga Islam", "Akuntansi", "Teknik Sipil", "Arsitektur", "Keperawatan", "Ilmu Komunikasi",
+         "Pendidikan Bahasa Inggris", "Ekonomi Syariah", "Teknik Mesin", "Kebidanan", "Sistem Informasi"]
+BANKS = ["BSI", "BRI", "BNI", "Mandiri", "Bank Jateng"]
+MONTHS = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli", "Agustus", "September",
+          "Oktober", "November", "Desember"]
+STYLES = ["formal", "santai", "singkat", "panjang", "typo", "bahasa_daerah"]
+
+TEMPLATES = [
+    ("pendaftaran", "jadwal",
+     ["Kapan pendaftaran Gelombang {gel} PMB UNSIQ {year} dibuka?",
+      "Sampai kapan batas akhir pendaftaran gelombang {gel} di UNSIQ?",
+      "Periode daftar gelombang {gel} untuk prodi {prodi} kapan ya?"],
+     "Pendaftaran Gelombang {gel} PMB UNSIQ {year} dibuka mulai {d1} {m1} hingga {d2} {m2} {year}. "
+     "Calon mahasiswa prodi {prodi} disarankan mendaftar lebih awal karena kuota terbatas."),
+    ("biaya", "angsuran",
+     ["Berapa biaya angsuran pertama untuk mahasiswa baru {prodi}?",
+      "Apakah ada biaya daftar ulang di UNSIQ {year}?",
+      "Berapa yang harus dibayar agar NIM aktif?"],
+     "Mahasiswa baru wajib membayar angsuran pertama sebesar Rp {fee} paling lambat {d1} {m1} {year} "
+     "melalui virtual account {bank}. Setelah pembayaran terverifikasi, NIM akan aktif otomatis."),
+    ("biaya", "ukt",
+     ["Berapa UKT per semester untuk prodi {prodi}?",
+      "Biaya kuliah {prodi} UNSIQ per semester berapa?"],
+     "Biaya kuliah prodi {prodi} sebesar Rp {fee} per semester, dapat diangsur sesuai ketentuan:\n"
+     "- angsuran pertama saat registrasi\n- angsuran kedua sebelum UTS\n- pelunasan sebelum UAS"),
+    ("pembayaran", "bank",
+     ["Lewat bank apa saja pembayaran PMB UNSIQ?", "Apakah bisa bayar lewat {bank}?"],
+     "Pembayaran dapat dilakukan melalui virtual account {bank}, BRI, BNI, atau gerai Alfamart. "
+     "Simpan bukti pembayaran dan unggah ke akun PMB."),
+    ("seleksi", "pengumuman",
+     ["Kapan pengumuman hasil seleksi gelombang {gel}?", "Hasil tes gelombang {gel} keluar tanggal berapa?"],
+     "Hasil seleksi Gelombang {gel} diumumkan pada {d1} {m1} {year} melalui portal pmb.unsiq.ac.id "
+     "dan akun masing-masing peserta."),
+    ("prodi", "akreditasi",
+     ["Apa akreditasi prodi {prodi} di UNSIQ?", "Prodi {prodi} terakreditasi apa?"],
+     "Program studi {prodi} telah terakreditasi {akreditasi} oleh BAN-PT dan terus meningkatkan mutu "
+     "pembelajaran, penelitian, serta pengabdian masyarakat."),
+]
+
+
+def _fill(rng: random.Random, template: str) -> str:
+    return template.format(
+        gel=rng.randint(1, 3), year=rng.choice([2024, 2025, 2026]), prodi=rng.choice(PRODI),
+        d1=rng.randint(1, 28), d2=rng.randint(1, 28), m1=rng.choice(MONTHS), m2=rng.choice(MONTHS),
+        fee=f"{rng.randrange(150, 6000, 5) * 1000:,}".replace(",", "."), bank=rng.choice(BANKS),
+        akreditasi=rng.choice(["Unggul", "Baik Sekali", "Baik", "A", "B"]),
+    )
+
+
+def iter_synthetic(n: int, seed: int = SEED):
+    """n tuple (topic, subtopic, question, answer) yang deterministik"""
+    rng = random.Random(seed)
+    for i in range(n):
+        topic, subtopic, questions, answer = rng.choice(TEMPLATES)
+        question = _fill(rng, rng.choice(questions))
+        # variasi panjang jawaban: sebagian dipendekkan, sebagian ditambah kalimat penutup
+        text = _fill(rng, answer)
+        roll = rng.random()
+        if roll < 0.2:
+            text = text.split(". ")[0] + "."
+        elif roll > 0.85:
+            text += " Informasi lengkap dapat dilihat di pmb.unsiq.ac.id atau hubungi panitia PMB."
+        yield topic, subtopic, question, text
+
+
+def write_txt(path: Path, n: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for _, _, question, answer in iter_synthetic(n):
+            f.write(f"Q: {question}\nA: {answer}\n\n")
+
+
+def write_messages(path: Path, n: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for topic, subtopic, question, answer in iter_synthetic(n):
+            f.write(json.dumps({
+                "messages": [{"role": "user", "content": question}, {"role": "model", "content": answer}],
+                "metadata": {"topic": topic, "subtopic": subtopic},
+            }, ensure_ascii=False) + "\n")
+
+
+def write_variants(directory: Path, n: int) -> None:
+    """n record setelah ekspansi: tiap item = 1 pertanyaan dasar + VARIATIONS_PER_ITEM variasi"""
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(SEED + 1)
+    per_item = VARIATIONS_PER_ITEM + 1
+    items = []
+    file_no = 0
+
+    def flush():
+        nonlocal items, file_no
+        if items:
+            file_no += 1
+            with open(directory / f"variations_q{file_no}_styled.json", "w", encoding="utf-8") as f:
+                json.dump(items, f, ensure_ascii=False, indent=2)
+            items = []
+
+    synthetic = iter_synthetic((n + per_item - 1) // per_item)
+    for _, _, question, answer in synthetic:
+        items.append({
+            "question": question,
+            "answer": answer,
+            "variations": [{"style": rng.choice(STYLES), "question": _vary(rng, question)}
+                           for _ in range(VARIATIONS_PER_ITEM)],
+        })
+        if len(items) >= ITEMS_PER_VARIANT_FILE:
+            flush()
+    flush()
+
+
+def _vary(rng: random.Random, question: str) -> str:
+    prefix = rng.choice(["", "Min, ", "Kak, ", "Permisi, ", "Mau tanya, ", "Halo admin, "])
+    suffix = rng.choice(["", " ya?", " kak?", " dong", " sekarang?", " tahun ini?"])
+    body = question.rstrip("?")
+    if rng.random() < 0.3:
+        body = body.lower()
+    return f"{prefix}{body}{suffix}".strip()
+
+
+def corpus_path(fmt: str, size: str) -> Path:
+    suffix = {"txt": ".txt", "messages": ".jsonl", "variants": ""}[fmt]
+    return DATA_DIR / f"v{GENERATOR_VERSION}_{fmt}_{size}{suffix}"
+
+
+def ensure_corpus(fmt: str, size: str) -> Path:
+    path = corpus_path(fmt, size)
+    if path.exists():
+        return path
+    DATA_DIR.mkdir(exist_ok=True)
+    n = SIZES[size]
+    print(f"  🧪 Membangkitkan korpus {fmt} {size} -> {path.relative_to(ROOT)}")
+    tmp = path.with_name(path.name + ".tmp")
+    {"txt": write_txt, "messages": write_messages, "variants": write_variants}[fmt](tmp, n)
+    os.replace(tmp, path)
+    return path
+
+
+# ============================================================
+# ⏱️ Satu kasus (dijalankan di proses terpisah)
+# ============================================================
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def run_case(fmt: str, corpus: str, report_path: str, use_tracemalloc: bool) -> None:
+    from profiling import RunProfiler
+    from retrieval import HashingEmbedder
+
+    profiler = RunProfiler(f"bench_{fmt}", report_path=report_path, use_tracemalloc=use_tracemalloc)
+    with tempfile.TemporaryDirectory() as tmp, profiler:
+        output = os.path.join(tmp, "output.jsonl")
+        if fmt == "txt":
+            from convert import format_clean_gemma
+            from similarity import calculate_similarity_stats, parse_qa_pairs
+
+            with profiler.stage("parse") as stage:
+                pairs = parse_qa_pairs(corpus)
+                stage.add(len(pairs))
+            with profiler.stage("format", records=len(pairs)):
+                formatted, skipped = format_clean_gemma([{"Q": q, "A": a} for q, a, _ in pairs])
+            results = calculate_similarity_stats(pairs, HashingEmbedder(), None, profiler)
+            digest = hashlib.sha1("\n".join(r["text"] for r in formatted).encode("utf-8")).hexdigest()[:16]
+            profiler.set(records=len(pairs), skipped=skipped, passed=results["pairs_passed"],
+                         avg_similarity=round(results["avg_similarity"], 6), digest=digest)
+
+        elif fmt == "messages":
+            from jsonl_io import JsonlWriter, iter_batches, iter_records
+            from p import iter_formatted
+
+            with JsonlWriter(output) as sink:
+                batches = iter_batches(iter_formatted(iter_records(corpus)))
+                for batch in profiler.iter("parse_format", batches, len):
+                    with profiler.stage("write", records=len(batch)):
+                        sink.write_all(batch)
+            profiler.set(records=sink.count, digest=file_digest(output))
+
+        else:
+            from convert_all import build_full
+
+            paths = sorted(glob.glob(os.path.join(corpus, "variations_q*_styled.json")),
+                           key=lambda p: int(Path(p).stem.split("_")[1][1:]))
+            total = build_full(paths, output, profiler=profiler)
+            profiler.set(records=total, files=len(paths), digest=file_digest(output))
+
+
+# ============================================================
+# 📊 Orkestrasi & perbandingan baseline
+# ============================================================
+
+def run_suite(formats, sizes, use_tracemalloc: bool):
+    results = {}
+    for size in sizes:
+        for fmt in formats:
+            corpus = ensure_corpus(fmt, size)
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+                report_path = f.name
+            command = [sys.executable, __file__, "_case", fmt, str(corpus), report_path]
+            if use_tracemalloc:
+                command.append("--tracemalloc")
+            print(f"  ⏱️  {fmt} {size} ...", flush=True)
+            subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+            with open(report_path, "r", encoding="utf-8") as f:
+                report = json.load(f)
+            os.unlink(report_path)
+            results[f"{fmt}/{size}"] = {
+                "wall_s": report["wall_s"],
+                "peak_rss_mb": report["peak_rss_mb"],
+                "py_peak_mb": report.get("py_peak_mb"),
+                "stages": {s["name"]: {"seconds": s["seconds"], "records_per_s": s["records_per_s"]}
+                           for s in report["stages"]},
+                "output": report["extra"],
+            }
+    return results
+
+
+def compare(results, baseline, tolerance: float):
+    """Daftar regresi: waktu / peak RSS naik > tolerance, atau output (digest, jumlah record) berubah"""
+    regressions = []
+    for case, current in results.items():
+        before = baseline.get(case)
+        if not before:
+            continue
+        checks = [("wall_s", current["wall_s"], before["wall_s"]),
+                  ("peak_rss_mb", current["peak_rss_mb"], before["peak_rss_mb"])]
+        checks += [(f"{name}.seconds", stage["seconds"], before["stages"].get(name, {}).get("seconds"))
+                   for name, stage in current["stages"].items()]
+        for metric, now, old in checks:
+            # stage di bawah 50 ms terlalu berisik untuk dibandingkan
+            if old and now is not None and max(now, old) > 0.05 and now > old * (1 + tolerance):
+                regressions.append(f"{case} {metric}: {old} -> {now} (+{(now / old - 1) * 100:.0f}%)")
+        for key in ("digest", "records"):
+            if key in before["output"] and before["output"][key] != current["output"].get(key):
+                regressions.append(f"{case} output {key}: {before['output'][key]} -> {current['output'].get(key)}")
+    return regressions
+
+
+def print_results(results, baseline):
+    print(f"\n{'kasus':16s} {'stage':14s} {'detik':>9s} {'rec/s':>11s} {'baseline':>9s} {'Δ%':>7s}")
+    for case, result in results.items():
+        before = baseline.get(case, {}).get("stages", {})
+        for name, stage in result["stages"].items():
+            old = before.get(name, {}).get("seconds")
+            delta = f"{(stage['seconds'] / old - 1) * 100:+.0f}" if old else "-"
+            rate = f"{stage['records_per_s']:,.0f}" if stage["records_per_s"] else "-"
+            print(f"{case:16s} {name:14s} {stage['seconds']:9.3f} {rate:>11s} "
+                  f"{old if old is not None else '-':>9} {delta:>7s}")
+        old_rss = baseline.get(case, {}).get("peak_rss_mb")
+        print(f"{case:16s} {'peak RSS MB':14s} {result['peak_rss_mb']:9.1f} {'':>11s} "
+              f"{old_rss if old_rss is not None else '-':>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline data dengan korpus sintetis")
+    sub = parser.add_subparsers(dest="command")
+    case = sub.add_parser("_case", help=argparse.SUPPRESS)
+    case.add_argument("format", choices=FORMATS)
+    case.add_argument("corpus")
+    case.add_argument("report")
+    case.add_argument("--tracemalloc", action="store_true")
+
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(DEFAULT_SIZES))
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--baseline", default=str(BASELINE_FILE))
+    parser.add_argument("--save-baseline", action="store_true", help="Simpan hasil run ini sebagai baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Kenaikan relatif yang masih diterima")
+    parser.add_argument("--tracemalloc", action="store_true", help="Rekam peak alokasi Python (lebih lambat)")
+    parser.add_argument("--strict", action="store_true", help="Exit code 1 jika ada regresi")
+    parser.add_argument("--report", default=str(REPORT_FILE))
+    args = parser.parse_args()
+
+    if args.command == "_case":
+        run_case(args.format, args.corpus, args.report, args.tracemalloc)
+        return
+
+    print("=" * 72)
+    print(f"🏁 BENCHMARK PIPELINE: {', '.join(args.formats)} @ {', '.join(args.sizes)}")
+    print("=" * 72)
+    results = run_suite(args.formats, args.sizes, args.tracemalloc)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+    regressions = compare(results, baseline, args.tolerance)
+
+    Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump({"results": results, "regressions": regressions}, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 Laporan: {args.report}")
+
+    if args.save_baseline:
+        merged = dict(baseline, **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": merged}, f, ensure_ascii=False, indent=2)
+        print(f"💾 Baseline disimpan: {args.baseline}")
+    elif not baseline:
+        print(f"💡 Belum ada baseline; jalankan dengan --save-baseline untuk menyimpan {args.baseline}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regresi (toleransi {args.tolerance * 100:.0f}%):")
+        for line in regressions:
+            print(f"  • {line}")
+        if args.strict:
+            sys.exit(1)
+    elif baseline:
+        print(f"\n✅ Tidak ada regresi terhadap baseline (toleransi {args.tolerance * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,546 @@
+"""
+Cek konsistensi fakta: data/data_group_N_negative.txt dan uji.json vs data positif
+
+1. Dari semua file positif (data/data_group_N.txt) diekstrak fakta terstruktur
+   - tanggal  : "1 November 2024", "30 Maret 2025", "pertengahan Juli 2025" (peran mulai/akhir/tanggal)
+   - nominal  : "Rp 745.000", "Rp 2,5 juta", "gratis" (= Rp 0)
+   - bank     : BSI, BRI, BNI, Mandiri, Bank Jateng, ...
+   dengan kunci (gelombang, topik, slot), mis. ("gelombang_1", "pendaftaran", "mulai"),
+   lalu di-index: kunci -> nilai -> sumber. Biaya kuliah berbeda per prodi, jadi kuncinya
+   memakai nama prodi/fakultas, mis. ("Pendidikan Agama Islam", "kuliah", "biaya"); biaya kuliah
+   tanpa prodi yang dikenali tidak di-index dan dilaporkan sebagai "tanpa prodi" (tidak dicek)
+2. Setiap jawaban negatif / expected uji.json dicek ke index dalam satu pass:
+   - kontradiksi  : fakta yang ditegaskan tidak cocok dengan nilai mana pun di index
+   - menyangkal   : nilai yang disangkal (pertanyaan negatif, klausa "bukan ...") justru fakta positif
+   - bank asing   : bank yang tidak pernah disebut di data positif
+Biaya linear terhadap jumlah record (satu pass per file, lookup dict per fakta).
+
+Usage:
+    python consistency.py
+    python consistency.py --check data/data_group_3_negative.txt --strict
+    python consistency.py --facts "data/data_group_[0-9].txt" dataset_v2.txt --dump-facts facts.json
+"""
+
+import argparse
+import glob
+import json
+import re
+import sys
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from profiling import RunProfiler, add_profiling_args
+from qa_parser import data_group_files, iter_qa_records
+
+UJI_FILE = "uji.json"
+REPORT_FILE = "consistency_report.json"
+
+MONTHS = {
+    "januari": 1, "februari": 2, "maret": 3, "april": 4, "mei": 5, "juni": 6, "juli": 7,
+    "agustus": 8, "september": 9, "oktober": 10, "november": 11, "desember": 12,
+}
+MONTH_NAMES = {v: k.capitalize() for k, v in MONTHS.items()}
+
+DATE_RE = re.compile(
+    r"\b(?:(\d{1,2})\s+|(awal|pertengahan|akhir)\s+(?:bulan\s+)?)?(" + "|".join(MONTHS) + r")\b(?:\s+(\d{4}))?",
+    re.IGNORECASE,
+)
+# penghubung rentang tanggal: "1 Januari hingga 30 Maret", "1 November hingga batas akhir 31 Desember"
+RANGE_RE = re.compile(r"^\s*(?:-|–|s\.?\s?d\.?|sampai|hingga)(?:\s+[a-z]+){0,3}\s*$", re.IGNORECASE)
+ROLE_RE = re.compile(
+    r"(?P<akhir>berakhir|batas|paling lambat|sebelum|sampai|hingga|ditutup)"
+    r"|(?P<mulai>dimulai|mulai|dibuka|dari|sejak)",
+    re.IGNORECASE,
+)
+
+AMOUNT_RE = re.compile(
+    r"\brp\.?\s*(\d{1,3}(?:[.\s]\d{3})+|\d+)(?:,(\d+))?(?:\s*(juta|ribu|rb)\b)?"
+    r"|\b(\d+(?:,\d+)?)\s*(juta|ribu)\s+rupiah\b",
+    re.IGNORECASE,
+)
+FREE_RE = re.compile(
+    r"\bgratis\b|tidak dipungut biaya|tanpa biaya|tidak (?:ada|dikenakan|mengenakan) biaya",
+    re.IGNORECASE,
+)
+
+BANKS = {
+    "bsi": "BSI", "bank syariah indonesia": "BSI", "bri": "BRI", "bni": "BNI", "mandiri": "Mandiri",
+    "bca": "BCA", "btn": "BTN", "bank jateng": "Bank Jateng", "jateng": "Bank Jateng", "muamalat": "Muamalat",
+}
+BANK_RE = re.compile(r"\b(" + "|".join(sorted(map(re.escape, BANKS), key=len, reverse=True)) + r")\b", re.IGNORECASE)
+# "mandiri" juga berarti "sendiri" (belajar mandiri); hanya dihitung bank jika konteksnya pembayaran
+PAYMENT_RE = re.compile(r"bayar|pembayaran|transfer|virtual account|\bva\b|bank|setor", re.IGNORECASE)
+
+WAVE_RE = re.compile(r"\bgelombang\s+(1|2|3|i{1,3}|satu|dua|tiga|pertama|kedua|ketiga)\b", re.IGNORECASE)
+WAVE_NUMBERS = {"1": 1, "i": 1, "satu": 1, "pertama": 1, "2": 2, "ii": 2, "dua": 2, "kedua": 2,
+                "3": 3, "iii": 3, "tiga": 3, "ketiga": 3}
+
+# Urutan penting: alternatif yang lebih spesifik di depan ("pendaftaran ulang" sebelum "pendaftaran")
+TOPICS = [
+    ("pengumuman", r"pengumuman|diumumkan|hasil (?:seleksi|ujian|tes)|dirilis"),
+    ("angsuran_pertama", r"angsuran pertama|tahap pertama|aktivasi nim|\bnim\b|registrasi (?:ulang|awal)"
+                         r"|daftar ulang|pendaftaran ulang|her-?registrasi"),
+    ("konversi", r"konversi|per sks"),
+    ("administrasi", r"administrasi"),
+    ("kuliah", r"\bukt\b|\bspp\b|uang kuliah|biaya kuliah|per semester"),
+    ("pendaftaran", r"pendaftaran|mendaftar|\bdaftar\b|formulir|dibuka|periode"),
+]
+TOPIC_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in TOPICS), re.IGNORECASE)
+DATED_TOPICS = {"pendaftaran", "pengumuman"}   # topik yang tanggalnya berbeda per gelombang
+# jadwal pascasarjana terpisah dari jadwal S1
+PROGRAM_RE = re.compile(r"\bs2\b|pascasarjana|magister", re.IGNORECASE)
+# Biaya topik ini berbeda per prodi; kunci memakai nama prodi, tanpa prodi = UNSCOPED (tidak dicek)
+PROGRAM_FEE_TOPICS = {"kuliah"}
+UNSCOPED = "?"
+STUDY_PROGRAMS = {
+    "pendidikan agama islam": "Pendidikan Agama Islam", "pai": "Pendidikan Agama Islam",
+    "pendidikan bahasa arab": "Pendidikan Bahasa Arab", "pba": "Pendidikan Bahasa Arab",
+    "pendidikan bahasa inggris": "Pendidikan Bahasa Inggris", "pbi": "Pendidikan Bahasa Inggris",
+    "pendidikan guru madrasah ibtidaiyah": "PGMI", "pgmi": "PGMI",
+    "pendidikan islam anak usia dini": "PIAUD", "piaud": "PIAUD",
+    "pendidikan fisika": "Pendidikan Fisika",
+    "ilmu al-qur'an dan tafsir": "Ilmu Al-Qur'an dan Tafsir", "ilmu al-qur’an dan tafsir": "Ilmu Al-Qur'an dan Tafsir",
+    "iat": "Ilmu Al-Qur'an dan Tafsir",
+    "magister pendidikan islam": "Magister Pendidikan Islam", "mpi": "Magister Pendidikan Islam",
+    "komunikasi dan penyiaran islam": "Komunikasi dan Penyiaran Islam", "kpi": "Komunikasi dan Penyiaran Islam",
+    "hukum keluarga islam": "Hukum Keluarga Islam", "hukum keluarga": "Hukum Keluarga Islam",
+    "hukum ekonomi syariah": "Hukum Ekonomi Syariah", "ilmu hukum": "Ilmu Hukum", "ilmu politik": "Ilmu Politik",
+    "manajemen": "Manajemen", "akuntansi": "Akuntansi", "perbankan syariah": "Perbankan Syariah",
+    "sastra inggris": "Sastra Inggris",
+    "teknik informatika": "Teknik Informatika", "informatika": "Teknik Informatika",
+    "manajemen informatika": "Manajemen Informatika",
+    "teknik sipil": "Teknik Sipil", "teknik mesin": "Teknik Mesin", "arsitektur": "Arsitektur",
+    "keperawatan s1": "Keperawatan S1", "s1 keperawatan": "Keperawatan S1",
+    "keperawatan d3": "Keperawatan D3", "d3 keperawatan": "Keperawatan D3",
+    "kebidanan d3": "Kebidanan D3", "d3 kebidanan": "Kebidanan D3", "kebidanan": "Kebidanan D3",
+    "pendidikan profesi ners": "Profesi Ners", "profesi ners": "Profesi Ners", "ners": "Profesi Ners",
+    "fastikom": "FASTIKOM", "fakultas sains dan teknologi komputer": "FASTIKOM",
+    "fitk": "FITK", "fikes": "FIKES",
+}
+STUDY_PROGRAM_RE = re.compile(
+    r"\b(" + "|".join(sorted(map(re.escape, STUDY_PROGRAMS), key=len, reverse=True)) + r")\b", re.IGNORECASE)
+# "Mei untuk gelombang pertama": gelombang yang langsung mengikuti nilai lebih diutamakan
+WAVE_AFTER_RE = re.compile(r"^[\s,]*(?:untuk|bagi|pada|di)?\s*$", re.IGNORECASE)
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+NEGATION_RE = re.compile(r"\bbukan\b", re.IGNORECASE)
+AFFIRMATIVE_RE = re.compile(r"^\s*(ya|benar|betul|iya)\b", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+class Fact:
+    """Satu fakta: kunci (gelombang, topik, slot), nilai ter-normalisasi, dan asalnya"""
+
+    __slots__ = ("key", "kind", "value", "text", "source", "line", "negated")
+
+    def __init__(self, key: Tuple[str, str, str], kind: str, value, text: str, source: str, line: int,
+                 negated: bool = False):
+        self.key = key
+        self.kind = kind
+        self.value = value
+        self.text = text
+        self.source = source
+        self.line = line
+        self.negated = negated
+
+    def ref(self) -> str:
+        return f"{self.source}:{self.line}"
+
+    def to_dict(self) -> Dict:
+        return {"key": "/".join(self.key), "value": format_value(self.kind, self.value), "text": self.text,
+                "source": self.ref(), "negated": self.negated}
+
+
+def format_value(kind: str, value) -> str:
+    if kind == "date":
+        year, month, day = value
+        return " ".join(str(p) for p in (day, MONTH_NAMES[month], year) if p is not None)
+    if kind == "amount":
+        return "gratis (Rp 0)" if value == 0 else f"Rp {value:,}".replace(",", ".")
+    return str(value)
+
+
+def compatible(kind: str, a, b) -> bool:
+    """Tanggal cocok jika komponen yang diketahui di keduanya sama ("November 2024" ~ "1 November 2024")"""
+    if kind == "date":
+        return all(x is None or y is None or x == y for x, y in zip(a, b))
+    return a == b
+
+
+# ============================================================
+# 🔎 Ekstraksi
+# ============================================================
+
+def parse_amount(match: re.Match) -> int:
+    if match.group(1):
+        number = float(re.sub(r"[.\s]", "", match.group(1)) + ("." + match.group(2) if match.group(2) else ""))
+        unit = (match.group(3) or "").lower()
+    else:
+        number = float(match.group(4).replace(",", "."))
+        unit = match.group(5).lower()
+    return int(round(number * {"juta": 1_000_000, "ribu": 1_000, "rb": 1_000}.get(unit, 1)))
+
+
+def find_dates(text: str) -> List[Tuple[int, int, Tuple, str]]:
+    """[(start, end, (tahun, bulan, hari), peran)]; rentang "A hingga B" -> mulai/akhir, tahun A diambil dari B"""
+    matches = list(DATE_RE.finditer(text))
+    dates = []
+    for m in matches:
+        day = int(m.group(1)) if m.group(1) else None
+        year = int(m.group(4)) if m.group(4) else None
+        dates.append([m.start(), m.end(), [year, MONTHS[m.group(3).lower()], day], None])
+
+    for i, current in enumerate(dates):
+        if current[3] is None:
+            window = text[max(0, current[0] - 30):current[0]]
+            roles = [r.lastgroup for r in ROLE_RE.finditer(window)]
+            current[3] = roles[-1] if roles else "tanggal"
+        if i + 1 < len(dates) and RANGE_RE.match(text[current[1]:dates[i + 1][0]]):
+            nxt = dates[i + 1]
+            current[3], nxt[3] = "mulai", "akhir"
+            if current[2][0] is None and nxt[2][0] is not None:
+                current[2][0] = nxt[2][0] - (1 if current[2][1] > nxt[2][1] else 0)
+    return [(s, e, tuple(value), role) for s, e, value, role in dates]
+
+
+def _nearest(spans: List[Tuple[int, str]], position: int) -> Optional[str]:
+    """Label span terdekat sebelum position, jika tidak ada pakai span pertama sesudahnya"""
+    before = [label for start, label in spans if start < position]
+    if before:
+        return before[-1]
+    after = [label for start, label in spans if start >= position]
+    return after[0] if after else None
+
+
+class RecordContext:
+    """(program, gelombang, topik, prodi) dominan dari satu pasangan Q-A, dihitung hanya jika dibutuhkan"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self._values = None
+
+    def get(self) -> Tuple[str, Optional[str], Optional[str], Optional[str]]:
+        if self._values is None:
+            waves = {WAVE_NUMBERS[m.group(1).lower()] for m in WAVE_RE.finditer(self.text)}
+            topic = TOPIC_RE.search(self.text)
+            study_programs = {STUDY_PROGRAMS[m.group(1).lower()] for m in STUDY_PROGRAM_RE.finditer(self.text)}
+            self._values = (
+                "s2_" if PROGRAM_RE.search(self.text) else "",
+                f"gelombang_{waves.pop()}" if len(waves) == 1 else None,
+                topic.lastgroup if topic else None,
+                study_programs.pop() if len(study_programs) == 1 else None,
+            )
+        return self._values
+
+
+def sentence_facts(sentence: str, context: RecordContext, source: str, line: int, negated: bool) -> List[Fact]:
+    # nilai dulu: sebagian besar kalimat tidak berisi fakta, regex topik/gelombang dilewati
+    dates = find_dates(sentence)
+    amounts = list(AMOUNT_RE.finditer(sentence))
+    free = list(FREE_RE.finditer(sentence))
+    banks = list(BANK_RE.finditer(sentence)) if PAYMENT_RE.search(sentence) else []
+    if not (dates or amounts or free or banks):
+        return []
+
+    facts = [Fact(("-", "pembayaran", "bank"), "bank", BANKS[m.group(1).lower()], m.group(0), source, line, negated)
+             for m in banks]
+    if not (dates or amounts or free):
+        return facts
+
+    waves = [(m.start(), f"gelombang_{WAVE_NUMBERS[m.group(1).lower()]}") for m in WAVE_RE.finditer(sentence)]
+    topics = [(m.start(), m.lastgroup) for m in TOPIC_RE.finditer(sentence)]
+    program, default_wave, default_topic, default_study_program = context.get()
+
+    def key_for(start: int, end: int, slot: str) -> Optional[Tuple[str, str, str]]:
+        topic = _nearest(topics, start) or default_topic
+        if topic is None:
+            return None
+        if topic in PROGRAM_FEE_TOPICS and slot == "biaya":
+            study_programs = [(m.start(), STUDY_PROGRAMS[m.group(1).lower()])
+                              for m in STUDY_PROGRAM_RE.finditer(sentence)]
+            return _nearest(study_programs, start) or default_study_program or UNSCOPED, topic, slot
+        if topic not in DATED_TOPICS:
+            return "-", topic, slot
+        following = [label for position, label in waves
+                     if position >= end and WAVE_AFTER_RE.match(sentence[end:position])]
+        wave = following[0] if following else (_nearest(waves, start) or default_wave)
+        return program + (wave or "-"), topic, slot
+
+    for start, end, value, role in dates:
+        # mulai/akhir hanya bermakna untuk periode pendaftaran; selain itu "tanggal" atau batas "akhir"
+        key = key_for(start, end, role)
+        if key and key[1] != "pendaftaran" and role == "mulai":
+            key = (key[0], key[1], "tanggal")
+        if key:
+            facts.append(Fact(key, "date", value, sentence[start:end], source, line, negated))
+    for m in amounts:
+        key = key_for(m.start(), m.end(), "biaya")
+        if key:
+            facts.append(Fact(key, "amount", parse_amount(m), m.group(0), source, line, negated))
+    for m in free:
+        key = key_for(m.start(), m.end(), "biaya")
+        if key and key[1] == "pendaftaran":
+            facts.append(Fact(key, "amount", 0, m.group(0), source, line, negated))
+    return facts
+
+
+def text_facts(text: str, context: RecordContext, source: str, line: int, negated: bool = False) -> List[Fact]:
+    """
+    Fakta dari satu teks; bagian setelah "bukan" dalam satu kalimat dianggap disangkal dan
+    memakai kunci fakta sejenis terakhir yang ditegaskan ("dimulai 1 November, bukan September")
+    """
+    facts = []
+    for sentence in SENTENCE_RE.split(text):
+        negation = NEGATION_RE.search(sentence)
+        asserted_part = sentence[:negation.start()] if negation else sentence
+        asserted = sentence_facts(asserted_part, context, source, line, negated)
+        facts.extend(asserted)
+        if negation and not negated:
+            for fact in sentence_facts(sentence[negation.end():], context, source, line, True):
+                previous = [f for f in asserted if f.kind == fact.kind]
+                if previous and fact.kind != "bank":
+                    fact.key = previous[-1].key
+                facts.append(fact)
+    return facts
+
+
+def extract_facts(question: str, answer: str, source: str, line: int, negative: bool = False) -> List[Fact]:
+    """
+    Fakta dari satu pasangan Q-A
+    - jawaban: ditegaskan (kecuali klausa "bukan ...")
+    - pertanyaan: di file negatif dianggap klaim yang disangkal, kecuali jawabannya "Ya/Benar";
+      di file positif hanya dipakai jika jawabannya "Ya/Benar". Bank di pertanyaan diabaikan
+      ("Apakah hanya bisa lewat BSI?" menyangkal kata "hanya", bukan bank-nya)
+    """
+    context = RecordContext(question + "\n" + answer)
+    facts = text_facts(answer, context, source, line)
+    affirmative = bool(AFFIRMATIVE_RE.match(answer))
+    if negative or affirmative:
+        question_facts = text_facts(question, context, source, line, negated=not affirmative)
+        facts.extend(f for f in question_facts if f.kind != "bank")
+    return facts
+
+
+def question_entities(text: str) -> frozenset:
+    """
+    Gelombang, bulan, angka (tanggal, nominal, tahun, semester), bank, dan program S2 yang
+    disebut di teks. Dua pertanyaan yang hanya berbeda di sini ("Gelombang 1" vs "Gelombang 2")
+    punya jawaban berbeda meskipun embedding-nya hampir sama
+    """
+    found = set()
+    for match in WAVE_RE.finditer(text):
+        found.add(("gelombang", WAVE_NUMBERS[match.group(1).lower()]))
+    for match in DATE_RE.finditer(text):
+        found.add(("bulan", MONTHS[match.group(3).lower()]))
+    # angka di dalam "gelombang 1" / "S2" sudah diwakili di atas ("gelombang pertama" == "gelombang 1")
+    for match in NUMBER_RE.finditer(PROGRAM_RE.sub(" ", WAVE_RE.sub(" ", text))):
+        found.add(("angka", re.sub(r"[.,]", "", match.group()).lstrip("0") or "0"))
+    for match in BANK_RE.finditer(text):
+        found.add(("bank", BANKS[match.group(1).lower()]))
+    if PROGRAM_RE.search(text):
+        found.add(("program", "s2"))
+    return frozenset(found)
+
+
+# ============================================================
+# 📚 Tabel fakta
+# ============================================================
+
+class FactTable:
+    """Index kunci -> {nilai: [sumber]} dari data positif"""
+
+    def __init__(self):
+        self.index: Dict[Tuple[str, str, str], Dict] = defaultdict(dict)
+        self.kinds: Dict[Tuple[str, str, str], str] = {}
+        self.records = 0
+        self.facts = 0
+        self.unscoped = 0
+
+    def add(self, fact: Fact) -> None:
+        if fact.negated:
+            return
+        if fact.key[0] == UNSCOPED:
+            self.unscoped += 1
+            return
+        self.index[fact.key].setdefault(fact.value, []).append(fact.ref())
+        self.kinds[fact.key] = fact.kind
+        self.facts += 1
+
+    def add_file(self, path: str) -> None:
+        for record in iter_qa_records(path):
+            self.records += 1
+            for fact in extract_facts(record.question, record.answer, record.source, record.line):
+                self.add(fact)
+
+    def check(self, fact: Fact) -> Optional[Dict]:
+        """Return konflik (dict) atau None; fakta dengan kunci yang tidak ada di index tidak bisa dicek"""
+        known = self.index.get(fact.key)
+        if not known:
+            return None
+        matches = [value for value in known if compatible(fact.kind, fact.value, value)]
+        if fact.kind == "bank":
+            if fact.negated or matches:
+                return None
+            kind = "bank_asing"
+        elif fact.negated:
+            # hanya jika fakta positif untuk kunci ini tidak ambigu
+            if not matches or len(known) > 1:
+                return None
+            kind = "menyangkal"
+        elif matches:
+            return None
+        else:
+            kind = "kontradiksi"
+
+        return {
+            "type": kind,
+            "fact": fact.to_dict(),
+            "expected": [{"value": format_value(fact.kind, value), "sources": refs[:3], "count": len(refs)}
+                         for value, refs in sorted(known.items(), key=lambda x: -len(x[1]))],
+        }
+
+    def ambiguous(self) -> List[Dict]:
+        """Kunci yang di data positif sendiri punya beberapa nilai yang saling bertentangan"""
+        result = []
+        for key, values in self.index.items():
+            kind = self.kinds[key]
+            if kind == "bank" or len(values) < 2:
+                continue
+            items = list(values)
+            if any(not compatible(kind, a, b) for i, a in enumerate(items) for b in items[i + 1:]):
+                result.append({
+                    "key": "/".join(key),
+                    "values": [{"value": format_value(kind, v), "sources": refs[:3], "count": len(refs)}
+                               for v, refs in sorted(values.items(), key=lambda x: -len(x[1]))],
+                })
+        return result
+
+    def to_json(self) -> Dict:
+        return {
+            "/".join(key): {format_value(self.kinds[key], value): refs for value, refs in values.items()}
+            for key, values in sorted(self.index.items())
+        }
+
+
+# ============================================================
+# ✅ Pengecekan
+# ============================================================
+
+def iter_uji_records(path: str) -> Iterator[Tuple[str, str, str, int]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for item in json.load(f):
+            yield item.get("question", ""), item.get("expected", ""), path, item.get("id", 0)
+
+
+def iter_check_records(paths: List[str], uji_path: Optional[str]) -> Iterator[Tuple[str, str, str, int, bool]]:
+    """(question, answer, source, line, negative) dari file negatif + expected uji.json"""
+    for path in paths:
+        negative = "_negative" in path
+        for record in iter_qa_records(path):
+            yield record.question, record.answer, record.source, record.line, negative
+    if uji_path:
+        for question, expected, source, item_id in iter_uji_records(uji_path):
+            yield question, expected, source, item_id, False
+
+
+def run_checks(table: FactTable, records: Iterator, profiler: RunProfiler) -> Dict:
+    conflicts = []
+    checked = unchecked = unscoped = n_records = 0
+    with profiler.stage("check") as stage:
+        for question, answer, source, line, negative in records:
+            n_records += 1
+            for fact in extract_facts(question, answer, source, line, negative):
+                if fact.key[0] == UNSCOPED:
+                    unscoped += 1
+                    continue
+                if fact.key not in table.index:
+                    unchecked += 1
+                    continue
+                checked += 1
+                conflict = table.check(fact)
+                if conflict:
+                    conflict["question"] = question
+                    conflict["answer"] = answer
+                    conflicts.append(conflict)
+        stage.add(n_records)
+    return {"records": n_records, "facts_checked": checked, "facts_unchecked": unchecked,
+            "facts_unscoped": unscoped, "conflicts": conflicts}
+
+
+def expand(patterns: List[str]) -> List[str]:
+    return [p for pattern in patterns for p in (sorted(glob.glob(pattern)) or [pattern])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cek konsistensi data negatif & uji.json terhadap fakta positif")
+    parser.add_argument("--facts", nargs="+", help="File positif sumber fakta (default: data/data_group_N.txt)")
+    parser.add_argument("--check", nargs="+", help="File yang dicek (default: data/data_group_N_negative.txt)")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--uji", default=UJI_FILE, help="uji.json yang ikut dicek ('' untuk melewati)")
+    parser.add_argument("--report", default=REPORT_FILE)
+    parser.add_argument("--dump-facts", help="Simpan tabel fakta ke JSON")
+    parser.add_argument("--strict", action="store_true", help="Exit code 1 jika ada konflik")
+    add_profiling_args(parser)
+    args = parser.parse_args()
+
+    fact_files = expand(args.facts) if args.facts else data_group_files(args.data_dir, include_negative=False)
+    check_files = expand(args.check) if args.check else [
+        p for p in data_group_files(args.data_dir) if p.endswith("_negative.txt")
+    ]
+
+    with RunProfiler.from_args("consistency", args) as profiler:
+        table = FactTable()
+        with profiler.stage("build_table") as stage:
+            for path in fact_files:
+                table.add_file(path)
+            stage.add(table.records)
+        print(f"📚 {table.facts} fakta dari {table.records} record ({len(fact_files)} file positif), "
+              f"{len(table.index)} kunci ({table.unscoped} biaya kuliah tanpa prodi tidak di-index)")
+
+        result = run_checks(table, iter_check_records(check_files, args.uji or None), profiler)
+        ambiguous = table.ambiguous()
+        profiler.set(conflicts=len(result["conflicts"]), ambiguous_keys=len(ambiguous),
+                     facts_checked=result["facts_checked"])
+
+    report = {
+        "fact_files": fact_files, "check_files": check_files + ([args.uji] if args.uji else []),
+        "facts": table.facts, "keys": len(table.index), "facts_unscoped_positive": table.unscoped,
+        **result, "ambiguous": ambiguous,
+    }
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.dump_facts:
+        with open(args.dump_facts, "w", encoding="utf-8") as f:
+            json.dump(table.to_json(), f, ensure_ascii=False, indent=2)
+
+    conflicts = result["conflicts"]
+    print(f"🔎 {result['records']} record dicek: {result['facts_checked']} fakta dibandingkan, "
+          f"{result['facts_unchecked']} tanpa pembanding, {result['facts_unscoped']} biaya kuliah tanpa prodi "
+          f"(tidak dicek)")
+    by_type = defaultdict(int)
+    for conflict in conflicts:
+        by_type[conflict["type"]] += 1
+    print(f"\n{'❌' if conflicts else '✅'} {len(conflicts)} konflik " +
+          (f"({', '.join(f'{k}: {v}' for k, v in sorted(by_type.items()))})" if conflicts else ""))
+    for conflict in conflicts[:15]:
+        fact = conflict["fact"]
+        expected = ", ".join(f"{e['value']} ({e['count']}x)" for e in conflict["expected"][:3])
+        relation = "justru sesuai" if conflict["type"] == "menyangkal" else "≠"
+        print(f"  • [{conflict['type']}] {fact['source']} {fact['key']}: {fact['value']} {relation} data positif: {expected}")
+        print(f"    A: {conflict['answer'][:110]}")
+    if len(conflicts) > 15:
+        print(f"  ... dan {len(conflicts) - 15} konflik lainnya")
+
+    if ambiguous:
+        print(f"\n⚠️  {len(ambiguous)} kunci dengan nilai bertentangan di data positif sendiri:")
+        for item in ambiguous[:10]:
+            values = ", ".join(f"{v['value']} ({v['count']}x)" for v in item["values"][:4])
+            print(f"  • {item['key']}: {values}")
+    print(f"\n💾 Laporan: {args.report}")
+
+    if args.strict and conflicts:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
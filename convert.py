@@ -1,26 +1,45 @@
 """
 Script untuk Format Dataset TANPA System Prompt (Optimal untuk Gemma)
 Dengan handling untuk berbagai format input dan debugging
+
+Usage:
+    python convert.py
+    python convert.py --tokenizer path/ke/gemma/tokenizer.json --max-length 512   # statistik token exact
+    python convert.py --tracemalloc        # + peak alokasi Python; run report di run_reports/convert.json
 """
 
+import argparse
+import itertools
 import json
 import os
+from array import array
 from pathlib import Path
 
+from gemma_format import SYSTEM_PROMPT, prompt_prefix
+from jsonl_io import JsonlWriter, iter_batches, iter_records
+from profiling import RunProfiler, add_profiling_args
+from tokenizer_utils import (
+    DEFAULT_BATCH_SIZE, TOKEN_CACHE_FILE, TokenCountCache, count_tokens, load_tokenizer, percentiles,
+    tokenizer_fingerprint
+)
 
-def format_clean_gemma(data):
+# dataset_config.max_length di konfigurasi QLoRA
+MAX_LENGTH = 512
+
+
+def iter_clean_gemma(data, counter=None, include_answer=False):
     """
-    Format dataset dengan chat template Gemma TANPA system prompt
-    System prompt akan ditambahkan di training script, bukan per-sample
+    Versi generator dari format_clean_gemma (memori konstan)
     
     Args:
-        data: List of dict dengan keys 'Q' dan 'A' (atau 'question' dan 'answer')
+        data: Iterable of dict dengan keys 'Q' dan 'A' (atau 'question' dan 'answer')
+        counter: dict opsional, key 'skipped' diisi jumlah sample yang dilewati
+        include_answer: sertakan key 'answer' agar validasi tidak perlu parsing 'text' lagi
     
-    Returns:
-        List of dict dengan key 'text' saja (clean)
+    Yields:
+        Dict dengan key 'text' saja (clean)
     """
     
-    formatted_data = []
     skipped = 0
     
     for idx, item in enumerate(data):
@@ -58,65 +77,161 @@ def format_clean_gemma(data):
         formatted_item = {
             "text": text
         }
+        if include_answer:
+            formatted_item["answer"] = answer
         
-        formatted_data.append(formatted_item)
+        yield formatted_item
     
     if skipped > 5:
         print(f"  ⚠️  ... and {skipped - 5} more skipped samples")
     
-    return formatted_data, skipped
+    if counter is not None:
+        counter["skipped"] = skipped
+
+
+def format_clean_gemma(data):
+    """
+    Format dataset dengan chat template Gemma TANPA system prompt
+    System prompt akan ditambahkan di training script, bukan per-sample
+    
+    Args:
+        data: List of dict dengan keys 'Q' dan 'A' (atau 'question' dan 'answer')
+    
+    Returns:
+        List of dict dengan key 'text' saja (clean)
+    """
+    counter = {"skipped": 0}
+    formatted_data = list(iter_clean_gemma(data, counter))
+    return formatted_data, counter["skipped"]
+
+
+def extract_answer(item):
+    """Ambil answer dari formatted item (field 'answer' jika ada, fallback parsing 'text')"""
+    if 'answer' in item:
+        return item['answer']
+    answer_start = item['text'].find("<start_of_turn>model\n") + len("<start_of_turn>model\n")
+    answer_end = item['text'].find("<end_of_turn>", answer_start)
+    return item['text'][answer_start:answer_end]
+
+
+def _add_to_bucket(stats, n_tokens):
+    if n_tokens < 30:
+        stats["too_short"] += 1
+    elif n_tokens <= 200:
+        stats["optimal"] += 1
+    else:
+        stats["too_long"] += 1
+    stats["total"] += 1
+
+
+def update_length_stats(stats, item, answer=None):
+    """Tambahkan satu formatted item ke statistik panjang response (estimasi)"""
+    if answer is None:
+        answer = extract_answer(item)
+    
+    # Rough token estimation (1 token ≈ 4 chars untuk bahasa Indonesia)
+    _add_to_bucket(stats, len(answer) // 4)
 
 
-def validate_response_length(data):
+class ExactLengthStats:
+    """
+    Statistik panjang berbasis tokenizer asli
+    Answer dan prompt penuh ditokenisasi per batch, jumlah token di-cache per hash teks.
+    Prompt penuh = teks training sebenarnya: giliran system (ditambahkan di training script)
+    + field `text` yang clean
+    """
+    
+    def __init__(self, tokenizer, max_length=MAX_LENGTH, cache=None, batch_size=DEFAULT_BATCH_SIZE,
+                 system_prompt=SYSTEM_PROMPT):
+        self.tokenizer = tokenizer
+        self.system_turn = prompt_prefix(system_prompt)
+        self.max_length = max_length
+        self.cache = cache
+        self.batch_size = batch_size
+        self.stats = validate_response_length([])
+        self.answer_tokens = array('I')
+        self.prompt_tokens = array('I')
+        self._answers = []
+        self._texts = []
+    
+    def add(self, item, answer=None):
+        self._answers.append(extract_answer(item) if answer is None else answer)
+        self._texts.append(self.system_turn + item['text'])
+        if len(self._texts) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if not self._texts:
+            return
+        answer_counts = count_tokens(self.tokenizer, self._answers, self.cache)
+        prompt_counts = count_tokens(self.tokenizer, self._texts, self.cache, add_special_tokens=True)
+        for n_tokens in answer_counts:
+            _add_to_bucket(self.stats, n_tokens)
+        self.answer_tokens.extend(answer_counts)
+        self.prompt_tokens.extend(prompt_counts)
+        self._answers, self._texts = [], []
+    
+    def finish(self):
+        self.flush()
+        if self.cache is not None:
+            self.cache.save()
+        stats = dict(self.stats)
+        stats["mode"] = "exact"
+        stats["max_length"] = self.max_length
+        stats["answer_tokens"] = percentiles(self.answer_tokens)
+        stats["prompt_tokens"] = percentiles(self.prompt_tokens)
+        stats["truncated"] = sum(1 for n in self.prompt_tokens if n > self.max_length)
+        return stats
+
+
+def validate_response_length(data, tokenizer=None, max_length=MAX_LENGTH, cache=None):
     """
     Validasi panjang response dan beri warning jika terlalu pendek/panjang
     
     Args:
-        data: Formatted dataset
+        data: Formatted dataset (list atau iterable)
+        tokenizer: tokenizer dari tokenizer_utils.load_tokenizer; jika None pakai estimasi len // 4
+        max_length: panjang maksimum sequence saat training (untuk hitung sample terpotong)
+        cache: TokenCountCache opsional
     
     Returns:
         Statistics dict
     """
-    if not data:
-        return {
-            "too_short": 0,
-            "optimal": 0,
-            "too_long": 0,
-            "total": 0
-        }
+    if tokenizer is not None:
+        exact = ExactLengthStats(tokenizer, max_length, cache)
+        for item in data:
+            exact.add(item)
+        return exact.finish()
     
     stats = {
         "too_short": 0,  # < 30 tokens
         "optimal": 0,     # 30-200 tokens
         "too_long": 0,    # > 200 tokens
-        "total": len(data)
+        "total": 0
     }
     
     for item in data:
-        # Rough token estimation (1 token ≈ 4 chars untuk bahasa Indonesia)
-        answer_start = item['text'].find("<start_of_turn>model\n") + len("<start_of_turn>model\n")
-        answer_end = item['text'].find("<end_of_turn>", answer_start)
-        answer = item['text'][answer_start:answer_end]
-        
-        estimated_tokens = len(answer) // 4
-        
-        if estimated_tokens < 30:
-            stats["too_short"] += 1
-        elif estimated_tokens <= 200:
-            stats["optimal"] += 1
-        else:
-            stats["too_long"] += 1
+        update_length_stats(stats, item)
     
     return stats
 
 
+def print_exact_length_stats(stats):
+    """Cetak percentile token dan jumlah sample yang akan terpotong"""
+    for label, key in (("Answer", "answer_tokens"), ("Prompt penuh", "prompt_tokens")):
+        p = stats[key]
+        print(f"     • {label:13s} p50={p['p50']} p90={p['p90']} p95={p['p95']} p99={p['p99']} max={p['max']}")
+    truncated = stats['truncated']
+    print(f"     • Terpotong pada max_length={stats['max_length']}: {truncated} ({truncated/stats['total']*100:.1f}%)")
+
+
 def inspect_dataset_structure(data, filename):
     """
     Debug function untuk inspect struktur dataset
     """
     print(f"\n🔍 Inspecting {filename}:")
     print(f"  • Type: {type(data)}")
-    print(f"  • Length: {len(data) if isinstance(data, list) else 'N/A'}")
+    print(f"  • Preview length: {len(data) if isinstance(data, list) else 'N/A'}")
     
     if isinstance(data, list) and len(data) > 0:
         first_item = data[0]
@@ -134,6 +249,18 @@ def inspect_dataset_structure(data, filename):
 def main():
     """Main function untuk format dataset"""
     
+    parser = argparse.ArgumentParser(description="Format dataset Gemma tanpa system prompt")
+    parser.add_argument("--tokenizer", help="Path tokenizer.json (atau folder model) untuk statistik token exact")
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--token-cache", default=TOKEN_CACHE_FILE)
+    add_profiling_args(parser)
+    args = parser.parse_args()
+    
+    profiler = RunProfiler.from_args("convert", args).start()
+    with profiler.stage("load_tokenizer"):
+        tokenizer = load_tokenizer(args.tokenizer) if args.tokenizer else None
+    token_cache = TokenCountCache(tokenizer_fingerprint(args.tokenizer), args.token_cache) if tokenizer else None
+    
     print("="*80)
     print("📝 FORMATTING DATASET - CLEAN VERSION (Optimal for Gemma)")
     print("="*80)
@@ -144,14 +271,14 @@ def main():
     
     # File yang akan diformat
     input_files = {
-        "dataset_v2.json": "dataset_v2_formatted_clean.json",
-        "pmb_dataset_augmented.json": "pmb_dataset_augmented_formatted_clean.json",
+        "dataset_v2.json": "dataset_v2_formatted_clean.jsonl",
+        "pmb_dataset_augmented.json": "pmb_dataset_augmented_formatted_clean.jsonl",
     }
     
     print(f"\n💡 Format Strategy:")
     print("-"*80)
     print("✅ System prompt REMOVED dari setiap sample (efisien)")
-    print("✅ Hanya field 'text' yang disimpan (clean)")
+    print("✅ Hanya field 'text' yang disimpan (clean, JSONL streaming)")
     print("✅ System prompt akan ditambahkan di training script")
     print("✅ Response length validation included")
     print("-"*80)
@@ -168,60 +295,84 @@ def main():
             continue
         
         print(f"\n📖 Processing: {input_file}")
+        name = input_path.stem
+        profiler.add_file(f"input:{name}", input_path)
         
-        # Load data
+        # Load data (streaming untuk .jsonl)
         try:
-            with open(input_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            records = iter_records(input_path)
+            preview = list(itertools.islice(records, 5))
         except Exception as e:
             print(f"  ❌ Error loading {input_file}: {e}")
             continue
         
-        print(f"  • Loaded {len(data)} samples")
+        # Inspect structure for debugging (hanya sampel awal)
+        inspect_dataset_structure(preview, input_file)
         
-        # Inspect structure for debugging
-        inspect_dataset_structure(data, input_file)
+        # Format, validasi panjang, dan tulis dalam satu pass
+        counter = {"skipped": 0}
+        stats = validate_response_length([])
+        exact = ExactLengthStats(tokenizer, args.max_length, token_cache) if tokenizer else None
+        first_item = None
         
-        # Format data
-        formatted_data, skipped = format_clean_gemma(data)
+        # parse = baca + decode JSON + format (waktu producer saja)
+        formatted = iter_clean_gemma(itertools.chain(preview, records), counter, include_answer=True)
+        with JsonlWriter(output_path) as sink:
+            for batch in profiler.iter(f"{name}:parse", iter_batches(formatted), len):
+                answers = [item.pop("answer") for item in batch]
+                with profiler.stage(f"{name}:length_stats"):
+                    for item, answer in zip(batch, answers):
+                        if exact:
+                            exact.add(item, answer)
+                        else:
+                            update_length_stats(stats, item, answer)
+                with profiler.stage(f"{name}:write", records=len(batch)):
+                    sink.write_all(batch)
+                if first_item is None:
+                    first_item = batch[0]
         
-        print(f"\n  • Successfully formatted: {len(formatted_data)} samples")
+        if exact:
+            with profiler.stage(f"{name}:length_stats"):
+                stats = exact.finish()
+        profiler.add_file(f"output:{name}", output_path)
+        
+        skipped = counter["skipped"]
+        print(f"\n  • Successfully formatted: {stats['total']} samples")
         print(f"  • Skipped: {skipped} samples")
         
-        if len(formatted_data) == 0:
+        if stats['total'] == 0:
+            output_path.unlink(missing_ok=True)
             print(f"\n  ❌ ERROR: No samples formatted! Check dataset structure.")
             print(f"  💡 Expected format: [{{'Q': '...', 'A': '...'}}, ...]")
             continue
         
-        # Validate response lengths
-        stats = validate_response_length(formatted_data)
         all_stats[input_file] = stats
+        profiler.set(**{name: {"total": stats["total"], "skipped": skipped}})
         
         print(f"\n  📊 Response Length Statistics:")
         print(f"     • Too Short (<30 tokens):  {stats['too_short']:4d} ({stats['too_short']/stats['total']*100:.1f}%)")
         print(f"     • Optimal (30-200 tokens): {stats['optimal']:4d} ({stats['optimal']/stats['total']*100:.1f}%)")
         print(f"     • Too Long (>200 tokens):  {stats['too_long']:4d} ({stats['too_long']/stats['total']*100:.1f}%)")
+        if stats.get('mode') == 'exact':
+            print_exact_length_stats(stats)
         
         # Warning jika banyak yang terlalu pendek
         if stats['too_short'] > stats['total'] * 0.3:
             print(f"\n  ⚠️  WARNING: {stats['too_short']/stats['total']*100:.1f}% responses terlalu pendek!")
             print(f"     Pertimbangkan untuk memperkaya jawaban (50-150 tokens optimal)")
         
-        # Save formatted data
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(formatted_data, f, ensure_ascii=False, indent=2)
-        
         print(f"\n  ✅ Saved to: {output_file}")
         
         # Show sample
-        if formatted_data:
+        if first_item:
             print(f"\n  📝 Sample output:")
             print("  " + "-"*76)
-            sample_text = formatted_data[0]['text']
+            sample_text = first_item['text']
             for line in sample_text.split('\n'):
                 print(f"  {line}")
             print("  " + "-"*76)
     
+    profiler.finish()
     print("\n" + "="*80)
     
     if not all_stats:
@@ -243,7 +394,7 @@ def main():
     print("\n💡 Next Steps:")
     print("  1. Review dataset jika ada banyak response yang terlalu pendek")
     print("  2. Update configs/qlora_config.yaml:")
-    print("     augmented_file: 'data/pmb_dataset_augmented_formatted_clean.json'")
+    print("     augmented_file: 'data/pmb_dataset_augmented_formatted_clean.jsonl'")
     print("  3. System prompt akan ditambahkan otomatis saat training")
     print("  4. Run training:")
     print("     python3 scripts/train_v2.py")
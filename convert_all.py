@@ -1,76 +1,356 @@
-import json
+"""
+Gabungkan semua variations_q*_styled.json menjadi dataset Gemma JSONL (dataset_gemma_fix.jsonl)
+
+Usage:
+    python convert_all.py                  # build penuh
+    python convert_all.py --incremental    # hanya proses file variasi yang berubah
+    python convert_all.py --workers 4      # decode & format file variasi secara paralel
+    python convert_all.py --output dataset_gemma_fix.jsonl.gz   # output terkompresi
+    python convert_all.py --compact        # system prompt & string unik disimpan sekali
+    python convert_all.py --cprofile       # + cProfile; run report di run_reports/convert_all.json
+"""
+
+import argparse
 import glob
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from gemma_format import SYSTEM_PROMPT, CompactWriter, compact_path, render_text
+from jsonl_io import JsonlWriter
+from profiling import RunProfiler, add_profiling_args
 
 # ==== KONFIGURASI ====
 INPUT_PATTERN = "variations_q*_styled.json"   # otomatis baca semua variations_q1_styled.json ... q48
-OUTPUT_FILE = "dataset_gemma_fix.json"
+OUTPUT_FILE = "dataset_gemma_fix.jsonl"
+BUILD_DIR = ".build"                          # manifest + shard untuk mode incremental
 
-SYSTEM_PROMPT = (
-    "Anda adalah asisten virtual untuk Penerimaan Mahasiswa Baru (PMB) di "
-    "Universitas Sains Al-Qur'an (UNSIQ) Wonosobo.\n"
-    "Tugas Anda adalah memberikan informasi yang akurat, jelas, dan membantu calon mahasiswa "
-    "dalam proses pendaftaran.\n"
-    "Jawab pertanyaan dengan ramah, informatif, dan profesional."
-)
+# Naikkan jika format output berubah, agar shard lama tidak dipakai ulang
+FORMAT_VERSION = 2
 
-# ==== GABUNGKAN SEMUA FILE ====
-all_files = sorted(glob.glob(INPUT_PATTERN))
-merged = []
 
-print(f"📂 Ditemukan {len(all_files)} file JSON...")
-
-for path in all_files:
+# ==== BACA FILE VARIASI ====
+def load_variant_file(path):
+    """Baca satu file variasi, return list item (kosong jika format tidak valid)"""
     with open(path, "r", encoding="utf-8") as f:
         try:
             data = json.load(f)
-            if isinstance(data, dict):
-                merged.append(data)
-            elif isinstance(data, list):
-                merged.extend(data)
-            else:
-                print(f"⚠️ Format tidak dikenali di {path}")
         except json.JSONDecodeError:
             print(f"❌ Gagal membaca {path} — bukan JSON valid.")
+            return []
 
-print(f"✅ Total item sebelum konversi: {len(merged)}")
+    if isinstance(data, dict):
+        return [data]
+    if isinstance(data, list):
+        return data
+    print(f"⚠️ Format tidak dikenali di {path}")
+    return []
 
-# ==== KONVERSI KE FORMAT GEMMA ====
-output = []
 
-for item in merged:
+# ==== KONVERSI KE FORMAT GEMMA ====
+def item_pairs(item):
+    """Pasangan (pertanyaan, jawaban) untuk satu item: pertanyaan utama + semua variasinya"""
     question = item.get("question", "").strip()
     answer = item.get("answer", "").strip()
+    pairs = [(question, answer)]
 
-    # format utama
-    formatted = {
-        "text": (
-            f"<start_of_turn>system\n{SYSTEM_PROMPT}<end_of_turn>\n"
-            f"<start_of_turn>user\n{question}<end_of_turn>\n"
-            f"<start_of_turn>model\n{answer}<end_of_turn>"
-        ),
+    # variasi pertanyaan (jika ada)
+    for v in item.get("variations", []):
+        # file variasi lama (variations_q1.json) berisi string, bukan {style, question}
+        var_q = (v.get("question", "") if isinstance(v, dict) else v).strip()
+        pairs.append((var_q, answer))
+
+    return pairs
+
+
+def format_item(item):
+    """Format satu item + semua variasi pertanyaannya ke record Gemma"""
+    return [{
+        "text": render_text(question, answer),
         "question": question,
         "answer": answer
-    }
-    output.append(formatted)
+    } for question, answer in item_pairs(item)]
 
-    # variasi pertanyaan (jika ada)
-    for v in item.get("variations", []):
-        var_q = v.get("question", "").strip()
-        formatted_var = {
-            "text": (
-                f"<start_of_turn>system\n{SYSTEM_PROMPT}<end_of_turn>\n"
-                f"<start_of_turn>user\n{var_q}<end_of_turn>\n"
-                f"<start_of_turn>model\n{answer}<end_of_turn>"
-            ),
-            "question": var_q,
-            "answer": answer
+
+def serialize_record(record):
+    """Serialisasi record menjadi satu baris JSONL, sehingga shard bisa disambung tanpa parsing ulang"""
+    return json.dumps(record, ensure_ascii=False)
+
+
+def convert_file(path):
+    """Return (jumlah item, list baris JSONL) untuk satu file variasi"""
+    items = load_variant_file(path)
+    lines = [serialize_record(r) for item in items for r in format_item(item)]
+    return len(items), lines
+
+
+def convert_file_pairs(path):
+    """Return (jumlah item, list (pertanyaan, jawaban)) untuk mode compact: tanpa render & serialisasi"""
+    items = load_variant_file(path)
+    return len(items), [pair for item in items for pair in item_pairs(item)]
+
+
+def converted_records(result):
+    """Jumlah record output dalam satu hasil convert_file / convert_file_pairs (untuk records/s stage convert)"""
+    return len(result[1])
+
+
+def iter_converted(paths, workers=1, convert=convert_file):
+    """
+    Konversi file-file variasi dengan `convert` (convert_file / convert_file_pairs),
+    hasil di-yield sesuai urutan paths
+    Jika workers > 1, decode JSON & formatting berjalan di worker process
+    """
+    if workers <= 1 or len(paths) <= 1:
+        yield from map(convert, paths)
+        return
+
+    from multiprocessing import Pool  # hanya mode paralel yang butuh multiprocessing
+
+    with Pool(processes=workers) as pool:
+        # imap menjaga urutan hasil -> output identik dengan mode serial
+        yield from pool.imap(convert, paths, chunksize=max(1, len(paths) // (workers * 4)))
+
+
+# ==== BUILD PENUH ====
+def build_full(all_files, output_file, workers=1, profiler=None):
+    profiler = profiler or RunProfiler()
+    total_items = 0
+
+    with JsonlWriter(output_file) as sink:
+        for n_items, lines in profiler.iter("convert", iter_converted(all_files, workers), converted_records):
+            total_items += n_items
+            with profiler.stage("write", records=len(lines)):
+                for line in lines:
+                    sink.write_raw(line)
+
+    print(f"✅ Total item sebelum konversi: {total_items}")
+    profiler.set(items=total_items, records=sink.count)
+    return sink.count
+
+
+# ==== BUILD COMPACT ====
+def build_compact(all_files, output_file, workers=1, profiler=None):
+    """Tulis format compact: system prompt sekali di header, record hanya berisi id string"""
+    profiler = profiler or RunProfiler()
+    total_items = 0
+
+    with CompactWriter(output_file) as writer:
+        results = iter_converted(all_files, workers, convert_file_pairs)
+        for n_items, pairs in profiler.iter("convert", results, converted_records):
+            total_items += n_items
+            with profiler.stage("write", records=len(pairs)):
+                for question, answer in pairs:
+                    writer.add(question, answer)
+
+    print(f"✅ Total item sebelum konversi: {total_items}")
+    print(f"🗜️  {len(writer.string_ids)} string unik untuk {writer.count} record")
+    profiler.set(items=total_items, records=writer.count, unique_strings=len(writer.string_ids))
+    return writer.count
+
+
+# ==== BUILD INCREMENTAL ====
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def unique_files(paths, digests=None):
+    """
+    Buang file yang isinya identik dengan file sebelumnya (mis. 'variations_q29_styled copy.json')
+
+    Hanya file yang ukurannya sama dengan file lain yang di-hash. `digests` ({path: sha1})
+    dipakai sebagai cache: sha1 yang sudah diketahui (mis. dari manifest incremental) tidak
+    dihitung ulang, dan sha1 yang baru dihitung ditambahkan ke dalamnya
+    """
+    digests = {} if digests is None else digests
+    sizes = [os.path.getsize(path) for path in paths]
+    size_counts = {}
+    for size in sizes:
+        size_counts[size] = size_counts.get(size, 0) + 1
+
+    seen = {}
+    result = []
+    for path, size in zip(paths, sizes):
+        if size_counts[size] == 1:
+            key = ("size", size)
+        else:
+            if path not in digests:
+                digests[path] = file_sha1(path)
+            key = digests[path]
+        if key not in seen:
+            seen[key] = len(result)
+            result.append(path)
+            continue
+        # pertahankan nama terpendek (nama asli, bukan salinan), di posisi file pertama
+        kept = result[seen[key]]
+        if len(os.path.basename(path)) < len(os.path.basename(kept)):
+            result[seen[key]], path, kept = path, kept, path
+        print(f"⏭️  {path} identik dengan {kept}, dilewati")
+    return result
+
+
+def format_fingerprint():
+    return hashlib.sha1(f"{FORMAT_VERSION}\0{SYSTEM_PROMPT}".encode("utf-8")).hexdigest()
+
+
+def manifest_path_for(output_file, build_dir):
+    return Path(build_dir) / Path(output_file).stem / "manifest.json"
+
+
+def manifest_digests(output_file, build_dir):
+    """sha1 dari manifest untuk file yang mtime & size-nya belum berubah (tanpa membaca isi file)"""
+    manifest_path = manifest_path_for(output_file, build_dir)
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != format_fingerprint():
+        return {}
+    digests = {}
+    for path, entry in manifest["files"].items():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            digests[path] = entry["sha1"]
+    return digests
+
+
+def load_manifest(manifest_path):
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != format_fingerprint():
+        print("🔁 Format output berubah, semua shard dibangun ulang")
+        return None
+    return manifest
+
+
+def build_incremental(all_files, output_file, build_dir, workers=1, profiler=None, digests=None):
+    """
+    Proses ulang hanya file yang berubah (mtime/size, lalu sha1),
+    simpan hasilnya sebagai shard per file, lalu sambung semua shard.
+    `digests` ({path: sha1} dari unique_files) mencegah file yang sama di-hash dua kali
+    """
+    profiler = profiler or RunProfiler()
+    digests = {} if digests is None else digests
+    manifest_path = manifest_path_for(output_file, build_dir)
+    shard_dir = manifest_path.parent / "shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = load_manifest(manifest_path) or {"files": {}}
+    old_entries = manifest["files"]
+    new_entries = {}
+
+    changed = []
+    with profiler.stage("check", records=len(all_files)):
+        for path in all_files:
+            stat = os.stat(path)
+            entry = old_entries.get(path)
+            shard_path = shard_dir / (hashlib.sha1(path.encode("utf-8")).hexdigest() + ".part")
+
+            if entry and shard_path.exists():
+                if entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                    new_entries[path] = entry
+                    continue
+                digest = digests.get(path) or file_sha1(path)
+                if entry["sha1"] == digest:
+                    new_entries[path] = dict(entry, mtime=stat.st_mtime_ns)
+                    continue
+            else:
+                digest = digests.get(path) or file_sha1(path)
+
+            changed.append((path, digest, stat, shard_path))
+
+    results = profiler.iter("convert", iter_converted([c[0] for c in changed], workers),
+                            converted_records)
+    for (path, digest, stat, shard_path), (n_items, lines) in zip(changed, results):
+        with profiler.stage("write_shard", records=len(lines)):
+            with open(shard_path, "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in lines)
+        new_entries[path] = {
+            "sha1": digest,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "shard": shard_path.name,
+            "items": n_items,
+            "records": len(lines),
         }
-        output.append(formatted_var)
+        print(f"  🔄 {path}: {len(lines)} record")
+    rebuilt = len(changed)
+
+    # Hapus shard milik file yang sudah tidak ada
+    for path in set(old_entries) - set(new_entries):
+        (shard_dir / old_entries[path]["shard"]).unlink(missing_ok=True)
+        print(f"  🗑️  {path} dihapus dari build")
+
+    print(f"✅ {rebuilt} file diproses ulang, {len(all_files) - rebuilt} dipakai dari shard")
+    print(f"✅ Total item sebelum konversi: {sum(e['items'] for e in new_entries.values())}")
+
+    total = sum(e["records"] for e in new_entries.values())
+
+    # Merge: sambung shard apa adanya tanpa parsing JSON
+    with profiler.stage("merge", records=total):
+        with JsonlWriter(output_file) as sink:
+            for path in all_files:
+                with open(shard_dir / new_entries[path]["shard"], "r", encoding="utf-8") as shard:
+                    shutil.copyfileobj(shard, sink.handle)
+
+    manifest = {"format": format_fingerprint(), "output": output_file, "files": new_entries}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    profiler.set(records=total, rebuilt_files=rebuilt, reused_files=len(all_files) - rebuilt)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Konversi file variasi ke dataset Gemma")
+    parser.add_argument("--input-pattern", default=INPUT_PATTERN)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--incremental", action="store_true", help="Hanya proses ulang file yang berubah")
+    parser.add_argument("--build-dir", default=BUILD_DIR)
+    parser.add_argument("--workers", type=int, default=1, help="Jumlah worker process (default: 1 = serial)")
+    parser.add_argument("--compact", action="store_true", help="Output format compact (lihat gemma_format.py)")
+    add_profiling_args(parser)
+    args = parser.parse_args()
+
+    if args.compact and args.incremental:
+        parser.error("--compact belum mendukung --incremental; jalankan `python gemma_format.py compact` setelah build")
+
+    with RunProfiler.from_args("convert_all", args) as profiler:
+        # ==== GABUNGKAN SEMUA FILE ====
+        with profiler.stage("discover") as stage:
+            # incremental: sha1 dari manifest untuk file yang tidak berubah, sisanya dihitung sekali
+            digests = manifest_digests(args.output, args.build_dir) if args.incremental else {}
+            all_files = unique_files(sorted(glob.glob(args.input_pattern)), digests)
+            stage.add(len(all_files))
+        print(f"📂 Ditemukan {len(all_files)} file JSON...")
+
+        output = args.output
+        if args.incremental:
+            total = build_incremental(all_files, output, args.build_dir, args.workers, profiler, digests)
+        elif args.compact:
+            output = compact_path(output)
+            total = build_compact(all_files, output, args.workers, profiler)
+        else:
+            total = build_full(all_files, output, args.workers, profiler)
+
+        print(f"\n🎉 Konversi selesai!")
+        print(f"📊 Total data siap training: {total}")
+        print(f"💾 File tersimpan sebagai: {output}")
+        profiler.set(mode="incremental" if args.incremental else "compact" if args.compact else "full",
+                     workers=args.workers)
+        profiler.add_file("output", output)
 
-# ==== SIMPAN HASIL ====
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(output, f, ensure_ascii=False, indent=2)
 
-print(f"\n🎉 Konversi selesai!")
-print(f"📊 Total data siap training: {len(output)}")
-print(f"💾 File tersimpan sebagai: {OUTPUT_FILE}")
+if __name__ == "__main__":
+    main()
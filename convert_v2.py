@@ -1,23 +1,12 @@
 import json
 
+from qa_parser import iter_qa_records
+
 # Ganti dengan nama file teks kamu
 input_file = "dataset_v2.txt"
 output_file = "dataset_v2.json"
 
-data = []
-entry = {}
-
-with open(input_file, "r", encoding="utf-8") as f:
-    for line in f:
-        line = line.strip()
-        if not line:
-            continue
-        if line.lower().startswith("q:"):
-            entry = {"Q": line[2:].strip()}
-        elif line.lower().startswith("a:"):
-            entry["A"] = line[2:].strip()
-            data.append(entry)
-            entry = {}
+data = [{"Q": r.question, "A": r.answer} for r in iter_qa_records(input_file)]
 
 # Simpan ke file JSON
 with open(output_file, "w", encoding="utf-8") as f:
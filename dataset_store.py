@@ -0,0 +1,341 @@
+"""
+Dataset store biner ter-index (offset table + blob UTF-8 yang di-memory-map)
+
+Layout <nama>.store/:
+    meta.json              jumlah record, daftar shard, vocab topic/subtopic, sumber
+    shard-00000.bin        record JSON UTF-8 disambung tanpa pemisah
+    shard-00000.idx        offset uint64 (count + 1) ke dalam .bin
+    topics.u16             kode topic per record (0 = tanpa topic)
+    subtopics.u16          kode subtopic per record
+
+Membuka store hanya membaca meta.json + memory-map file; akses record ke-i =
+dua lookup offset + satu slice mmap, tidak bergantung ukuran korpus.
+
+Input yang didukung: .jsonl / .json (messages, text, Q/A), .compact.jsonl, file Q/A .txt.
+
+Usage:
+    python dataset_store.py build train.jsonl
+    python dataset_store.py build dataset_gemma_fix.json --shard-size 100000
+    python dataset_store.py info train.store
+    python dataset_store.py get unsiq_full.store 42
+    python dataset_store.py topics unsiq_full.store
+    python dataset_store.py sample unsiq_full.store --topic "Pembayaran & Metode" -n 3
+"""
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from gemma_format import CompactDataset
+from jsonl_io import iter_records
+from qa_parser import iter_qa_records
+
+STORE_FORMAT = "pmb-store"
+STORE_VERSION = 1
+DEFAULT_SHARD_SIZE = 100_000
+NO_TOPIC = 0
+
+
+def store_path(path: str) -> str:
+    """train.jsonl -> train.store"""
+    name = str(path)
+    for suffix in (".compact.jsonl", ".jsonl", ".json", ".txt"):
+        if name.endswith(suffix):
+            return name[: -len(suffix)] + ".store"
+    return name + ".store"
+
+
+def iter_source_records(path: str) -> Iterator[Dict]:
+    """Record dict dari format apa pun yang dipakai di repo"""
+    path = str(path)
+    if path.endswith(".compact.jsonl"):
+        dataset = CompactDataset(path)
+        for idx in range(len(dataset)):
+            yield dataset[idx]
+    elif path.endswith(".txt"):
+        for record in iter_qa_records(path):
+            yield {"question": record.question, "answer": record.answer, "source": record.source, "line": record.line}
+    else:
+        yield from iter_records(path)
+
+
+def record_topics(record: Dict):
+    metadata = record.get("metadata") or {}
+    return metadata.get("topic"), metadata.get("subtopic")
+
+
+# ============================================================
+# ✍️ Build
+# ============================================================
+
+class _ShardWriter:
+    def __init__(self, root: Path, index: int):
+        self.name = f"shard-{index:05d}"
+        self.bin = open(root / f"{self.name}.bin", "wb")
+        self.offsets = [0]
+
+    def add(self, blob: bytes) -> None:
+        self.bin.write(blob)
+        self.offsets.append(self.offsets[-1] + len(blob))
+
+    def close(self, root: Path) -> Dict:
+        self.bin.close()
+        np.asarray(self.offsets, dtype=np.uint64).tofile(root / f"{self.name}.idx")
+        return {"name": self.name, "count": len(self.offsets) - 1}
+
+
+def build_store(input_path: str, output: Optional[str] = None, shard_size: int = DEFAULT_SHARD_SIZE) -> str:
+    """Konversi dataset ke store secara streaming (satu pass, tulis atomik via folder .tmp)"""
+    output = output or store_path(input_path)
+    tmp_root = Path(output + ".tmp")
+    if tmp_root.exists():
+        shutil.rmtree(tmp_root)
+    tmp_root.mkdir(parents=True)
+
+    vocab = {"topic": {}, "subtopic": {}}
+    topic_codes = []
+    subtopic_codes = []
+    shards = []
+    writer = None
+    count = 0
+
+    def code(kind: str, value: Optional[str]) -> int:
+        if value is None:
+            return NO_TOPIC
+        table = vocab[kind]
+        if value not in table:
+            table[value] = len(table) + 1
+        return table[value]
+
+    for record in iter_source_records(input_path):
+        if writer is None or len(writer.offsets) - 1 >= shard_size:
+            if writer is not None:
+                shards.append(writer.close(tmp_root))
+            writer = _ShardWriter(tmp_root, len(shards))
+        writer.add(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+        topic, subtopic = record_topics(record)
+        topic_codes.append(code("topic", topic))
+        subtopic_codes.append(code("subtopic", subtopic))
+        count += 1
+
+    if writer is not None:
+        shards.append(writer.close(tmp_root))
+
+    np.asarray(topic_codes, dtype=np.uint16).tofile(tmp_root / "topics.u16")
+    np.asarray(subtopic_codes, dtype=np.uint16).tofile(tmp_root / "subtopics.u16")
+    with open(tmp_root / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "format": STORE_FORMAT,
+            "version": STORE_VERSION,
+            "source": str(input_path),
+            "count": count,
+            "shards": shards,
+            "topics": sorted(vocab["topic"], key=vocab["topic"].get),
+            "subtopics": sorted(vocab["subtopic"], key=vocab["subtopic"].get),
+        }, f, ensure_ascii=False, indent=2)
+
+    if os.path.exists(output):
+        shutil.rmtree(output)
+    os.replace(tmp_root, output)
+    return output
+
+
+# ============================================================
+# 📖 Reader
+# ============================================================
+
+class DatasetStore:
+    """
+    Akses random O(1) ke record store
+
+    Usage:
+        store = DatasetStore("train.store")
+        store[10]                             # dict
+        store.raw(10)                         # memoryview bytes JSON (tanpa copy)
+        ids = store.ids_for(topic="Biaya")    # np.ndarray id
+        for record in store.iter_records(store.permutation(seed=42)): ...
+    """
+
+    def __init__(self, path: str):
+        self.root = Path(path)
+        with open(self.root / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != STORE_FORMAT:
+            raise ValueError(f"{path} bukan {STORE_FORMAT}")
+
+        self.topics: List[str] = self.meta["topics"]
+        self.subtopics: List[str] = self.meta["subtopics"]
+        self._files = []
+        self._blobs = []
+        self._offsets = []
+        starts = [0]
+        for shard in self.meta["shards"]:
+            self._offsets.append(np.fromfile(self.root / f"{shard['name']}.idx", dtype=np.uint64)
+                                 if shard["count"] else np.zeros(1, dtype=np.uint64))
+            self._blobs.append(self._map(self.root / f"{shard['name']}.bin"))
+            starts.append(starts[-1] + shard["count"])
+        self._shard_starts = np.asarray(starts, dtype=np.int64)
+
+        self._topic_codes = self._map_codes("topics.u16")
+        self._subtopic_codes = self._map_codes("subtopics.u16")
+
+    def _map(self, path: Path):
+        if path.stat().st_size == 0:
+            return memoryview(b"")
+        f = open(path, "rb")
+        self._files.append(f)
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _map_codes(self, name: str) -> np.ndarray:
+        path = self.root / name
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.uint16)
+        return np.memmap(path, dtype=np.uint16, mode="r", shape=(len(self),))
+
+    def close(self) -> None:
+        for blob in self._blobs:
+            blob.release()
+        for f in self._files:
+            f.close()
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    # ------------------------------------------------------------------
+    # Akses random
+    # ------------------------------------------------------------------
+    def raw(self, idx: int) -> memoryview:
+        """Bytes JSON record ke-idx sebagai memoryview ke mmap (zero-copy)"""
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        shard = int(np.searchsorted(self._shard_starts, idx, side="right")) - 1
+        local = idx - int(self._shard_starts[shard])
+        offsets = self._offsets[shard]
+        return self._blobs[shard][int(offsets[local]):int(offsets[local + 1])]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        return json.loads(bytes(self.raw(idx)))
+
+    def topic_of(self, idx: int) -> Optional[str]:
+        code = int(self._topic_codes[idx])
+        return self.topics[code - 1] if code else None
+
+    def subtopic_of(self, idx: int) -> Optional[str]:
+        code = int(self._subtopic_codes[idx])
+        return self.subtopics[code - 1] if code else None
+
+    # ------------------------------------------------------------------
+    # Filter & iterasi
+    # ------------------------------------------------------------------
+    def ids_for(self, topic: Optional[str] = None, subtopic: Optional[str] = None) -> np.ndarray:
+        """Id record dengan topic/subtopic tertentu (scan vectorized atas array kode uint16)"""
+        mask = np.ones(len(self), dtype=bool)
+        for value, names, codes in ((topic, self.topics, self._topic_codes),
+                                    (subtopic, self.subtopics, self._subtopic_codes)):
+            if value is None:
+                continue
+            if value not in names:
+                return np.zeros(0, dtype=np.int64)
+            mask &= codes == names.index(value) + 1
+        return np.flatnonzero(mask)
+
+    def topic_counts(self) -> Dict[str, int]:
+        counts = np.bincount(np.asarray(self._topic_codes), minlength=len(self.topics) + 1)
+        return {name: int(counts[i + 1]) for i, name in enumerate(self.topics)}
+
+    def permutation(self, seed: int = 0, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Urutan acak id (hanya array int, record tidak di-load)"""
+        ids = np.arange(len(self)) if ids is None else np.asarray(ids)
+        return np.random.default_rng(seed).permutation(ids)
+
+    def iter_raw(self, ids=None) -> Iterator[memoryview]:
+        """Iterasi memoryview per record; tanpa ids = urutan simpan, shard per shard"""
+        if ids is not None:
+            for idx in ids:
+                yield self.raw(int(idx))
+            return
+        for blob, offsets in zip(self._blobs, self._offsets):
+            for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+                yield blob[start:end]
+
+    def iter_records(self, ids=None) -> Iterator[Dict]:
+        for view in self.iter_raw(ids):
+            yield json.loads(bytes(view))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dataset store biner ter-index (mmap)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Konversi dataset ke store")
+    build.add_argument("input")
+    build.add_argument("--output")
+    build.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+
+    info = sub.add_parser("info")
+    info.add_argument("store")
+
+    get = sub.add_parser("get", help="Tampilkan record berdasarkan id")
+    get.add_argument("store")
+    get.add_argument("ids", type=int, nargs="+")
+
+    topics = sub.add_parser("topics", help="Jumlah record per topic")
+    topics.add_argument("store")
+
+    sample = sub.add_parser("sample", help="Contoh acak per topic/subtopic")
+    sample.add_argument("store")
+    sample.add_argument("--topic")
+    sample.add_argument("--subtopic")
+    sample.add_argument("-n", type=int, default=5)
+    sample.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        output = build_store(args.input, args.output, args.shard_size)
+        with DatasetStore(output) as store:
+            print(f"✅ {len(store)} record, {len(store.meta['shards'])} shard, "
+                  f"{len(store.topics)} topic -> {output}")
+        return
+
+    with DatasetStore(args.store) as store:
+        if args.command == "info":
+            size_mb = sum(p.stat().st_size for p in store.root.iterdir()) / 1e6
+            print(f"📦 {args.store} (sumber: {store.meta['source']})")
+            print(f"  • Record: {len(store)}")
+            print(f"  • Shard: {len(store.meta['shards'])}")
+            print(f"  • Topic: {len(store.topics)}, subtopic: {len(store.subtopics)}")
+            print(f"  • Ukuran: {size_mb:.2f} MB")
+        elif args.command == "get":
+            for idx in args.ids:
+                print(json.dumps(store[idx], ensure_ascii=False, indent=2))
+        elif args.command == "topics":
+            for name, count in sorted(store.topic_counts().items(), key=lambda x: -x[1]):
+                print(f"  • {name}: {count}")
+        else:
+            ids = store.ids_for(args.topic, args.subtopic)
+            print(f"🎲 {len(ids)} record cocok")
+            for record in store.iter_records(store.permutation(args.seed, ids)[:args.n]):
+                print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Bangun percakapan multi-turn dari dataset Q/A single-turn untuk training Gemma
+
+- Q/A dikelompokkan per metadata topic, subtopic yang sama berurutan di dalam topic,
+  lalu disusun menjadi percakapan yang mengisi context window (--max-length)
+- Satu giliran system per percakapan; giliran user/model memakai chat template Gemma
+- `labels` = token id pada jawaban model (termasuk <end_of_turn>), selain itu -100,
+  sehingga loss hanya dihitung pada giliran model
+- Urutan Q/A di dalam topic diacak deterministik (--seed); --passes N menghasilkan N
+  susunan berbeda, tiap Q/A muncul tepat sekali per pass
+- Record tanpa topic tidak digabung dengan record lain (tetap single-turn)
+
+Jalankan per split (mis. hanya train) agar Q/A dari split lain tidak masuk ke percakapan training.
+
+Usage:
+    python dialogue_builder.py unsiq_full.jsonl --tokenizer path/ke/tokenizer.json
+    python dialogue_builder.py dataset.json --tokenizer ... --passes 3 --max-turns 6
+"""
+
+import argparse
+import random
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dataset_store import iter_source_records, record_topics
+from gemma_format import SYSTEM_PROMPT, TEMPLATE, record_answer, record_question, render_dialogue
+from jsonl_io import JsonlWriter, iter_batches
+from profiling import RunProfiler, add_profiling_args
+from tokenizer_utils import TOKEN_CACHE_FILE, TokenCountCache, count_tokens, load_tokenizer, tokenizer_fingerprint
+
+MAX_LENGTH = 512
+MAX_TURNS = 8
+IGNORE_INDEX = -100
+NO_TOPIC = None
+
+
+class QAItem:
+    __slots__ = ("question", "answer", "topic", "subtopic", "system", "tokens")
+
+    def __init__(self, question: str, answer: str, topic: Optional[str], subtopic: Optional[str],
+                 system: Optional[str]):
+        self.question = question
+        self.answer = answer
+        self.topic = topic
+        self.subtopic = subtopic
+        self.system = system
+        self.tokens = 0
+
+
+def record_system(record: Dict) -> Optional[str]:
+    for message in record.get("messages", []):
+        if message.get("role") == "system":
+            return message.get("content")
+    return None
+
+
+def load_items(path: str) -> Tuple[List[QAItem], int]:
+    """Q/A dari dataset apa pun (messages, question/answer, text, compact, .txt); return (item, dilewati)"""
+    items, skipped = [], 0
+    for record in iter_source_records(path):
+        question, answer = record_question(record), record_answer(record)
+        if not question or not answer:
+            skipped += 1
+            continue
+        topic, subtopic = record_topics(record)
+        items.append(QAItem(question.strip(), answer.strip(), topic, subtopic, record_system(record)))
+    return items, skipped
+
+
+# ============================================================
+# 🧩 Susun percakapan
+# ============================================================
+
+def turn_overhead(tokenizer, system_prompt: str = SYSTEM_PROMPT, template: str = TEMPLATE) -> Tuple[int, int]:
+    """(token giliran system + BOS, token pembungkus satu turn user/model di luar isi Q/A)"""
+    empty_one, _ = render_dialogue([("", "")], system_prompt, template)
+    empty_two, _ = render_dialogue([("", ""), ("", "")], system_prompt, template)
+    one, two = count_tokens(tokenizer, [empty_one, empty_two], add_special_tokens=True)
+    return one - (two - one), two - one
+
+
+def measure_items(items: List[QAItem], tokenizer, cache: Optional[TokenCountCache] = None) -> None:
+    """Jumlah token isi pertanyaan + jawaban tiap item (batch, lewat cache jumlah token)"""
+    counts = count_tokens(tokenizer, [t for item in items for t in (item.question, item.answer)], cache)
+    for i, item in enumerate(items):
+        item.tokens = counts[2 * i] + counts[2 * i + 1]
+
+
+def topic_order(items: List[QAItem], seed: str, pass_no: int) -> Iterator[List[QAItem]]:
+    """Per topic: subtopic berurutan (acak antar subtopic), item di dalam subtopic diacak"""
+    topics: Dict[str, Dict[Optional[str], List[QAItem]]] = defaultdict(lambda: defaultdict(list))
+    untopiced = []
+    for item in items:
+        if item.topic is NO_TOPIC:
+            untopiced.append(item)
+        else:
+            topics[item.topic][item.subtopic].append(item)
+
+    for topic in sorted(topics):
+        rng = random.Random(f"{seed}:{pass_no}:{topic}")
+        subtopics = sorted(topics[topic], key=lambda s: s or "")
+        rng.shuffle(subtopics)
+        ordered = []
+        for subtopic in subtopics:
+            group = list(topics[topic][subtopic])
+            rng.shuffle(group)
+            ordered.extend(group)
+        yield ordered
+
+    for item in untopiced:
+        yield [item]
+
+
+def pack_topic(items: List[QAItem], budget: int, turn_tokens: int, max_turns: int) -> List[List[QAItem]]:
+    """Greedy berurutan: tambah turn selama estimasi token masih muat di budget"""
+    dialogues, current, used = [], [], 0
+    for item in items:
+        cost = item.tokens + turn_tokens
+        if current and (used + cost > budget or len(current) >= max_turns):
+            dialogues.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        dialogues.append(current)
+    return dialogues
+
+
+def encode_dialogue(turns: List[QAItem], tokenizer, system_prompt: str) -> Dict:
+    """Token id + labels (hanya token yang dimulai di dalam span jawaban model)"""
+    text, spans = render_dialogue([(t.question, t.answer) for t in turns], system_prompt)
+    encoding = tokenizer.encode(text, add_special_tokens=True)
+    labels = []
+    span_idx = 0
+    for token_id, (start, end) in zip(encoding.ids, encoding.offsets):
+        while span_idx < len(spans) and start >= spans[span_idx][1]:
+            span_idx += 1
+        inside = span_idx < len(spans) and spans[span_idx][0] <= start and end > start
+        labels.append(token_id if inside else IGNORE_INDEX)
+    return {"text": text, "input_ids": list(encoding.ids), "labels": labels}
+
+
+def build_dialogues(items: List[QAItem], tokenizer, max_length: int = MAX_LENGTH, max_turns: int = MAX_TURNS,
+                    passes: int = 1, seed: str = "pmb", profiler: Optional[RunProfiler] = None) -> Iterator[Dict]:
+    """
+    Yield record percakapan. Estimasi panjang dari jumlah token per potongan; jika hasil
+    tokenisasi penuh ternyata melebihi max_length, turn terakhir dipindah ke percakapan berikutnya
+    """
+    profiler = profiler or RunProfiler()
+    system_tokens, turn_tokens = turn_overhead(tokenizer)
+    budget = max_length - system_tokens
+
+    for pass_no in range(passes):
+        for ordered in topic_order(items, seed, pass_no):
+            with profiler.stage("pack", records=len(ordered)):
+                queue = pack_topic(ordered, budget, turn_tokens, max_turns)
+            while queue:
+                turns = queue.pop(0)
+                with profiler.stage("encode", records=1):
+                    record = encode_dialogue(turns, tokenizer, turns[0].system or SYSTEM_PROMPT)
+                if len(record["input_ids"]) > max_length and len(turns) > 1:
+                    if queue and len(queue[0]) < max_turns:
+                        queue[0].insert(0, turns.pop())
+                    else:
+                        queue.insert(0, [turns.pop()])
+                    queue.insert(0, turns)
+                    continue
+                if len(record["input_ids"]) > max_length:
+                    record["input_ids"] = record["input_ids"][:max_length]
+                    record["labels"] = record["labels"][:max_length]
+                    record["truncated"] = True
+                record["metadata"] = {
+                    "topic": turns[0].topic,
+                    "subtopics": list(dict.fromkeys(t.subtopic for t in turns if t.subtopic)),
+                    "turns": len(turns),
+                    "pass": pass_no,
+                }
+                yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bangun percakapan multi-turn per topic dari dataset Q/A")
+    parser.add_argument("input", help="Dataset (.jsonl / .json / .compact.jsonl / .txt)")
+    parser.add_argument("--tokenizer", required=True, help="Path tokenizer.json atau folder model")
+    parser.add_argument("--output", help="Default: <input>.dialogues.jsonl")
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--passes", type=int, default=1, help="Jumlah susunan acak berbeda (tiap Q/A sekali per pass)")
+    parser.add_argument("--seed", default="pmb")
+    parser.add_argument("--token-cache", default=TOKEN_CACHE_FILE)
+    add_profiling_args(parser)
+    args = parser.parse_args()
+
+    base = args.input.rsplit(".json", 1)[0] if ".json" in args.input else args.input.rsplit(".", 1)[0]
+    output = args.output or f"{base}.dialogues.jsonl"
+
+    print("=" * 80)
+    print(f"💬 DIALOGUE BUILDER (max_length={args.max_length}, max_turns={args.max_turns}, passes={args.passes})")
+    print("=" * 80)
+
+    with RunProfiler.from_args("dialogue_builder", args) as profiler:
+        with profiler.stage("load") as stage:
+            tokenizer = load_tokenizer(args.tokenizer)
+            items, skipped = load_items(args.input)
+            stage.add(len(items))
+        with profiler.stage("measure", records=len(items)):
+            cache = TokenCountCache(tokenizer_fingerprint(args.tokenizer), args.token_cache)
+            measure_items(items, tokenizer, cache)
+            cache.save()
+
+        dialogues = turns = real_tokens = label_tokens = truncated = 0
+        with JsonlWriter(output) as sink:
+            records = build_dialogues(items, tokenizer, args.max_length, args.max_turns, args.passes,
+                                      args.seed, profiler)
+            for batch in iter_batches(records):
+                with profiler.stage("write", records=len(batch)):
+                    sink.write_all(batch)
+                for record in batch:
+                    dialogues += 1
+                    turns += record["metadata"]["turns"]
+                    real_tokens += len(record["input_ids"])
+                    label_tokens += sum(1 for label in record["labels"] if label != IGNORE_INDEX)
+                    truncated += record.get("truncated", False)
+
+        # pembanding: satu Q/A per sequence (cara training sebelumnya)
+        system_tokens, turn_tokens = turn_overhead(tokenizer)
+        single_tokens = sum(min(system_tokens + turn_tokens + item.tokens, args.max_length) for item in items)
+        stats = {
+            "records": len(items),
+            "skipped": skipped,
+            "untopiced": sum(1 for item in items if item.topic is NO_TOPIC),
+            "dialogues": dialogues,
+            "turns": turns,
+            "truncated": truncated,
+            "fill": real_tokens / (dialogues * args.max_length) if dialogues else 0.0,
+            "fill_single_turn": single_tokens / (len(items) * args.max_length) if items else 0.0,
+            "label_tokens": label_tokens,
+        }
+        profiler.set(output=output, **stats)
+        profiler.add_file("input", args.input)
+        profiler.add_file("output", output)
+
+    print(f"\n📖 {stats['records']} Q/A dari {args.input} ({stats['skipped']} dilewati, "
+          f"{stats['untopiced']} tanpa topic)")
+    print(f"💬 {stats['dialogues']} percakapan, rata-rata {turns / max(dialogues, 1):.1f} turn")
+    print(f"📊 Context terisi: {stats['fill'] * 100:.1f}% (single-turn: {stats['fill_single_turn'] * 100:.1f}%)")
+    print(f"🎯 Token dengan loss (giliran model): {label_tokens} dari {real_tokens}")
+    if truncated:
+        print(f"⚠️  {truncated} percakapan 1-turn dipotong ke {args.max_length} token")
+    print(f"\n💾 Tersimpan: {output}")
+
+
+if __name__ == "__main__":
+    main()
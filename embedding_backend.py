@@ -0,0 +1,223 @@
+"""
+Backend embedding untuk CPU: fp32 (referensi), int8 (dynamic quantization), onnx
+
+    fp32 : SentenceTransformer biasa
+    int8 : torch.quantization.quantize_dynamic pada semua nn.Linear (bobot int8, aktivasi dinamis)
+    onnx : SentenceTransformer(backend="onnx") lewat onnxruntime (butuh optimum[onnxruntime])
+
+Semua backend dibungkus EmbeddingBackend: teks duplikat di-encode sekali, teks diurutkan
+per panjang sebelum di-batch (padding minimal), dan jumlah thread CPU bisa diatur.
+Vektor tiap backend di-cache terpisah di EmbeddingCache (<model>@int8, <model>@onnx;
+fp32 tetap memakai nama model agar cache lama terpakai).
+
+Usage:
+    python embedding_backend.py bench dataset_v3.txt --backends int8 onnx --threads 4
+    python embedding_backend.py bench dataset_v3.txt --limit 500 --batch-size 64
+    python similarity.py score dataset_v3.txt --backend int8 --threads 4 --check-agreement
+"""
+
+import argparse
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from profiling import RunProfiler, add_profiling_args
+
+DEFAULT_MODEL = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2'
+BACKENDS = ("fp32", "int8", "onnx")
+DEFAULT_BATCH_SIZE = 32
+# Selisih skor maksimum vs fp32 yang masih dianggap aman; pasangan dalam margin ini
+# dari threshold dihitung ulang dengan fp32 (lihat similarity.py --fp32-margin)
+AGREEMENT_MARGIN = 0.02
+
+
+def cache_name(model_name: str, backend: str) -> str:
+    """Nama model untuk EmbeddingCache; vektor backend berbeda tidak boleh tercampur"""
+    return model_name if backend == "fp32" else f"{model_name}@{backend}"
+
+
+def set_threads(threads: Optional[int]) -> None:
+    if not threads:
+        return
+    import torch
+    torch.set_num_threads(threads)
+
+
+def load_model(model_name: str, backend: str = "fp32", threads: Optional[int] = None):
+    """Model dengan interface SentenceTransformer.encode untuk backend yang dipilih"""
+    from sentence_transformers import SentenceTransformer
+
+    set_threads(threads)
+    if backend == "onnx":
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs={
+            "provider": "CPUExecutionProvider", "session_options": options,
+        })
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if backend == "int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+class EmbeddingBackend:
+    """
+    Encoder dengan interface encode() seperti SentenceTransformer (bisa dipakai EmbeddingCache)
+    Model di-load saat encode() pertama atau lewat load()
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, backend: str = "fp32",
+                 threads: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend tidak dikenal: {backend} (pilihan: {', '.join(BACKENDS)})")
+        self.model_name = model_name
+        self.backend = backend
+        self.threads = threads
+        self.batch_size = batch_size
+        self.name = cache_name(model_name, backend)
+        self.encoded = 0
+        self.encode_seconds = 0.0
+        self._model = None
+
+    def load(self) -> "EmbeddingBackend":
+        if self._model is None:
+            self._model = load_model(self.model_name, self.backend, self.threads)
+        return self
+
+    def encode(self, texts: Sequence[str], convert_to_numpy: bool = True, batch_size: Optional[int] = None,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        self.load()
+        unique = list(dict.fromkeys(texts))
+        if not unique:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # urut dari yang terpanjang: tiap batch berisi teks sepanjang mirip -> padding minimal
+        order = sorted(range(len(unique)), key=lambda i: -len(unique[i]))
+        batch_size = batch_size or self.batch_size
+        matrix = None
+        started = time.perf_counter()
+        n_batches = (len(order) + batch_size - 1) // batch_size
+        for b, start in enumerate(range(0, len(order), batch_size), 1):
+            idx = order[start:start + batch_size]
+            vectors = np.asarray(self._model.encode(
+                [unique[i] for i in idx], batch_size=len(idx), convert_to_numpy=True, show_progress_bar=False,
+            ), dtype=np.float32)
+            if matrix is None:
+                matrix = np.empty((len(unique), vectors.shape[1]), dtype=np.float32)
+            matrix[idx] = vectors
+            if show_progress_bar and (b % 20 == 0 or b == n_batches):
+                print(f"   ... {self.backend}: batch {b}/{n_batches}")
+        self.encode_seconds += time.perf_counter() - started
+        self.encoded += len(unique)
+
+        row = {text: i for i, text in enumerate(unique)}
+        return matrix[[row[text] for text in texts]]
+
+
+def compare_scores(reference: np.ndarray, candidate: np.ndarray, threshold: float) -> Dict:
+    """Kesepakatan skor backend vs fp32: selisih, korelasi, dan pasangan yang keputusan lulusnya berubah"""
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    diff = np.abs(candidate - reference)
+    flips = np.flatnonzero((reference > threshold) != (candidate > threshold))
+    pearson = float(np.corrcoef(reference, candidate)[0, 1]) if len(reference) > 1 else 1.0
+    return {
+        "pairs": int(len(reference)),
+        "max_abs_diff": round(float(diff.max()), 6) if len(diff) else 0.0,
+        "mean_abs_diff": round(float(diff.mean()), 6) if len(diff) else 0.0,
+        "pearson": round(pearson, 6),
+        "flips": int(len(flips)),
+        "flip_indices": flips.tolist(),
+        "agree": len(flips) == 0,
+    }
+
+
+def bench(data_file: str, backends: List[str], model_name: str, threads: Optional[int], batch_size: int,
+          limit: Optional[int], threshold: float, profiler: RunProfiler) -> Dict:
+    """Bandingkan kecepatan & kesepakatan tiap backend terhadap fp32 (tanpa cache, encode penuh)"""
+    from similarity import parse_qa_pairs, score_pairs
+
+    with profiler.stage("parse") as stage:
+        qa_pairs = parse_qa_pairs(data_file)[:limit] if limit else parse_qa_pairs(data_file)
+        stage.add(len(qa_pairs))
+    questions = [qa[0] for qa in qa_pairs]
+    answers = [qa[1] for qa in qa_pairs]
+    texts = questions + answers
+    print(f"📖 {len(qa_pairs)} pasangan Q-A ({len(set(texts))} teks unik) dari {data_file}")
+
+    results = {}
+    reference = None
+    for backend in ["fp32"] + [b for b in backends if b != "fp32"]:
+        encoder = EmbeddingBackend(model_name, backend, threads, batch_size)
+        print(f"\n🔄 {backend}: load model...")
+        with profiler.stage(f"{backend}:load"):
+            load_started = time.perf_counter()
+            encoder.load()
+            load_s = time.perf_counter() - load_started
+        with profiler.stage(f"{backend}:encode", records=len(set(texts))):
+            vectors = encoder.encode(texts, show_progress_bar=True)
+        scores = score_pairs(vectors[:len(questions)], vectors[len(questions):])
+
+        result = {"load_s": round(load_s, 2), "encode_s": round(encoder.encode_seconds, 2),
+                  "texts_per_s": round(encoder.encoded / encoder.encode_seconds, 1) if encoder.encode_seconds else None}
+        if reference is None:
+            reference = scores
+        else:
+            result.update(compare_scores(reference, scores, threshold))
+            result["speedup"] = round(results["fp32"]["encode_s"] / max(encoder.encode_seconds, 1e-9), 2)
+            result.pop("flip_indices")
+        results[backend] = result
+
+    return {"pairs": len(qa_pairs), "threads": threads, "batch_size": batch_size, "backends": results}
+
+
+def add_backend_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--backend", choices=BACKENDS, default="fp32", help="Backend embedding (default: fp32)")
+    parser.add_argument("--threads", type=int, help="Jumlah thread CPU untuk encode (default: semua core)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend embedding CPU (fp32 / int8 / onnx)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_bench = sub.add_parser("bench", help="Kecepatan & kesepakatan backend vs fp32")
+    p_bench.add_argument("data_file")
+    p_bench.add_argument("--backends", nargs="+", choices=BACKENDS, default=["int8", "onnx"])
+    p_bench.add_argument("--model", default=DEFAULT_MODEL)
+    p_bench.add_argument("--threads", type=int)
+    p_bench.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    p_bench.add_argument("--limit", type=int, help="Hanya N pasangan pertama")
+    p_bench.add_argument("--threshold", type=float, default=0.85)
+    add_profiling_args(p_bench)
+    args = parser.parse_args()
+
+    with RunProfiler.from_args("embedding_backend_bench", args) as profiler:
+        report = bench(args.data_file, args.backends, args.model, args.threads, args.batch_size,
+                       args.limit, args.threshold, profiler)
+        profiler.set(**report)
+
+    print("\n" + "=" * 80)
+    print(f"📊 BACKEND EMBEDDING ({report['pairs']} pasangan, threads={args.threads or 'auto'}, "
+          f"batch={args.batch_size})")
+    print("=" * 80)
+    print(f"{'backend':8s} {'load s':>8s} {'encode s':>9s} {'teks/s':>8s} {'speedup':>8s} "
+          f"{'max Δ':>8s} {'pearson':>8s} {'flip':>5s}")
+    for backend, r in report["backends"].items():
+        print(f"{backend:8s} {r['load_s']:8.2f} {r['encode_s']:9.2f} {r['texts_per_s'] or 0:8.1f} "
+              f"{r.get('speedup', 1.0):8.2f} {r.get('max_abs_diff', 0.0):8.4f} {r.get('pearson', 1.0):8.4f} "
+              f"{r.get('flips', 0):5d}")
+    worst = max((r.get("max_abs_diff", 0.0) for r in report["backends"].values()), default=0.0)
+    print(f"\n💡 Selisih maksimum {worst:.4f}; pakai --fp32-margin ≥ itu di similarity.py agar "
+          f"daftar lulus/gagal identik dengan fp32 (default {AGREEMENT_MARGIN})")
+
+
+if __name__ == "__main__":
+    main()
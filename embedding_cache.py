@@ -0,0 +1,352 @@
+"""
+Cache embedding persisten di disk untuk similarity.py
+Embedding disimpan sebagai matriks float16 (memory-mapped) + index hash -> baris,
+dengan key (nama model, teks yang dinormalisasi)
+
+Nama model saja tidak cukup untuk invalidasi: meta.json juga menyimpan fingerprint
+file model (hash config + ukuran weights, atau commit snapshot HuggingFace) yang dicek
+saat load, dan embedding teks probe tetap yang dicek saat model pertama kali dipakai.
+Jika salah satunya berbeda, cache direset.
+
+Usage:
+    python embedding_cache.py stats
+    python embedding_cache.py evict --older-than 30
+    python embedding_cache.py compact
+    python embedding_cache.py clear --model sentence-transformers/paraphrase-multilingual-mpnet-base-v2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+CACHE_DIR = ".embedding_cache"
+VECTORS_FILE = "vectors.f16"
+INDEX_FILE = "index.json"
+META_FILE = "meta.json"
+PROBE_TEXT = "Kapan pendaftaran mahasiswa baru UNSIQ gelombang 1 dibuka?"
+PROBE_MIN_COSINE = 0.999
+
+
+def normalize_text(text: str) -> str:
+    """Normalisasi teks sebelum di-hash: NFC, trim, dan spasi ganda dirapikan"""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_key(model_name: str, text: str) -> str:
+    """Key content-addressed untuk pasangan (model, teks)"""
+    payload = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+def model_slug(model_name: str) -> str:
+    """Nama folder yang aman untuk sebuah model"""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+
+
+def model_files_fingerprint(model_name: str) -> Optional[str]:
+    """
+    Fingerprint file model tanpa me-load model: hash isi config*.json + ukuran file weights
+    untuk folder lokal, atau commit snapshot di cache HuggingFace. None jika tidak ditemukan
+    """
+    path = Path(model_name)
+    if path.is_dir():
+        digest = hashlib.sha1()
+        for file in sorted(p for p in path.rglob("*") if p.is_file()):
+            rel = file.relative_to(path).as_posix()
+            if file.suffix == ".json":
+                digest.update(f"{rel}\0".encode("utf-8") + file.read_bytes())
+            elif file.suffix in (".safetensors", ".bin", ".onnx", ".pt"):
+                digest.update(f"{rel}\0{file.stat().st_size}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    hub_dir = os.environ.get("HF_HUB_CACHE") or os.path.join(
+        os.environ.get("HF_HOME", os.path.join(os.path.expanduser("~"), ".cache", "huggingface")), "hub")
+    ref = Path(hub_dir) / f"models--{model_name.replace('/', '--')}" / "refs" / "main"
+    if ref.exists():
+        return "hf:" + ref.read_text(encoding="utf-8").strip()
+    return None
+
+
+def probe_vector(model) -> np.ndarray:
+    """Embedding ter-normalisasi untuk PROBE_TEXT (sidik jari perilaku model)"""
+    vector = np.asarray(model.encode([PROBE_TEXT], convert_to_numpy=True), dtype=np.float32)[0]
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+def _write_json_atomic(path: Path, data) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class EmbeddingCache:
+    """
+    Store embedding per model: <cache_dir>/<model_slug>/{vectors.f16, index.json, meta.json}
+
+    index.json berisi {key: [row, last_used_timestamp]}. Baris yang sudah tidak
+    direferensikan index (hasil evict) baru dibuang saat compact().
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = CACHE_DIR):
+        self.model_name = model_name
+        self.root = Path(cache_dir) / model_slug(model_name)
+        self.vectors_path = self.root / VECTORS_FILE
+        self.index_path = self.root / INDEX_FILE
+        self.meta_path = self.root / META_FILE
+
+        self.dim: Optional[int] = None
+        self.index: Dict[str, List] = {}
+        self.files_fingerprint = model_files_fingerprint(model_name)
+        self.probe: Optional[List[float]] = None
+        self._probe_checked = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Load / simpan
+    # ------------------------------------------------------------------
+    def _load(self) -> None:
+        if not self.meta_path.exists():
+            return
+
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        # Invalidasi jika folder ternyata milik model lain
+        if meta.get("model_name") != self.model_name:
+            print(f"  ⚠️  Cache untuk model lain ({meta.get('model_name')}), cache direset")
+            self.clear()
+            return
+
+        # Nama sama tapi file model berubah (fine-tune ulang, snapshot baru)
+        stored = meta.get("files_fingerprint")
+        if stored and self.files_fingerprint and stored != self.files_fingerprint:
+            print("  ⚠️  File model berubah sejak cache dibuat, cache direset")
+            self.clear()
+            return
+
+        self.dim = meta.get("dim")
+        self.probe = meta.get("probe")
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+
+    def _save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        _write_json_atomic(self.meta_path, {
+            "model_name": self.model_name,
+            "dim": self.dim,
+            "dtype": "float16",
+            "files_fingerprint": self.files_fingerprint,
+            "probe": self.probe,
+        })
+        _write_json_atomic(self.index_path, self.index)
+
+    @property
+    def num_rows(self) -> int:
+        """Jumlah baris fisik di file vectors (termasuk baris yatim)"""
+        if not self.dim or not self.vectors_path.exists():
+            return 0
+        return self.vectors_path.stat().st_size // (self.dim * 2)
+
+    def _matrix(self) -> np.ndarray:
+        return np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(self.num_rows, self.dim))
+
+    # ------------------------------------------------------------------
+    # Lookup & encode
+    # ------------------------------------------------------------------
+    def missing(self, texts: List[str]) -> List[str]:
+        """Daftar teks unik yang belum ada di cache (urutan dipertahankan)"""
+        seen = set()
+        result = []
+        for text in texts:
+            key = text_key(self.model_name, text)
+            if key not in self.index and key not in seen:
+                seen.add(key)
+                result.append(text)
+        return result
+
+    def check_model(self, model) -> bool:
+        """
+        Bandingkan embedding PROBE_TEXT dengan yang tersimpan (sekali per sesi).
+        Jika berbeda (atau dimensinya berubah), cache direset; return True jika direset
+        """
+        if self._probe_checked:
+            return False
+        self._probe_checked = True
+        probe = probe_vector(model)
+        stored = np.asarray(self.probe, dtype=np.float32) if self.probe else None
+        changed = stored is not None and (
+            stored.shape != probe.shape or float(stored @ probe) < PROBE_MIN_COSINE)
+        if self.index and self.dim not in (None, probe.shape[0]):
+            changed = True
+        if changed:
+            print("  ⚠️  Embedding probe berbeda dari cache (model berubah walau namanya sama), cache direset")
+            self.clear()
+        self.probe = [round(float(x), 6) for x in probe]
+        return changed
+
+    def encode(self, texts: List[str], model, **encode_kwargs) -> np.ndarray:
+        """
+        Ambil embedding untuk texts; hanya cache miss yang di-encode oleh model
+
+        Returns: np.ndarray float32 berukuran (len(texts), dim)
+        """
+        keys = [text_key(self.model_name, t) for t in texts]
+        miss_texts = self.missing(texts)
+        if miss_texts:
+            if model is None:
+                raise ValueError("Model diperlukan untuk meng-encode cache miss")
+            # Model baru dipakai: pastikan vektor lama memang dari model yang sama
+            if self.check_model(model):
+                miss_texts = self.missing(texts)
+        self.misses += len(miss_texts)
+        self.hits += len(texts) - len(miss_texts)
+
+        if miss_texts:
+            new_vectors = np.asarray(
+                model.encode(miss_texts, convert_to_numpy=True, **encode_kwargs),
+                dtype=np.float32,
+            )
+            self._append(miss_texts, new_vectors)
+
+        now = int(time.time())
+        rows = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            entry = self.index[key]
+            entry[1] = now
+            rows[i] = entry[0]
+        self._save()
+
+        if len(keys) == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.asarray(self._matrix()[rows], dtype=np.float32)
+
+    def _append(self, texts: List[str], vectors: np.ndarray) -> None:
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            # check_model() sudah mereset cache jika dimensi berubah; ini berarti model
+            # tidak konsisten di dalam satu sesi, dan cache hit sebelumnya tidak bisa dipakai
+            raise ValueError(f"Dimensi embedding berubah di tengah sesi ({self.dim} -> {vectors.shape[1]})")
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        start = self.num_rows
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.astype(np.float16).tobytes())
+
+        now = int(time.time())
+        for offset, text in enumerate(texts):
+            self.index[text_key(self.model_name, text)] = [start + offset, now]
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    def evict(self, older_than_days: float) -> int:
+        """Hapus entry yang tidak dipakai lebih dari N hari dari index"""
+        cutoff = time.time() - older_than_days * 86400
+        stale = [key for key, (_, used) in self.index.items() if used < cutoff]
+        for key in stale:
+            del self.index[key]
+        self._save()
+        return len(stale)
+
+    def compact(self) -> int:
+        """Tulis ulang file vectors hanya dengan baris yang masih direferensikan"""
+        if not self.index or not self.dim:
+            removed = self.num_rows
+            self.clear()
+            return removed
+
+        keys = sorted(self.index, key=lambda k: self.index[k][0])
+        old_rows = np.array([self.index[k][0] for k in keys], dtype=np.int64)
+        removed = self.num_rows - len(keys)
+
+        compacted = np.array(self._matrix()[old_rows])
+        tmp_path = self.vectors_path.with_suffix(".tmp")
+        compacted.tofile(tmp_path)
+        os.replace(tmp_path, self.vectors_path)
+
+        for new_row, key in enumerate(keys):
+            self.index[key][0] = new_row
+        self._save()
+        return removed
+
+    def clear(self) -> None:
+        """Hapus seluruh cache untuk model ini"""
+        if self.root.exists():
+            shutil.rmtree(self.root)
+        self.index = {}
+        self.dim = None
+        self.probe = None
+
+    def stats(self) -> Dict:
+        size_bytes = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        return {
+            "model_name": self.model_name,
+            "entries": len(self.index),
+            "rows": self.num_rows,
+            "orphan_rows": self.num_rows - len(self.index),
+            "dim": self.dim,
+            "size_mb": size_bytes / 1e6,
+        }
+
+
+def list_cached_models(cache_dir: str = CACHE_DIR) -> List[str]:
+    """Nama model yang punya cache di cache_dir"""
+    models = []
+    for meta_path in sorted(Path(cache_dir).glob(f"*/{META_FILE}")):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            models.append(json.load(f)["model_name"])
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kelola cache embedding similarity.py")
+    parser.add_argument("command", choices=["stats", "evict", "compact", "clear"])
+    parser.add_argument("--model", help="Nama model (default: semua model di cache)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--older-than", type=float, default=30, help="Umur maksimum entry (hari) untuk evict")
+    args = parser.parse_args()
+
+    models = [args.model] if args.model else list_cached_models(args.cache_dir)
+    if not models:
+        print(f"📭 Cache kosong: {args.cache_dir}")
+        return
+
+    for model_name in models:
+        cache = EmbeddingCache(model_name, args.cache_dir)
+        print(f"\n📦 {model_name}")
+
+        if args.command == "evict":
+            removed = cache.evict(args.older_than)
+            print(f"  🗑️  {removed} entry tidak dipakai > {args.older_than:g} hari dihapus dari index")
+        elif args.command == "compact":
+            removed = cache.compact()
+            print(f"  🗜️  {removed} baris yatim dibuang")
+        elif args.command == "clear":
+            cache.clear()
+            print("  🗑️  Cache dihapus")
+            continue
+
+        stats = cache.stats()
+        print(f"  • Entries: {stats['entries']}")
+        print(f"  • Baris fisik: {stats['rows']} (yatim: {stats['orphan_rows']})")
+        print(f"  • Dimensi: {stats['dim']}")
+        print(f"  • Ukuran: {stats['size_mb']:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
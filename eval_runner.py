@@ -0,0 +1,335 @@
+"""
+Evaluasi model PMB atas uji.json / test.jsonl dengan batched generation yang bisa di-resume
+
+- Item dibagi ke shard (--shard i/n) sehingga beberapa GPU/proses bisa jalan paralel
+- Setiap hasil langsung di-append ke JSONL (checkpoint); run ulang melewati id yang sudah selesai
+- Batch yang gagal (mis. OOM) dipecah dua dan dicoba ulang
+- Skor dihitung sekaligus (vectorized): cosine embedding + F1 leksikal terhadap `expected`
+- Laporan kualitas + throughput & percentile latency
+
+Usage:
+    python eval_runner.py run --data uji.json test.jsonl --batch-size 8
+    python eval_runner.py run --data uji.json --shard 0/2 & python eval_runner.py run --data uji.json --shard 1/2
+    python eval_runner.py score eval_results*.jsonl
+    python eval_runner.py run --backend echo --data uji.json          # uji pipeline tanpa model
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from typing import Dict, Iterator, List, Set
+
+import numpy as np
+
+from inference_server import add_backend_args, build_backend
+from jsonl_io import iter_jsonl
+from tokenizer_utils import percentiles
+
+DEFAULT_DATA = ["uji.json", "test.jsonl"]
+OUTPUT_FILE = "eval_results.jsonl"
+REPORT_FILE = "eval_report.json"
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+PASS_THRESHOLD = 0.75
+
+
+# ============================================================
+# 📖 Data evaluasi
+# ============================================================
+
+def iter_eval_items(path: str) -> Iterator[Dict]:
+    """
+    Item {id, source, question, expected} dari uji.json (list id/question/expected)
+    atau file messages JSONL (user -> pertanyaan, assistant/model -> expected)
+    """
+    source = os.path.basename(path)
+    if path.endswith(".jsonl"):
+        for idx, record in enumerate(iter_jsonl(path), start=1):
+            messages = record.get("messages", [])
+            question = next((m["content"] for m in messages if m["role"] == "user"), None)
+            expected = next((m["content"] for m in messages if m["role"] in ("assistant", "model")), "")
+            if question:
+                yield {"id": f"{source}:{idx}", "source": source, "question": question, "expected": expected}
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for idx, item in enumerate(data, start=1):
+        yield {
+            "id": f"{source}:{item.get('id', idx)}",
+            "source": source,
+            "question": item["question"],
+            "expected": item.get("expected", ""),
+        }
+
+
+def parse_shard(value: str):
+    index, count = (int(x) for x in value.split("/"))
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard tidak valid: {value}")
+    return index, count
+
+
+def shard_output_path(output: str, shard) -> str:
+    index, count = shard
+    if count == 1:
+        return output
+    base = output.rsplit(".jsonl", 1)[0]
+    return f"{base}.shard-{index}-of-{count}.jsonl"
+
+
+# ============================================================
+# 💾 Checkpoint append-only
+# ============================================================
+
+def load_completed(path: str) -> Set[str]:
+    """
+    Id yang sudah selesai (tanpa error). Baris terakhir yang terpotong karena crash
+    dibuang supaya append berikutnya tetap JSONL valid.
+    """
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            print(f"⚠️  Baris terakhir {path} terpotong, dibuang")
+
+    completed = set()
+    for record in iter_jsonl(path):
+        if "error" not in record:
+            completed.add(record["id"])
+    return completed
+
+
+def generate_with_retry(backend, batch: List[Dict]) -> List[Dict]:
+    """Generate satu batch; jika gagal, pecah dua sampai per item (item gagal dicatat sebagai error)"""
+    started = time.perf_counter()
+    try:
+        outputs = backend.generate_batch([item["question"] for item in batch])
+    except Exception as e:
+        if len(batch) == 1:
+            return [dict(batch[0], error=str(e))]
+        print(f"⚠️  Batch {len(batch)} gagal ({e.__class__.__name__}), dipecah dua")
+        mid = len(batch) // 2
+        return generate_with_retry(backend, batch[:mid]) + generate_with_retry(backend, batch[mid:])
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return [
+        dict(item, answer=answer, tokens=n_tokens, latency_ms=round(elapsed_ms, 2), batch_size=len(batch))
+        for item, (answer, n_tokens) in zip(batch, outputs)
+    ]
+
+
+def run_eval(backend, items: List[Dict], output: str, batch_size: int) -> Dict:
+    completed = load_completed(output)
+    pending = [item for item in items if item["id"] not in completed]
+    print(f"📋 {len(items)} item di shard ini, {len(completed & {i['id'] for i in items})} sudah selesai, "
+          f"{len(pending)} dikerjakan")
+
+    started = time.perf_counter()
+    n_done = n_errors = 0
+    # urutkan per panjang pertanyaan supaya padding dalam satu batch minimal
+    pending.sort(key=lambda item: len(item["question"]))
+    with open(output, "a", encoding="utf-8") as f:
+        for start in range(0, len(pending), batch_size):
+            for result in generate_with_retry(backend, pending[start:start + batch_size]):
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+                n_errors += "error" in result
+                n_done += 1
+            f.flush()
+            os.fsync(f.fileno())
+            print(f"   ✓ {n_done}/{len(pending)}", end="\r")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n⏱️  {n_done} item dalam {elapsed:.1f}s ({n_errors} error)")
+    return {"generated": n_done, "errors": n_errors, "wall_s": elapsed}
+
+
+# ============================================================
+# 📊 Scoring
+# ============================================================
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def lexical_f1(predictions: List[str], references: List[str]) -> np.ndarray:
+    """F1 token (bag-of-words) per pasangan, dihitung lewat matriks count"""
+    pred_tokens = [tokenize(t) for t in predictions]
+    ref_tokens = [tokenize(t) for t in references]
+    vocab: Dict[str, int] = {}
+    for tokens in pred_tokens + ref_tokens:
+        for token in tokens:
+            vocab.setdefault(token, len(vocab))
+
+    def counts(token_lists):
+        matrix = np.zeros((len(token_lists), max(len(vocab), 1)), dtype=np.int32)
+        rows = np.repeat(np.arange(len(token_lists)), [len(t) for t in token_lists])
+        cols = np.fromiter((vocab[t] for tokens in token_lists for t in tokens), dtype=np.int64)
+        np.add.at(matrix, (rows, cols), 1)
+        return matrix
+
+    pred, ref = counts(pred_tokens), counts(ref_tokens)
+    overlap = np.minimum(pred, ref).sum(axis=1)
+    pred_len, ref_len = pred.sum(axis=1), ref.sum(axis=1)
+    precision = np.divide(overlap, pred_len, out=np.zeros(len(pred), dtype=np.float64), where=pred_len > 0)
+    recall = np.divide(overlap, ref_len, out=np.zeros(len(pred), dtype=np.float64), where=ref_len > 0)
+    total = precision + recall
+    return np.divide(2 * precision * recall, total, out=np.zeros_like(total), where=total > 0)
+
+
+def embedding_cosine(predictions: List[str], references: List[str], model_name: str) -> np.ndarray:
+    """Cosine similarity jawaban vs expected (batch encode + cache embedding di disk)"""
+    from sentence_transformers import SentenceTransformer
+
+    from embedding_cache import EmbeddingCache
+    from similarity import score_pairs
+
+    cache = EmbeddingCache(model_name)
+    model = SentenceTransformer(model_name) if cache.missing(predictions + references) else None
+    embeddings = cache.encode(predictions + references, model, batch_size=32, show_progress_bar=False)
+    return score_pairs(embeddings[:len(predictions)], embeddings[len(predictions):])
+
+
+def load_results(paths: List[str]) -> List[Dict]:
+    """Gabungkan hasil semua shard; id yang muncul lebih dari sekali pakai hasil terakhir"""
+    results: Dict[str, Dict] = {}
+    for path in paths:
+        for record in iter_jsonl(path):
+            if "error" not in record or record["id"] not in results:
+                results[record["id"]] = record
+    return list(results.values())
+
+
+def score_results(results: List[Dict], embedding_model: str = None, pass_threshold: float = PASS_THRESHOLD) -> Dict:
+    ok = [r for r in results if "error" not in r]
+    predictions = [r["answer"] for r in ok]
+    references = [r["expected"] for r in ok]
+
+    f1 = lexical_f1(predictions, references) if ok else np.zeros(0)
+    cosine = embedding_cosine(predictions, references, embedding_model) if ok and embedding_model else None
+
+    for i, r in enumerate(ok):
+        r["f1"] = round(float(f1[i]), 4)
+        if cosine is not None:
+            r["cosine"] = round(float(cosine[i]), 4)
+
+    latencies = [r["latency_ms"] for r in ok]
+    tokens = sum(r.get("tokens", 0) for r in ok)
+    # waktu generate per batch dihitung sekali (semua item satu batch berbagi latency yang sama)
+    generate_s = sum(r["latency_ms"] / r["batch_size"] for r in ok) / 1000
+
+    report = {
+        "items": len(results),
+        "errors": len(results) - len(ok),
+        "quality": {
+            "lexical_f1_mean": round(float(f1.mean()), 4) if ok else 0.0,
+        },
+        "performance": {
+            "items_per_s": round(len(ok) / generate_s, 2) if generate_s else 0.0,
+            "tokens_per_s": round(tokens / generate_s, 2) if generate_s else 0.0,
+            "latency_ms": percentiles(latencies),
+        },
+        "by_source": {},
+    }
+    if cosine is not None:
+        report["quality"].update({
+            "embedding_model": embedding_model,
+            "cosine_mean": round(float(cosine.mean()), 4),
+            "pass_threshold": pass_threshold,
+            "pass_rate": round(float((cosine >= pass_threshold).mean()), 4),
+        })
+
+    for source in sorted({r["source"] for r in ok}):
+        mask = np.array([r["source"] == source for r in ok])
+        entry = {"items": int(mask.sum()), "lexical_f1_mean": round(float(f1[mask].mean()), 4)}
+        if cosine is not None:
+            entry["cosine_mean"] = round(float(cosine[mask].mean()), 4)
+        report["by_source"][source] = entry
+    return report
+
+
+def print_report(report: Dict) -> None:
+    quality, perf = report["quality"], report["performance"]
+    print("\n" + "=" * 80)
+    print("📊 HASIL EVALUASI")
+    print("=" * 80)
+    print(f"  • Item: {report['items']} (error: {report['errors']})")
+    print(f"  • Lexical F1 rata-rata: {quality['lexical_f1_mean']:.4f}")
+    if "cosine_mean" in quality:
+        print(f"  • Cosine rata-rata: {quality['cosine_mean']:.4f}")
+        print(f"  • Lolos (cosine >= {quality['pass_threshold']}): {quality['pass_rate']*100:.1f}%")
+    print(f"\n⚡ Performa:")
+    print(f"  • Throughput: {perf['items_per_s']} item/s, {perf['tokens_per_s']} token/s")
+    lat = perf["latency_ms"]
+    print(f"  • Latency p50/p95/p99: {lat['p50']} / {lat['p95']} / {lat['p99']} ms")
+    for source, entry in report["by_source"].items():
+        extra = f", cosine {entry['cosine_mean']:.4f}" if "cosine_mean" in entry else ""
+        print(f"  • {source}: {entry['items']} item, F1 {entry['lexical_f1_mean']:.4f}{extra}")
+
+
+def score_command(paths: List[str], args) -> None:
+    results = load_results(paths)
+    embedding_model = None if args.no_embedding else args.embedding_model
+    report = score_results(results, embedding_model, args.pass_threshold)
+    report["inputs"] = paths
+    print_report(report)
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump({"report": report, "details": results}, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Laporan tersimpan: {args.report}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluasi batched & resumable untuk model PMB")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Generate jawaban (checkpoint per batch)")
+    add_backend_args(run)
+    run.add_argument("--data", nargs="+", default=DEFAULT_DATA)
+    run.add_argument("--output", default=OUTPUT_FILE)
+    run.add_argument("--shard", type=parse_shard, default=(0, 1), help="i/n, mis. 0/2")
+    run.add_argument("--batch-size", type=int, default=8)
+    run.add_argument("--no-score", action="store_true", help="Jangan langsung scoring setelah run")
+
+    score = sub.add_parser("score", help="Scoring gabungan hasil semua shard")
+    score.add_argument("results", nargs="+")
+
+    for p in (run, score):
+        p.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+        p.add_argument("--no-embedding", action="store_true", help="Hanya skor leksikal")
+        p.add_argument("--pass-threshold", type=float, default=PASS_THRESHOLD)
+        p.add_argument("--report", default=REPORT_FILE)
+    args = parser.parse_args()
+
+    if args.command == "score":
+        paths = sorted({p for pattern in args.results for p in (glob.glob(pattern) or [pattern])})
+        score_command(paths, args)
+        return
+
+    index, count = args.shard
+    items = [item for path in args.data for item in iter_eval_items(path)]
+    items = items[index::count]
+    output = shard_output_path(args.output, args.shard)
+
+    print("=" * 80)
+    print(f"🧪 EVALUASI {', '.join(args.data)} (shard {index}/{count}) -> {output}")
+    print("=" * 80)
+
+    backend = build_backend(args)
+    run_eval(backend, items, output, args.batch_size)
+
+    if not args.no_score:
+        if count > 1:
+            print(f"ℹ️  Mode shard: jalankan `python eval_runner.py score {args.output.rsplit('.jsonl', 1)[0]}*.jsonl` "
+                  f"setelah semua shard selesai")
+        else:
+            score_command([output], args)
+
+
+if __name__ == "__main__":
+    main()
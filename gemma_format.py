@@ -0,0 +1,466 @@
+"""
+System prompt, template chat Gemma, dan format dataset compact
+
+Format compact (JSONL) menyimpan system prompt & template sekali di header,
+setiap string pertanyaan/jawaban unik sekali di tabel string, dan record
+hanya berisi id:
+
+    {"header": {"format": "gemma-compact", "version": 1, "system_prompt": ..., "template": ...}}
+    {"s": 0, "t": "Berapa biaya kuliah ...?"}
+    {"s": 1, "t": "Biaya kuliah ..."}
+    {"q": 0, "a": 1}
+
+Field `text` dirender saat batch dibuat (CompactDataset), hasilnya identik
+dengan record JSONL biasa. Untuk training, CompactDataset.tokenize() menokenisasi
+setiap string unik sekali (jawaban yang dipakai ulang oleh semua variasi pertanyaan
+tidak ditokenisasi ulang) dan token_ids() menyusun sample dari potongan template.
+
+Usage:
+    python gemma_format.py compact dataset_gemma_fix.jsonl
+    python gemma_format.py expand dataset_gemma_fix.compact.jsonl
+    python gemma_format.py tokens dataset_gemma_fix.compact.jsonl --tokenizer path/ke/tokenizer.json
+"""
+
+import argparse
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from jsonl_io import JsonlWriter, iter_jsonl, iter_records
+from tokenizer_utils import DEFAULT_BATCH_SIZE, encode_batch, load_tokenizer
+
+SYSTEM_PROMPT = (
+    "Anda adalah asisten virtual untuk Penerimaan Mahasiswa Baru (PMB) di "
+    "Universitas Sains Al-Qur'an (UNSIQ) Wonosobo.\n"
+    "Tugas Anda adalah memberikan informasi yang akurat, jelas, dan membantu calon mahasiswa "
+    "dalam proses pendaftaran.\n"
+    "Jawab pertanyaan dengan ramah, informatif, dan profesional."
+)
+
+TEMPLATE = (
+    "<start_of_turn>system\n{system}<end_of_turn>\n"
+    "<start_of_turn>user\n{question}<end_of_turn>\n"
+    "<start_of_turn>model\n{answer}<end_of_turn>"
+)
+
+COMPACT_FORMAT = "gemma-compact"
+COMPACT_VERSION = 1
+
+
+def render_text(question: str, answer: str, system_prompt: str = SYSTEM_PROMPT, template: str = TEMPLATE) -> str:
+    """Render satu sample ke chat template Gemma"""
+    return template.format(system=system_prompt, question=question, answer=answer)
+
+
+def format_context(question: str, passages: Sequence[str]) -> str:
+    """Sisipkan potongan rujukan (retrieval) ke giliran user, sebelum pertanyaan"""
+    if not passages:
+        return question
+    references = "\n".join(f"- {p}" for p in passages)
+    return f"Informasi rujukan:\n{references}\n\nPertanyaan: {question}"
+
+
+def build_prompt(question: str, system_prompt: str = SYSTEM_PROMPT, template: str = TEMPLATE,
+                 context: Optional[Sequence[str]] = None) -> str:
+    """
+    Prompt inference: template training sampai awal giliran model.
+    Konteks retrieval (jika ada) masuk ke giliran user supaya prefix system tetap sama
+    """
+    model_turn = template.index("{answer}")
+    return template[:model_turn].format(system=system_prompt, question=format_context(question, context))
+
+
+def prompt_prefix(system_prompt: str = SYSTEM_PROMPT, template: str = TEMPLATE) -> str:
+    """Bagian prompt yang sama untuk semua request (giliran system), untuk reuse KV cache"""
+    user_turn = template.index("{question}")
+    prefix = template[:user_turn].format(system=system_prompt)
+    return prefix[:prefix.rindex("<start_of_turn>user")]
+
+
+def template_segments(system_prompt: str = SYSTEM_PROMPT, template: str = TEMPLATE) -> Tuple[str, str, str]:
+    """Potongan template di sekitar pertanyaan & jawaban: (sebelum q, antara q dan a, setelah a)"""
+    q_at = template.index("{question}")
+    a_at = template.index("{answer}")
+    if a_at < q_at:
+        raise ValueError("Template harus memuat {question} sebelum {answer}")
+    return (
+        template[:q_at].format(system=system_prompt),
+        template[q_at + len("{question}"):a_at].format(system=system_prompt),
+        template[a_at + len("{answer}"):].format(system=system_prompt),
+    )
+
+
+def render_dialogue(turns: Sequence[Tuple[str, str]], system_prompt: str = SYSTEM_PROMPT,
+                    template: str = TEMPLATE) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Render percakapan multi-turn [(pertanyaan, jawaban), ...] dengan satu giliran system.
+    Return (teks, span karakter tiap jawaban model termasuk penutup giliran) untuk loss mask.
+    Satu turn menghasilkan teks yang sama dengan render_text()
+    """
+    prefix, middle, suffix = template_segments(system_prompt, template)
+    system_turn = prompt_prefix(system_prompt, template)
+    user_open = prefix[len(system_turn):]
+    separator = system_turn[len(system_turn.rstrip()):]
+
+    parts = [system_turn]
+    spans = []
+    length = len(system_turn)
+    for i, (question, answer) in enumerate(turns):
+        opener = (separator if i else "") + user_open + question + middle
+        parts.append(opener)
+        length += len(opener)
+        parts.append(answer + suffix)
+        spans.append((length, length + len(answer) + len(suffix)))
+        length = spans[-1][1]
+    return "".join(parts), spans
+
+
+def compact_path(path: str) -> str:
+    """dataset_gemma_fix.jsonl -> dataset_gemma_fix.compact.jsonl"""
+    for suffix in (".jsonl", ".json"):
+        if path.endswith(suffix):
+            return path[: -len(suffix)] + ".compact.jsonl"
+    return path + ".compact.jsonl"
+
+
+def expanded_path(path: str) -> str:
+    """dataset.compact.jsonl -> dataset.jsonl; nama lain -> <nama>.expanded.jsonl (tidak pernah = input)"""
+    if path.endswith(".compact.jsonl"):
+        return path[: -len(".compact.jsonl")] + ".jsonl"
+    for suffix in (".jsonl", ".json"):
+        if path.endswith(suffix):
+            return path[: -len(suffix)] + ".expanded.jsonl"
+    return path + ".expanded.jsonl"
+
+
+# ============================================================
+# 🔎 Q/A dari record
+# ============================================================
+
+def _turn(record: Dict, roles) -> Optional[str]:
+    for message in record.get("messages", []):
+        if message.get("role") in roles:
+            return message.get("content")
+    return None
+
+
+def record_answer(record: Dict) -> Optional[str]:
+    """Jawaban dari record apa pun: key answer, giliran model/assistant, atau field text"""
+    if record.get("answer"):
+        return record["answer"]
+    answer = _turn(record, ("model", "assistant"))
+    if answer:
+        return answer
+    text = record.get("text", "")
+    if "<start_of_turn>model\n" in text:
+        return text.split("<start_of_turn>model\n", 1)[1].split("<end_of_turn>", 1)[0]
+    return None
+
+
+def record_question(record: Dict) -> Optional[str]:
+    """Pertanyaan dari key question atau giliran user"""
+    return record.get("question") or _turn(record, ("user",))
+
+
+# ============================================================
+# ✍️ Writer
+# ============================================================
+
+class CompactWriter:
+    """
+    Tulis dataset compact secara streaming; string yang sama hanya ditulis sekali
+
+    Usage:
+        with CompactWriter("out.compact.jsonl") as w:
+            w.add(question, answer)
+    """
+
+    def __init__(self, path: str, system_prompt: str = SYSTEM_PROMPT, template: str = TEMPLATE):
+        self.path = path
+        self.system_prompt = system_prompt
+        self.template = template
+        self.string_ids: Dict[str, int] = {}
+        self.count = 0
+        self._sink = JsonlWriter(path)
+
+    def __enter__(self):
+        self._sink.__enter__()
+        self._sink.write({"header": {
+            "format": COMPACT_FORMAT,
+            "version": COMPACT_VERSION,
+            "system_prompt": self.system_prompt,
+            "template": self.template,
+        }})
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._sink.__exit__(exc_type, exc, tb)
+
+    def _intern(self, text: str) -> int:
+        sid = self.string_ids.get(text)
+        if sid is None:
+            sid = len(self.string_ids)
+            self.string_ids[text] = sid
+            self._sink.write({"s": sid, "t": text})
+        return sid
+
+    def add(self, question: str, answer: str, metadata: Optional[Dict] = None) -> None:
+        record = {"q": self._intern(question), "a": self._intern(answer)}
+        if metadata is not None:
+            record["m"] = metadata
+        self._sink.write(record)
+        self.count += 1
+
+    def add_all(self, records: Iterable[Dict]) -> int:
+        """
+        Tambahkan record berformat biasa: key question/answer atau messages (giliran
+        user/model), opsional metadata. Giliran system di messages tidak disimpan (header
+        memakai self.system_prompt). ValueError jika pertanyaan/jawaban tidak ditemukan
+        """
+        for n, r in enumerate(records, start=1):
+            question, answer = record_question(r), record_answer(r)
+            if question is None or answer is None:
+                raise ValueError(f"record ke-{n} tidak punya pertanyaan/jawaban "
+                                 f"(butuh question/answer atau messages user/model): {sorted(r)}")
+            self.add(question, answer, r.get("metadata"))
+        return self.count
+
+
+# ============================================================
+# 📖 Loader
+# ============================================================
+
+class CompactDataset:
+    """
+    Loader dataset compact: hanya id (array uint32) yang disimpan per record,
+    `text` dirender lazily saat diakses / saat batch dibuat.
+    Setelah tokenize(), token id tiap string unik disimpan rata di satu array uint32
+    dan dipakai ulang oleh semua record yang merujuk string tersebut.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.strings: List[str] = []
+        self.question_ids = array("I")
+        self.answer_ids = array("I")
+        self.metadata: Dict[int, Dict] = {}
+        self.system_prompt = SYSTEM_PROMPT
+        self.template = TEMPLATE
+        self.token_data: Optional[array] = None
+        self.token_offsets: Optional[array] = None
+        self.segments_exact = False
+        self.inexact_strings: set = set()
+        self.tokens_encoded = 0
+        self._tokenizer = None
+        self._segment_ids: Tuple[List[int], List[int], List[int]] = ([], [], [])
+
+        for line in iter_jsonl(path):
+            if "q" in line:
+                if "m" in line:
+                    self.metadata[len(self.question_ids)] = line["m"]
+                self.question_ids.append(line["q"])
+                self.answer_ids.append(line["a"])
+            elif "s" in line:
+                self.strings.append(line["t"])
+            elif "header" in line:
+                header = line["header"]
+                if header.get("format") != COMPACT_FORMAT:
+                    raise ValueError(f"{path} bukan dataset {COMPACT_FORMAT}")
+                self.system_prompt = header["system_prompt"]
+                self.template = header["template"]
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def question(self, idx: int) -> str:
+        return self.strings[self.question_ids[idx]]
+
+    def answer(self, idx: int) -> str:
+        return self.strings[self.answer_ids[idx]]
+
+    def render(self, idx: int) -> str:
+        return render_text(self.question(idx), self.answer(idx), self.system_prompt, self.template)
+
+    def __getitem__(self, idx: int) -> Dict:
+        item = {"text": self.render(idx), "question": self.question(idx), "answer": self.answer(idx)}
+        if idx in self.metadata:
+            item["metadata"] = self.metadata[idx]
+        return item
+
+    def render_batch(self, indices: Iterable[int]) -> List[str]:
+        """Render field `text` untuk satu batch (dipakai di collator / tokenize_function)"""
+        return [self.render(i) for i in indices]
+
+    def iter_batches(self, batch_size: int) -> Iterator[List[str]]:
+        for start in range(0, len(self), batch_size):
+            yield self.render_batch(range(start, min(start + batch_size, len(self))))
+
+    # ------------------------------------------------------------------
+    # Token id (cache per string unik)
+    # ------------------------------------------------------------------
+    def tokenize(self, tokenizer, batch_size: int = DEFAULT_BATCH_SIZE) -> "CompactDataset":
+        """
+        Tokenisasi potongan template sekali dan setiap string unik sekali (batch), langsung
+        dalam konteksnya: pertanyaan bersama ekor giliran user dan potongan setelahnya,
+        jawaban bersama potongan di kiri-kanannya. Token string = hasil tokenisasi dikurangi
+        token konteks di kedua sisi, jika kedua sisi itu utuh. String yang tokenisasinya
+        bergabung melewati batas ditandai, dan record yang memakainya ditokenisasi dari teks
+        penuh, sehingga hasil token_ids() selalu identik.
+        """
+        prefix, middle, suffix = template_segments(self.system_prompt, self.template)
+        prefix_ids = encode_batch(tokenizer, [prefix], add_special_tokens=True)[0]
+        middle_ids, suffix_ids = encode_batch(tokenizer, [middle, suffix])
+        self._segment_ids = (prefix_ids, middle_ids, suffix_ids)
+        self._tokenizer = tokenizer
+        self.tokens_encoded = len(prefix_ids) + len(middle_ids) + len(suffix_ids)
+
+        tail, tail_ids, special = self._prefix_tail(prefix)
+        contexts = {
+            True: (tail, middle, tail_ids, middle_ids, special),
+            False: (middle, suffix, middle_ids, suffix_ids, False),
+        }
+        roles = [(sid, True) for sid in sorted(set(self.question_ids))]
+        roles += [(sid, False) for sid in sorted(set(self.answer_ids))]
+
+        string_ids: Dict[int, List[int]] = {}
+        inexact = set()
+        for start in range(0, len(roles), batch_size):
+            chunk = roles[start:start + batch_size]
+            for role, (left, right, left_ids, right_ids, add_special) in contexts.items():
+                sids = [sid for sid, is_question in chunk if is_question is role]
+                encoded = encode_batch(tokenizer, [left + self.strings[sid] + right for sid in sids],
+                                       add_special_tokens=add_special)
+                for sid, ids in zip(sids, encoded):
+                    self.tokens_encoded += len(ids)
+                    end = len(ids) - len(right_ids)
+                    inner = ids[len(left_ids):end]
+                    if (end < len(left_ids) or ids[:len(left_ids)] != left_ids or ids[end:] != right_ids
+                            or string_ids.get(sid, inner) != inner):
+                        inexact.add(sid)
+                    string_ids.setdefault(sid, inner)
+
+        # string bermasalah (atau tidak dirujuk record) ditokenisasi sendiri, hanya untuk statistik panjang
+        alone = [sid for sid in range(len(self.strings)) if sid in inexact or sid not in string_ids]
+        for start in range(0, len(alone), batch_size):
+            chunk = alone[start:start + batch_size]
+            for sid, ids in zip(chunk, encode_batch(tokenizer, [self.strings[sid] for sid in chunk])):
+                self.tokens_encoded += len(ids)
+                string_ids[sid] = ids
+
+        self.token_data = array("I")
+        self.token_offsets = array("Q", [0])
+        for sid in range(len(self.strings)):
+            self.token_data.extend(string_ids[sid])
+            self.token_offsets.append(len(self.token_data))
+
+        self.inexact_strings = inexact
+        self.segments_exact = not inexact
+        return self
+
+    def _prefix_tail(self, prefix: str) -> Tuple[str, List[int], bool]:
+        """
+        Ekor prefix (mulai giliran user) sebagai konteks kiri pertanyaan, jika tokenisasinya
+        sama dengan ekor token prefix; selain itu prefix penuh (dengan special token)
+        """
+        prefix_ids = self._segment_ids[0]
+        cut = prefix.rfind("<start_of_turn>")
+        if cut > 0:
+            head_ids = encode_batch(self._tokenizer, [prefix[:cut]], add_special_tokens=True)[0]
+            tail_ids = encode_batch(self._tokenizer, [prefix[cut:]])[0]
+            self.tokens_encoded += len(head_ids) + len(tail_ids)
+            if head_ids + tail_ids == prefix_ids:
+                return prefix[cut:], tail_ids, False
+        return prefix, prefix_ids, True
+
+    def string_tokens(self, sid: int) -> array:
+        return self.token_data[self.token_offsets[sid]:self.token_offsets[sid + 1]]
+
+    def _assemble(self, idx: int) -> List[int]:
+        prefix_ids, middle_ids, suffix_ids = self._segment_ids
+        ids = list(prefix_ids)
+        ids.extend(self.string_tokens(self.question_ids[idx]))
+        ids.extend(middle_ids)
+        ids.extend(self.string_tokens(self.answer_ids[idx]))
+        ids.extend(suffix_ids)
+        return ids
+
+    def token_ids(self, idx: int) -> List[int]:
+        """Token id sample `idx` (sama dengan tokenisasi field `text` + special token)"""
+        return self.token_batch([idx])[0]
+
+    def token_batch(self, indices: Iterable[int]) -> List[List[int]]:
+        if self.token_data is None:
+            raise RuntimeError("Panggil tokenize(tokenizer) sebelum mengambil token id")
+        indices = list(indices)
+        if self.segments_exact:
+            return [self._assemble(i) for i in indices]
+
+        # record yang memakai string bermasalah ditokenisasi dari teks penuh
+        inexact = [i for i in indices
+                   if self.question_ids[i] in self.inexact_strings or self.answer_ids[i] in self.inexact_strings]
+        full = dict(zip(inexact, encode_batch(self._tokenizer, self.render_batch(inexact), add_special_tokens=True)))
+        return [full[i] if i in full else self._assemble(i) for i in indices]
+
+    def iter_token_batches(self, batch_size: int) -> Iterator[List[List[int]]]:
+        for start in range(0, len(self), batch_size):
+            yield self.token_batch(range(start, min(start + batch_size, len(self))))
+
+    def token_stats(self) -> Dict:
+        """Token yang benar-benar ditokenisasi (termasuk konteks template) vs total token seluruh sample"""
+        segment_tokens = sum(len(ids) for ids in self._segment_ids)
+        lengths = [self.token_offsets[i + 1] - self.token_offsets[i] for i in range(len(self.strings))]
+        total = sum(segment_tokens + lengths[q] + lengths[a] for q, a in zip(self.question_ids, self.answer_ids))
+        return {
+            "records": len(self),
+            "unique_strings": len(self.strings),
+            "unique_answers": len(set(self.answer_ids)),
+            "tokens_encoded": self.tokens_encoded,
+            "tokens_total": total,
+            "segments_exact": self.segments_exact,
+            "inexact_strings": len(self.inexact_strings),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Konversi dataset Gemma <-> format compact")
+    parser.add_argument("command", choices=["compact", "expand", "tokens"])
+    parser.add_argument("input")
+    parser.add_argument("--output")
+    parser.add_argument("--tokenizer", help="Path tokenizer.json atau folder model (untuk `tokens`)")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        output = args.output or compact_path(args.input)
+        try:
+            with CompactWriter(output) as writer:
+                writer.add_all(iter_records(args.input))
+        except ValueError as e:
+            Path(output).unlink(missing_ok=True)
+            parser.error(f"{args.input}: {e}")
+        print(f"✅ {writer.count} record, {len(writer.string_ids)} string unik -> {output}")
+    elif args.command == "tokens":
+        if not args.tokenizer:
+            parser.error("tokens membutuhkan --tokenizer")
+        stats = CompactDataset(args.input).tokenize(load_tokenizer(args.tokenizer)).token_stats()
+        saved = 1 - stats["tokens_encoded"] / stats["tokens_total"] if stats["tokens_total"] else 0.0
+        print(f"📖 {stats['records']} record, {stats['unique_strings']} string unik "
+              f"({stats['unique_answers']} jawaban unik)")
+        print(f"🔢 Token ditokenisasi: {stats['tokens_encoded']} dari total {stats['tokens_total']} "
+              f"({saved * 100:.1f}% tidak perlu ditokenisasi ulang)")
+        if not stats["segments_exact"]:
+            print(f"⚠️  {stats['inexact_strings']} string bergabung dengan token template; record yang "
+                  f"memakainya ditokenisasi dari teks penuh")
+    else:
+        output = args.output or expanded_path(args.input)
+        if os.path.abspath(output) == os.path.abspath(args.input):
+            parser.error(f"output sama dengan input ({args.input}); pakai --output lain")
+        dataset = CompactDataset(args.input)
+        with JsonlWriter(output) as sink:
+            for idx in range(len(dataset)):
+                sink.write(dataset[idx])
+        print(f"✅ {len(dataset)} record dirender -> {output}")
+
+
+if __name__ == "__main__":
+    main()
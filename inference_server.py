@@ -0,0 +1,524 @@
+"""
+Server inference lokal untuk model gemma-pmb hasil merge
+
+- Model di-load sekali dan tetap warm
+- Dynamic batching: request yang datang bersamaan digabung ke satu model.generate
+- KV cache untuk prefix SYSTEM_PROMPT dihitung sekali dan dipakai ulang di setiap batch
+- Metrik per request (latency, token/s) dan agregat (GET /metrics)
+- Cache jawaban exact/semantic (answer_cache.py) dicek sebelum request masuk antrian generate
+- Opsional: gate off-topic (topic_gate.py) menolak pertanyaan di luar topik tanpa generate
+- Opsional: konteks dari index retrieval (retrieval.py) disisipkan ke prompt (--retrieval-index)
+
+Usage:
+    python inference_server.py --model ../outputs/gemma-pmb_merged_final --port 8000
+    python inference_server.py --backend echo --stdin         # stand-in tanpa model (uji end-to-end)
+    python inference_server.py --semantic-model sentence-transformers/paraphrase-multilingual-mpnet-base-v2
+
+    curl -s localhost:8000/generate -d '{"question": "Berapa biaya pendaftaran?"}'
+"""
+
+import argparse
+import copy
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from answer_cache import AnswerCache, add_cache_args, build_cache
+from gemma_format import build_prompt, prompt_prefix
+from tokenizer_utils import percentiles
+
+DEFAULT_MODEL_DIR = "../outputs/gemma-pmb_merged_final"
+# Error generate() saat versi transformers / arsitektur model tidak mendukung past_key_values
+# prefix. RuntimeError (termasuk CUDA OOM) sengaja tidak ditangkap: bukan masalah kompatibilitas
+PREFIX_CACHE_ERRORS = (TypeError, ValueError, AttributeError)
+CHECK_QUESTIONS = ["Berapa biaya pendaftaran PMB UNSIQ?", "Kapan gelombang 2 dibuka?", "Apa saja prodi di FITK?"]
+
+
+def clean_answer(text: str) -> str:
+    """Ambil jawaban model sampai <end_of_turn>, buang token spesial sisa"""
+    if "<start_of_turn>model" in text:
+        text = text.split("<start_of_turn>model")[-1]
+    text = text.split("<end_of_turn>")[0]
+    for token in ("<eos>", "<pad>", "<bos>"):
+        text = text.replace(token, "")
+    return text.strip()
+
+
+# ============================================================
+# 🤖 Backend generasi
+# ============================================================
+
+class TransformersBackend:
+    """Model transformers (merged gemma-pmb atau model kecil untuk uji di CPU)"""
+
+    def __init__(self, model_dir: str, max_new_tokens: int = 300, temperature: float = 0.7,
+                 top_p: float = 0.9, repetition_penalty: float = 1.1, use_prefix_cache: bool = True,
+                 retriever=None, top_k: int = 3):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        self.retriever = retriever
+        self.top_k = top_k
+        print(f"📦 Loading merged model from: {model_dir}")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        dtype = torch.bfloat16 if torch.cuda.is_available() else torch.float32
+        self.model = AutoModelForCausalLM.from_pretrained(model_dir, device_map="auto", torch_dtype=dtype)
+        self.model.eval()
+
+        self.generation_kwargs = dict(
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            repetition_penalty=repetition_penalty,
+            do_sample=temperature > 0,
+            pad_token_id=self.tokenizer.pad_token_id,
+        )
+
+        self.prefix = prompt_prefix()
+        self.prefix_ids = self.tokenizer(self.prefix, return_tensors="pt").input_ids.to(self.model.device)
+        self.prefix_cache = None
+        if use_prefix_cache:
+            with torch.inference_mode():
+                self.prefix_cache = self.model(input_ids=self.prefix_ids, use_cache=True).past_key_values
+            print(f"   ✓ KV cache prefix system prompt: {self.prefix_ids.shape[1]} token")
+
+    def _batched_prefix_cache(self, n: int):
+        cache = copy.deepcopy(self.prefix_cache)
+        if n > 1:
+            cache.batch_repeat_interleave(n)
+        return cache
+
+    def generate_batch(self, questions: List[str], use_prefix_cache: bool = True,
+                       **overrides) -> List[Tuple[str, int]]:
+        torch = self.torch
+        n = len(questions)
+        contexts = [self.retriever.context_for(q, self.top_k) if self.retriever else None for q in questions]
+        suffixes = [build_prompt(q, context=c)[len(self.prefix):] for q, c in zip(questions, contexts)]
+        enc = self.tokenizer(suffixes, return_tensors="pt", padding=True, add_special_tokens=False).to(self.model.device)
+
+        # prefix (sama untuk semua) + suffix left-padded; padding di tengah di-mask lewat attention_mask
+        prefix_ids = self.prefix_ids.expand(n, -1)
+        input_ids = torch.cat([prefix_ids, enc.input_ids], dim=1)
+        attention_mask = torch.cat([torch.ones_like(prefix_ids), enc.attention_mask], dim=1)
+
+        kwargs = dict(self.generation_kwargs, **overrides)
+        if use_prefix_cache and self.prefix_cache is not None:
+            try:
+                kwargs["past_key_values"] = self._batched_prefix_cache(n)
+                with torch.inference_mode():
+                    output = self.model.generate(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+            except PREFIX_CACHE_ERRORS as e:
+                print(f"⚠️  Reuse KV cache prefix tidak didukung ({type(e).__name__}: {e}), lanjut tanpa prefix cache")
+                self.prefix_cache = None
+                return self.generate_batch(questions, False, **overrides)
+        else:
+            with torch.inference_mode():
+                output = self.model.generate(input_ids=input_ids, attention_mask=attention_mask, **kwargs)
+
+        results = []
+        for row in output[:, input_ids.shape[1]:]:
+            n_tokens = int((row != self.tokenizer.pad_token_id).sum())
+            text = self.tokenizer.decode(row, skip_special_tokens=False)
+            results.append((clean_answer(text), n_tokens))
+        return results
+
+    def check_prefix_cache(self, questions: List[str] = CHECK_QUESTIONS, max_new_tokens: int = 32) -> Dict:
+        """
+        Greedy decode dengan dan tanpa prefix cache harus identik (batch berisi panjang berbeda,
+        sehingga padding kiri ikut diuji). Jika berbeda, prefix cache dimatikan.
+        """
+        if self.prefix_cache is None:
+            return {"enabled": False, "identical": None}
+        greedy = dict(do_sample=False, max_new_tokens=max_new_tokens, temperature=None, top_p=None)
+        cached = self.generate_batch(questions, True, **greedy)
+        plain = self.generate_batch(questions, False, **greedy)
+        mismatches = [q for q, a, b in zip(questions, cached, plain) if a != b]
+        if mismatches:
+            print(f"⚠️  Output prefix cache berbeda untuk {len(mismatches)} pertanyaan, prefix cache dimatikan")
+            self.prefix_cache = None
+        return {"enabled": self.prefix_cache is not None, "identical": not mismatches, "mismatches": mismatches}
+
+
+class EchoBackend:
+    """Stand-in tanpa dependensi ML: mengembalikan pertanyaan, untuk uji server/batching di CPU"""
+
+    def __init__(self, delay_ms: float = 20.0, retriever=None, top_k: int = 3):
+        self.delay = delay_ms / 1000
+        self.retriever = retriever
+        self.top_k = top_k
+
+    def generate_batch(self, questions: List[str]) -> List[Tuple[str, int]]:
+        time.sleep(self.delay)
+        results = []
+        for q in questions:
+            answer = f"[echo] {q}"
+            if self.retriever is not None:
+                answer += "".join(f"\n- {p}" for p in self.retriever.context_for(q, self.top_k))
+            results.append((answer, len(answer.split())))
+        return results
+
+
+# ============================================================
+# 📊 Metrik
+# ============================================================
+
+class ServerMetrics:
+    def __init__(self, window: int = 1000):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.tokens = 0
+        self.generate_seconds = 0.0
+        self.latencies_ms = deque(maxlen=window)
+
+    def record_batch(self, size: int, tokens: int, seconds: float) -> None:
+        with self.lock:
+            self.batches += 1
+            self.requests += size
+            self.tokens += tokens
+            self.generate_seconds += seconds
+
+    def record_latency(self, latency_ms: float) -> None:
+        with self.lock:
+            self.latencies_ms.append(latency_ms)
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": self.batches,
+                "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "tokens_per_s": round(self.tokens / self.generate_seconds, 2) if self.generate_seconds else 0.0,
+                "latency_ms": percentiles([round(x, 1) for x in self.latencies_ms]),
+            }
+
+
+# ============================================================
+# 🔁 Dynamic batching
+# ============================================================
+
+class _Request:
+    __slots__ = ("question", "future", "enqueued_at")
+
+    def __init__(self, question: str):
+        self.question = question
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class DynamicBatcher:
+    """
+    Kumpulkan request sampai max_batch_size atau max_wait_ms sejak request pertama,
+    lalu jalankan satu generate untuk semuanya
+    """
+
+    def __init__(self, backend, max_batch_size: int = 8, max_wait_ms: float = 10.0, metrics: ServerMetrics = None):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics or ServerMetrics()
+        self.queue: "queue.Queue[_Request]" = queue.Queue()
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="dynamic-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, question: str) -> Future:
+        request = _Request(question)
+        self.queue.put(request)
+        return request.future
+
+    def close(self) -> None:
+        self._running = False
+        self._thread.join(timeout=1)
+
+    def _collect(self) -> List[_Request]:
+        try:
+            first = self.queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while self._running:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                outputs = self.backend.generate_batch([r.question for r in batch])
+            except Exception as e:
+                with self.metrics.lock:
+                    self.metrics.errors += len(batch)
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+            generate_s = finished - started
+
+            self.metrics.record_batch(len(batch), sum(n for _, n in outputs), generate_s)
+            for request, (answer, n_tokens) in zip(batch, outputs):
+                latency_ms = (finished - request.enqueued_at) * 1000
+                self.metrics.record_latency(latency_ms)
+                request.future.set_result({
+                    "answer": answer,
+                    "metrics": {
+                        "latency_ms": round(latency_ms, 2),
+                        "queue_ms": round((started - request.enqueued_at) * 1000, 2),
+                        "generate_ms": round(generate_s * 1000, 2),
+                        "tokens": n_tokens,
+                        "tokens_per_s": round(n_tokens / generate_s, 2) if generate_s else 0.0,
+                        "batch_size": len(batch),
+                    },
+                })
+
+
+class CachedGenerator:
+    """
+    Jalur cepat sebelum generate: gate off-topic (topic_gate.py), lalu AnswerCache;
+    hanya yang lolos keduanya masuk DynamicBatcher
+    """
+
+    def __init__(self, batcher: DynamicBatcher, cache: Optional[AnswerCache] = None, cache_generated: bool = True,
+                 gate=None):
+        self.batcher = batcher
+        self.cache = cache
+        self.cache_generated = cache_generated
+        self.gate = gate
+        self.refused = 0
+
+    @staticmethod
+    def _completed(payload: Dict, started: float) -> Future:
+        payload["metrics"] = {"latency_ms": round((time.perf_counter() - started) * 1000, 3), "tokens": 0, "batch_size": 0}
+        future = Future()
+        future.set_result(payload)
+        return future
+
+    def submit(self, question: str) -> Future:
+        started = time.perf_counter()
+        if self.gate is not None:
+            refusal = self.gate.check(question)
+            if refusal is not None:
+                self.refused += 1
+                return self._completed({"answer": refusal["answer"], "gate": {"off_topic_prob": refusal["off_topic_prob"]}}, started)
+
+        if self.cache is None:
+            return self.batcher.submit(question)
+
+        hit = self.cache.get(question)
+        if hit is not None:
+            return self._completed({"answer": hit.pop("answer"), "cache": hit}, started)
+
+        future = self.batcher.submit(question)
+        if self.cache_generated:
+            def store(f: Future) -> None:
+                if f.exception() is None:
+                    self.cache.put(question, f.result()["answer"])
+            future.add_done_callback(store)
+        return future
+
+    def metrics(self) -> Dict:
+        snapshot = self.batcher.metrics.snapshot()
+        if self.cache is not None:
+            snapshot["cache"] = self.cache.stats()
+        if self.gate is not None:
+            snapshot["gate"] = {"refused": self.refused, "threshold": self.gate.threshold}
+        return snapshot
+
+
+# ============================================================
+# 🌐 Frontend HTTP & stdin
+# ============================================================
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    server_version = "PMBInference/1.0"
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send_json(200, self.server.generator.metrics())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            question = str(payload["question"]).strip()
+        except (ValueError, KeyError):
+            self._send_json(400, {"error": "body harus JSON dengan key 'question'"})
+            return
+
+        try:
+            result = self.server.handle_question(question)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, generator: CachedGenerator, timeout_s: float = 120.0):
+        super().__init__(address, InferenceHandler)
+        self.generator = generator
+        self.timeout_s = timeout_s
+
+    def handle_question(self, question: str) -> Dict:
+        return self.generator.submit(question).result(timeout=self.timeout_s)
+
+
+def serve_stdin(handle_question_async, out=sys.stdout) -> None:
+    """
+    Satu pertanyaan per baris (teks biasa atau JSON {"question": ...}); semua baris
+    di-submit tanpa menunggu, hasil ditulis sebagai JSON per baris begitu selesai
+    """
+    lock = threading.Lock()
+    emitted = threading.Semaphore(0)
+    submitted = 0
+
+    def emit(request_id, question, future):
+        try:
+            payload = dict(future.result(), id=request_id, question=question)
+        except Exception as e:
+            payload = {"id": request_id, "question": question, "error": str(e)}
+        with lock:
+            out.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            out.flush()
+        emitted.release()
+
+    for request_id, line in enumerate(sys.stdin, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        question = json.loads(line)["question"] if line.startswith("{") else line
+        future = handle_question_async(question)
+        future.add_done_callback(lambda f, i=request_id, q=question: emit(i, q, f))
+        submitted += 1
+
+    # tunggu sampai semua hasil benar-benar tertulis (callback jalan setelah future selesai)
+    for _ in range(submitted):
+        emitted.acquire()
+
+
+def build_backend(args):
+    retriever = None
+    if args.retrieval_index:
+        from retrieval import RetrievalIndex
+        retriever = RetrievalIndex(args.retrieval_index)
+        print(f"🔍 Index retrieval: {len(retriever)} chunk dari {args.retrieval_index}")
+
+    if args.backend == "echo":
+        return EchoBackend(args.echo_delay_ms, retriever, args.top_k)
+    backend = TransformersBackend(
+        args.model,
+        max_new_tokens=args.max_new_tokens,
+        temperature=args.temperature,
+        use_prefix_cache=not args.no_prefix_cache,
+        retriever=retriever,
+        top_k=args.top_k,
+    )
+    if args.check_prefix_cache:
+        print(f"🔬 Cek prefix cache: {backend.check_prefix_cache()}")
+    return backend
+
+
+def add_backend_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--backend", choices=["transformers", "echo"], default="transformers")
+    parser.add_argument("--model", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--max-new-tokens", type=int, default=300)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--no-prefix-cache", action="store_true", help="Jangan reuse KV cache system prompt")
+    parser.add_argument("--check-prefix-cache", action="store_true",
+                        help="Saat start: bandingkan output greedy dengan/tanpa prefix cache, matikan jika berbeda")
+    parser.add_argument("--echo-delay-ms", type=float, default=20.0, help="Latency simulasi backend echo")
+    parser.add_argument("--retrieval-index", help="Folder index retrieval.py untuk konteks prompt")
+    parser.add_argument("--top-k", type=int, default=3, help="Jumlah potongan konteks retrieval")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server inference PMB dengan dynamic batching")
+    add_backend_args(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--stdin", action="store_true", help="Baca pertanyaan dari stdin, bukan HTTP")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    add_cache_args(parser)
+    parser.add_argument("--no-cache", action="store_true", help="Matikan cache jawaban")
+    parser.add_argument("--no-cache-generated", action="store_true", help="Jangan cache jawaban hasil model")
+    parser.add_argument("--topic-gate", help="File gate off-topic hasil `python topic_gate.py train`")
+    args = parser.parse_args()
+
+    backend = build_backend(args)
+    batcher = DynamicBatcher(backend, args.max_batch_size, args.max_wait_ms)
+    cache = None if args.no_cache else build_cache(args)
+    if cache is not None:
+        print(f"🗃️  Cache jawaban: {cache.stats()['entries']} entry dataset")
+    gate = None
+    if args.topic_gate:
+        from topic_gate import TopicGate
+        gate = TopicGate.load(args.topic_gate)
+        print(f"🚧 Gate off-topic aktif (threshold {gate.threshold})")
+    generator = CachedGenerator(batcher, cache, cache_generated=not args.no_cache_generated, gate=gate)
+
+    if args.stdin:
+        serve_stdin(generator.submit)
+        print(json.dumps({"metrics": generator.metrics()}), file=sys.stderr)
+        batcher.close()
+        return
+
+    server = InferenceServer((args.host, args.port), generator)
+    print(f"🚀 Server siap di http://{args.host}:{args.port} (POST /generate, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Server dihentikan")
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Sink & reader JSONL streaming bersama untuk semua script konversi
+
+Kompresi dipilih dari ekstensi file:
+    *.jsonl       -> teks biasa
+    *.jsonl.gz    -> gzip
+    *.jsonl.zst   -> zstandard (butuh paket `zstandard`)
+"""
+
+import gzip
+import io
+import itertools
+import json
+from typing import Dict, Iterable, Iterator, List
+
+WRITE_BUFFER_SIZE = 1 << 20
+BATCH_SIZE = 1024   # record per batch untuk timer stage (bukan timer per record)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Output .zst membutuhkan paket zstandard: pip install zstandard")
+    return zstandard
+
+
+def open_text(path: str, mode: str = "r"):
+    """Buka file teks UTF-8 (mode 'r', 'w' atau 'a'), otomatis gzip/zstd sesuai ekstensi"""
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        zstd = _zstd()
+        raw = open(path, mode + "b")
+        # mode 'a' menambah frame zstd baru; frame bersambung tetap bisa dibaca sebagai satu stream
+        if mode == "r":
+            stream = zstd.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+        else:
+            stream = zstd.ZstdCompressor().stream_writer(raw)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    if mode in ("w", "a"):
+        return open(path, mode, encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+    return open(path, "r", encoding="utf-8")
+
+
+class JsonlWriter:
+    """
+    Tulis record satu per baris lewat satu handle ber-buffer
+
+    Usage:
+        with JsonlWriter("out.jsonl.gz") as sink:
+            sink.write_all(generate_records())
+    """
+
+    def __init__(self, path: str, mode: str = "w"):
+        self.path = str(path)
+        self.mode = mode
+        self.count = 0
+        self._f = None
+
+    def __enter__(self):
+        self._f = open_text(self.path, self.mode)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.close()
+        return False
+
+    def write(self, record: Dict) -> None:
+        self._f.write(json.dumps(record, ensure_ascii=False))
+        self._f.write("\n")
+        self.count += 1
+
+    def write_raw(self, line: str) -> None:
+        """Tulis baris JSON yang sudah terserialisasi (tanpa parsing ulang)"""
+        self._f.write(line if line.endswith("\n") else line + "\n")
+        self.count += 1
+
+    def write_all(self, records: Iterable[Dict]) -> int:
+        for record in records:
+            self.write(record)
+        return self.count
+
+    @property
+    def handle(self):
+        return self._f
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """Baca JSONL (boleh terkompresi) record per record"""
+    with open_text(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """
+    Baca record dari .jsonl (streaming) atau .json berisi list/dict
+    (JSON array tetap harus di-load utuh)
+    """
+    path = str(path)
+    if ".jsonl" in path:
+        yield from iter_jsonl(path)
+        return
+
+    with open_text(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        yield from data
+    else:
+        yield data
+
+
+def iter_batches(iterable: Iterable, size: int = BATCH_SIZE) -> Iterator[List]:
+    """Kelompokkan iterable menjadi list berisi maksimal `size` item (memori tetap konstan)"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
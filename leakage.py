@@ -0,0 +1,327 @@
+"""
+Deteksi near-duplicate dan kebocoran data antar split (train.jsonl, test.jsonl, uji.json)
+
+Pipeline:
+1. MinHash + LSH banding atas character shingles (pre-filter cepat, sub-kuadratik)
+2. (opsional) SimHash random-hyperplane atas embedding pertanyaan untuk parafrase
+   yang overlap leksikalnya rendah
+3. Verifikasi hanya pada kandidat: estimasi Jaccard dan/atau cosine embedding
+4. Laporan pasangan lintas split + tulis split bersih (duplikat dibuang dari split train)
+
+Usage:
+    python leakage.py
+    python leakage.py --semantic --cosine-threshold 0.9
+    python leakage.py --splits train=train.jsonl test=test.jsonl uji=uji.json --drop-from train
+"""
+
+import argparse
+import json
+import re
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+DEFAULT_SPLITS = {
+    "train": "train.jsonl",
+    "test": "test.jsonl",
+    "uji": "uji.json",
+}
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+NUM_BANDS = 16           # 16 band x 4 baris -> ambang ~0.5 Jaccard
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 8        # 8 band x 8 bit
+MAX_BUCKET_SIZE = 200    # bucket lebih besar dipecah lagi per isi band berikutnya sebelum dipasangkan
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+
+# ============================================================
+# 📖 Load pertanyaan per split
+# ============================================================
+
+def iter_split_records(path: str) -> Iterator[Dict]:
+    """
+    Baca record dari file split (JSONL messages atau JSON list uji.json)
+    Yield dict dengan key 'question', 'raw' (baris/record asli)
+    """
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                question = next((m["content"] for m in record.get("messages", []) if m["role"] == "user"), "")
+                yield {"question": question, "raw": line}
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for record in data:
+            question = record.get("question") or record.get("Q") or ""
+            yield {"question": question, "raw": record}
+
+
+def normalize_question(text: str) -> str:
+    text = text.lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# ============================================================
+# 🔢 MinHash + LSH
+# ============================================================
+
+def char_shingles(text: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hash 32-bit dari character k-shingles teks yang sudah dinormalisasi"""
+    text = normalize_question(text)
+    if len(text) <= k:
+        grams = {text}
+    else:
+        grams = {text[i:i + k] for i in range(len(text) - k + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    """MinHash dengan universal hashing (a*x + b) mod p, divektorisasi per dokumen"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 42):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        hashed = (np.outer(shingles, self.a) + self.b) % _MERSENNE_PRIME
+        return hashed.min(axis=0)
+
+
+def band_keys(signatures: np.ndarray, num_bands: int, band: int) -> List[bytes]:
+    """Isi satu band untuk semua dokumen (key bucket LSH)"""
+    rows = signatures.shape[1] // num_bands
+    return list(map(bytes, signatures[:, band * rows:(band + 1) * rows]))
+
+
+def lsh_buckets(signatures: np.ndarray, num_bands: int) -> Dict[Tuple, List[int]]:
+    """Kelompokkan indeks dokumen per (band, isi band)"""
+    buckets: Dict[Tuple, List[int]] = defaultdict(list)
+    for band in range(num_bands):
+        for idx, key in enumerate(band_keys(signatures, num_bands, band)):
+            buckets[(band, key)].append(idx)
+    return buckets
+
+
+def simhash_signatures(embeddings: np.ndarray, bits: int = SIMHASH_BITS, seed: int = 42) -> np.ndarray:
+    """Random-hyperplane LSH: bit tanda proyeksi embedding, dipack per byte"""
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((embeddings.shape[1], bits)).astype(np.float32)
+    return np.packbits(embeddings @ planes > 0, axis=1)
+
+
+def _cross_split_pairs(members: List[int], owners: np.ndarray, pairs: Set[Tuple[int, int]]) -> None:
+    """Semua pasangan anggota yang berasal dari split berbeda"""
+    for i, left in enumerate(members):
+        for right in members[i + 1:]:
+            if owners[left] != owners[right]:
+                pairs.add((min(left, right), max(left, right)))
+
+
+def candidate_pairs(buckets: Dict[Tuple, List[int]], owners: np.ndarray, signatures: np.ndarray,
+                    num_bands: int) -> Set[Tuple[int, int]]:
+    """
+    Pasangan kandidat dari bucket LSH yang berasal dari split berbeda.
+
+    Bucket besar (> MAX_BUCKET_SIZE, teks yang sangat sering diduplikasi) dipecah per isi
+    band berikutnya, lalu dipasangkan penuh lintas split di dalam tiap sub-grup. Pasangan
+    di bucket besar yang berbeda pada band berikutnya tidak dibandingkan lewat bucket ini;
+    pasangan itu hanya ditemukan jika juga bertemu di bucket lain
+    """
+    pairs: Set[Tuple[int, int]] = set()
+    next_keys: Dict[int, List[bytes]] = {}
+    for (band, _), members in buckets.items():
+        if len(members) < 2 or len(set(owners[members])) < 2:
+            continue
+        if len(members) <= MAX_BUCKET_SIZE:
+            _cross_split_pairs(members, owners, pairs)
+            continue
+        next_band = (band + 1) % num_bands
+        if next_band not in next_keys:
+            next_keys[next_band] = band_keys(signatures, num_bands, next_band)
+        sub_groups: Dict[bytes, List[int]] = defaultdict(list)
+        for idx in members:
+            sub_groups[next_keys[next_band][idx]].append(idx)
+        for sub_members in sub_groups.values():
+            if len(sub_members) > 1:
+                _cross_split_pairs(sub_members, owners, pairs)
+    return pairs
+
+
+# ============================================================
+# 🔍 Deteksi
+# ============================================================
+
+def detect_leakage(
+    split_questions: Dict[str, List[str]],
+    jaccard_threshold: float = 0.8,
+    embeddings: Optional[np.ndarray] = None,
+    cosine_threshold: float = 0.9,
+) -> List[Dict]:
+    """
+    Cari near-duplicate lintas split
+
+    Args:
+        split_questions: {nama_split: [pertanyaan, ...]}
+        jaccard_threshold: ambang estimasi Jaccard MinHash
+        embeddings: embedding ter-normalisasi untuk semua pertanyaan (urutan sama
+            dengan split_questions digabung); jika None hanya MinHash yang dipakai
+        cosine_threshold: ambang cosine untuk kandidat semantik
+
+    Returns:
+        List dict pasangan yang lolos ambang, urut dari skor tertinggi
+    """
+    names = list(split_questions)
+    owners = np.concatenate([np.full(len(split_questions[n]), i) for i, n in enumerate(names)])
+    locations = [(n, i) for n in names for i in range(len(split_questions[n]))]
+    texts = [q for n in names for q in split_questions[n]]
+
+    hasher = MinHasher()
+    signatures = np.stack([hasher.signature(char_shingles(t)) for t in texts])
+    candidates = candidate_pairs(lsh_buckets(signatures, NUM_BANDS), owners, signatures, NUM_BANDS)
+
+    if embeddings is not None:
+        semantic_signatures = simhash_signatures(embeddings)
+        candidates |= candidate_pairs(lsh_buckets(semantic_signatures, SIMHASH_BANDS), owners,
+                                      semantic_signatures, SIMHASH_BANDS)
+
+    if not candidates:
+        return []
+
+    pairs = np.array(sorted(candidates), dtype=np.int64)
+    jaccard = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+    keep = jaccard >= jaccard_threshold
+    cosine = None
+    if embeddings is not None:
+        cosine = np.einsum("ij,ij->i", embeddings[pairs[:, 0]], embeddings[pairs[:, 1]])
+        keep |= cosine >= cosine_threshold
+
+    findings = []
+    for k in np.flatnonzero(keep):
+        left, right = pairs[k]
+        (left_split, left_idx), (right_split, right_idx) = locations[left], locations[right]
+        findings.append({
+            "left_split": left_split,
+            "left_index": left_idx,
+            "left_question": texts[left],
+            "right_split": right_split,
+            "right_index": right_idx,
+            "right_question": texts[right],
+            "jaccard": float(jaccard[k]),
+            "cosine": float(cosine[k]) if cosine is not None else None,
+        })
+
+    findings.sort(key=lambda x: max(x["jaccard"], x["cosine"] or 0.0), reverse=True)
+    return findings
+
+
+def encode_questions(texts: List[str], model_name: str) -> np.ndarray:
+    """Embedding ter-normalisasi via sentence-transformers (memakai cache embedding)"""
+    from sentence_transformers import SentenceTransformer
+    from embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache(model_name)
+    model = SentenceTransformer(model_name) if cache.missing(texts) else None
+    embeddings = cache.encode(texts, model, show_progress_bar=True)
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+def write_clean_split(path: str, records: List[Dict], drop: Set[int], output_path: str) -> int:
+    """Tulis ulang split tanpa indeks yang ada di drop, format mengikuti file asli"""
+    kept = [r["raw"] for i, r in enumerate(records) if i not in drop]
+    with open(output_path, "w", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            f.writelines(line if line.endswith("\n") else line + "\n" for line in kept)
+        else:
+            json.dump(kept, f, ensure_ascii=False, indent=2)
+    return len(kept)
+
+
+def clean_output_path(path: str) -> str:
+    p = Path(path)
+    return str(p.with_name(f"{p.stem}.clean{p.suffix}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deteksi near-duplicate / leakage antar split")
+    parser.add_argument("--splits", nargs="+", help="Daftar nama=path (default: train, test, uji)")
+    parser.add_argument("--jaccard-threshold", type=float, default=0.8)
+    parser.add_argument("--semantic", action="store_true", help="Tambahkan kandidat & verifikasi berbasis embedding")
+    parser.add_argument("--cosine-threshold", type=float, default=0.9)
+    parser.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+    parser.add_argument("--drop-from", default="train", help="Split yang dibersihkan dari duplikat")
+    parser.add_argument("--report", default="leakage_report.json")
+    parser.add_argument("--no-write", action="store_true", help="Hanya laporan, tanpa menulis split bersih")
+    args = parser.parse_args()
+
+    splits = dict(s.split("=", 1) for s in args.splits) if args.splits else DEFAULT_SPLITS
+
+    print("=" * 80)
+    print("🔍 DETEKSI NEAR-DUPLICATE & LEAKAGE ANTAR SPLIT")
+    print("=" * 80)
+
+    records = {}
+    for name, path in splits.items():
+        if not Path(path).exists():
+            print(f"⏭️  Skipping {name}: {path} tidak ditemukan")
+            continue
+        records[name] = list(iter_split_records(path))
+        print(f"📖 {name:6s} {path}: {len(records[name])} pertanyaan")
+
+    split_questions = {name: [r["question"] for r in recs] for name, recs in records.items()}
+
+    embeddings = None
+    if args.semantic:
+        print(f"\n🔄 Encoding pertanyaan dengan {args.model}...")
+        all_texts = [q for qs in split_questions.values() for q in qs]
+        embeddings = encode_questions(all_texts, args.model)
+
+    findings = detect_leakage(split_questions, args.jaccard_threshold, embeddings, args.cosine_threshold)
+
+    # Ringkasan per pasangan split
+    summary = defaultdict(int)
+    for item in findings:
+        summary[f"{item['left_split']}<->{item['right_split']}"] += 1
+
+    print(f"\n📊 Ditemukan {len(findings)} pasangan near-duplicate lintas split")
+    for key, count in sorted(summary.items()):
+        print(f"  • {key}: {count}")
+
+    for item in findings[:10]:
+        cosine = f" cos={item['cosine']:.3f}" if item["cosine"] is not None else ""
+        print(f"\n  [{item['left_split']}#{item['left_index']} ↔ {item['right_split']}#{item['right_index']}] "
+              f"jaccard={item['jaccard']:.2f}{cosine}")
+        print(f"    {item['left_question'][:90]}")
+        print(f"    {item['right_question'][:90]}")
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump({"summary": dict(summary), "pairs": findings}, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Laporan disimpan ke: {args.report}")
+
+    if args.no_write or args.drop_from not in records:
+        return
+
+    drop = set()
+    for item in findings:
+        if item["left_split"] == args.drop_from:
+            drop.add(item["left_index"])
+        if item["right_split"] == args.drop_from:
+            drop.add(item["right_index"])
+
+    output_path = clean_output_path(splits[args.drop_from])
+    kept = write_clean_split(splits[args.drop_from], records[args.drop_from], drop, output_path)
+    print(f"🧹 {len(drop)} record dibuang dari {args.drop_from}, {kept} tersisa -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
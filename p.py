@@ -1,38 +1,57 @@
-import json
-
-# Baca file input
-with open("dataset.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-output = []
-SYSTEM_PROMPT = (
-    "Anda adalah asisten virtual untuk Penerimaan Mahasiswa Baru (PMB) di "
-    "Universitas Sains Al-Qur'an (UNSIQ) Wonosobo.\n"
-    "Tugas Anda adalah memberikan informasi yang akurat, jelas, dan membantu calon mahasiswa "
-    "dalam proses pendaftaran.\n"
-    "Jawab pertanyaan dengan ramah, informatif, dan profesional."
-)
-
-# Konversi format
-for item in data:
-    messages = item["messages"]
-    user_msg = next((m["content"] for m in messages if m["role"] == "user"), "")
-    model_msg = next((m["content"] for m in messages if m["role"] == "model"), "")
-
-    formatted = {
-        "text": (
-            f"<start_of_turn>system\n{SYSTEM_PROMPT}<end_of_turn>\n"
-            f"<start_of_turn>user\n{user_msg}<end_of_turn>\n"
-            f"<start_of_turn>model\n{model_msg}<end_of_turn>"
-        ),
-        "question": user_msg,
-        "answer": model_msg,
-        "metadata": item.get("metadata", {})
-    }
-    output.append(formatted)
-
-# Simpan hasil ke file baru
-with open("dataset_gemma.json", "w", encoding="utf-8") as f:
-    json.dump(output, f, ensure_ascii=False, indent=2)
-
-print("✅ Konversi selesai! File tersimpan sebagai dataset_gemma.json")
+import argparse
+
+from gemma_format import CompactWriter, compact_path, render_text
+from jsonl_io import JsonlWriter, iter_batches, iter_records
+from profiling import RunProfiler, add_profiling_args
+
+INPUT_FILE = "dataset.json"
+OUTPUT_FILE = "dataset_gemma.jsonl"
+
+
+def iter_pairs(records):
+    """(pertanyaan user, jawaban model, metadata) dari record format messages"""
+    for item in records:
+        messages = item["messages"]
+        user_msg = next((m["content"] for m in messages if m["role"] == "user"), "")
+        model_msg = next((m["content"] for m in messages if m["role"] == "model"), "")
+        yield user_msg, model_msg, item.get("metadata", {})
+
+
+def iter_formatted(records):
+    """Konversi format messages -> record Gemma, satu per satu"""
+    for user_msg, model_msg, metadata in iter_pairs(records):
+        yield {
+            "text": render_text(user_msg, model_msg),
+            "question": user_msg,
+            "answer": model_msg,
+            "metadata": metadata
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Konversi {INPUT_FILE} (messages) ke dataset Gemma")
+    parser.add_argument("--compact", action="store_true",
+                        help=f"Output format compact ({compact_path(OUTPUT_FILE)}, lihat gemma_format.py)")
+    add_profiling_args(parser)
+    args = parser.parse_args()
+
+    # Baca input dan tulis hasil secara streaming (run report: run_reports/p.json)
+    with RunProfiler.from_args("p", args) as profiler:
+        if args.compact:
+            output = compact_path(OUTPUT_FILE)
+            with CompactWriter(output) as sink:
+                for batch in profiler.iter("parse", iter_batches(iter_pairs(iter_records(INPUT_FILE))), len):
+                    with profiler.stage("write", records=len(batch)):
+                        for question, answer, metadata in batch:
+                            sink.add(question, answer, metadata)
+        else:
+            output = OUTPUT_FILE
+            with JsonlWriter(output) as sink:
+                batches = iter_batches(iter_formatted(iter_records(INPUT_FILE)))
+                for batch in profiler.iter("parse", batches, len):
+                    with profiler.stage("write", records=len(batch)):
+                        sink.write_all(batch)
+
+        print(f"✅ Konversi selesai! {sink.count} record tersimpan sebagai {output}")
+        profiler.add_file("input", INPUT_FILE)
+        profiler.add_file("output", output)
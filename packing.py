@@ -0,0 +1,188 @@
+"""
+Packing / length-bucketing dataset training QLoRA setelah tahap konversi
+
+Mode:
+    pack    : beberapa sample pendek digabung dalam satu sequence (best-fit decreasing).
+              Setiap sequence menyimpan `seq_lens` dan `position_ids` yang di-reset per
+              sample; label token pertama tiap sample di-mask (-100) supaya token
+              terakhir sample sebelumnya tidak "memprediksi" sample berikutnya.
+              Target loss lain identik dengan training tanpa packing.
+    bucket  : sample tidak digabung, tapi diurutkan & dikelompokkan per panjang sehingga
+              padding cukup sampai sample terpanjang di batch.
+
+Usage:
+    python packing.py train.jsonl --tokenizer path/ke/tokenizer.json
+    python packing.py dataset_gemma_fix.jsonl --tokenizer ... --mode bucket --batch-size 8
+"""
+
+import argparse
+import bisect
+import json
+from typing import Dict, Iterator, List
+
+from gemma_format import CompactDataset, render_text
+from jsonl_io import JsonlWriter, iter_records
+from tokenizer_utils import DEFAULT_BATCH_SIZE, encode_batch, load_tokenizer
+
+MAX_LENGTH = 512
+IGNORE_INDEX = -100
+
+
+# ============================================================
+# 📖 Load teks training
+# ============================================================
+
+def record_text(record: Dict) -> str:
+    """Ambil teks training dari record (field text, atau messages system/user/model)"""
+    if "text" in record:
+        return record["text"]
+
+    messages = record.get("messages", [])
+    system = next((m["content"] for m in messages if m["role"] == "system"), None)
+    user = next((m["content"] for m in messages if m["role"] == "user"), "")
+    model = next((m["content"] for m in messages if m["role"] in ("model", "assistant")), "")
+    if system is None:
+        return render_text(user, model)
+    return render_text(user, model, system_prompt=system)
+
+
+def iter_texts(path: str) -> Iterator[str]:
+    if path.endswith(".compact.jsonl"):
+        dataset = CompactDataset(path)
+        for batch in dataset.iter_batches(DEFAULT_BATCH_SIZE):
+            yield from batch
+        return
+    for record in iter_records(path):
+        yield record_text(record)
+
+
+def tokenize_all(path: str, tokenizer, max_length: int) -> List[List[int]]:
+    """Tokenisasi batch seluruh sample (dipotong ke max_length seperti saat training)"""
+    if path.endswith(".compact.jsonl"):
+        # string unik ditokenisasi sekali, sample disusun dari token id yang di-cache
+        dataset = CompactDataset(path).tokenize(tokenizer)
+        return [ids[:max_length] for batch in dataset.iter_token_batches(DEFAULT_BATCH_SIZE) for ids in batch]
+
+    samples = []
+    batch = []
+    for text in iter_texts(path):
+        batch.append(text)
+        if len(batch) >= DEFAULT_BATCH_SIZE:
+            samples.extend(ids[:max_length] for ids in encode_batch(tokenizer, batch, add_special_tokens=True))
+            batch = []
+    if batch:
+        samples.extend(ids[:max_length] for ids in encode_batch(tokenizer, batch, add_special_tokens=True))
+    return samples
+
+
+# ============================================================
+# 📦 Packing & bucketing
+# ============================================================
+
+def pack_samples(lengths: List[int], max_length: int) -> List[List[int]]:
+    """
+    Best-fit decreasing: return list bin, tiap bin berisi indeks sample
+    (sample terpanjang ditempatkan dulu ke bin dengan sisa ruang terkecil yang muat)
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    bins: List[List[int]] = []
+    free = []  # sorted list (sisa_ruang, bin_idx)
+
+    for idx in order:
+        pos = bisect.bisect_left(free, (lengths[idx], -1))
+        if pos < len(free):
+            remaining, bin_idx = free.pop(pos)
+        else:
+            remaining, bin_idx = max_length, len(bins)
+            bins.append([])
+        bins[bin_idx].append(idx)
+        remaining -= lengths[idx]
+        if remaining > 0:
+            bisect.insort(free, (remaining, bin_idx))
+
+    return bins
+
+
+def build_packed_record(segments: List[List[int]]) -> Dict:
+    input_ids, labels, position_ids, seq_lens = [], [], [], []
+    for ids in segments:
+        input_ids.extend(ids)
+        # token pertama tiap segmen tidak punya konteks di segmen yang sama -> tidak dihitung loss
+        labels.append(IGNORE_INDEX)
+        labels.extend(ids[1:])
+        position_ids.extend(range(len(ids)))
+        seq_lens.append(len(ids))
+    return {"input_ids": input_ids, "labels": labels, "position_ids": position_ids, "seq_lens": seq_lens}
+
+
+def bucket_batches(lengths: List[int], batch_size: int) -> List[List[int]]:
+    """Kelompokkan indeks sample yang panjangnya mirip ke batch berukuran batch_size"""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def padding_stats(lengths: List[int], max_length: int, rows: List[List[int]], padded_to: List[int]) -> Dict:
+    real_tokens = sum(lengths)
+    before_slots = len(lengths) * max_length
+    after_slots = sum(padded_to)
+    return {
+        "samples": len(lengths),
+        "real_tokens": real_tokens,
+        "sequences_before": len(lengths),
+        "sequences_after": len(rows),
+        "padding_waste_before": 1 - real_tokens / before_slots if before_slots else 0.0,
+        "padding_waste_after": 1 - real_tokens / after_slots if after_slots else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packing / length-bucketing dataset training")
+    parser.add_argument("input", help="Dataset (.jsonl / .json / .compact.jsonl)")
+    parser.add_argument("--tokenizer", required=True, help="Path tokenizer.json atau folder model")
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--mode", choices=["pack", "bucket"], default="pack")
+    parser.add_argument("--batch-size", type=int, default=8, help="Ukuran batch untuk mode bucket")
+    parser.add_argument("--output", help="Default: <input>.packed.jsonl / <input>.bucketed.jsonl")
+    args = parser.parse_args()
+
+    base = args.input.rsplit(".json", 1)[0]
+    output = args.output or f"{base}.{'packed' if args.mode == 'pack' else 'bucketed'}.jsonl"
+
+    print("=" * 80)
+    print(f"📦 PACKING DATASET ({args.mode.upper()}, max_length={args.max_length})")
+    print("=" * 80)
+
+    tokenizer = load_tokenizer(args.tokenizer)
+    samples = tokenize_all(args.input, tokenizer, args.max_length)
+    lengths = [len(ids) for ids in samples]
+    print(f"📖 {len(samples)} sample ditokenisasi dari {args.input}")
+
+    with JsonlWriter(output) as sink:
+        if args.mode == "pack":
+            rows = pack_samples(lengths, args.max_length)
+            for row in rows:
+                sink.write(build_packed_record([samples[i] for i in row]))
+            # satu sequence pack tetap di-pad sampai max_length
+            padded_to = [args.max_length] * len(rows)
+        else:
+            rows = bucket_batches(lengths, args.batch_size)
+            for batch_idx, row in enumerate(rows):
+                for i in row:
+                    sink.write({"input_ids": samples[i], "labels": samples[i], "batch": batch_idx})
+            padded_to = [max(lengths[i] for i in row) * len(row) for row in rows]
+
+    stats = padding_stats(lengths, args.max_length, rows, padded_to)
+    stats.update({"mode": args.mode, "max_length": args.max_length, "output": output})
+    with open(output.rsplit(".jsonl", 1)[0] + ".stats.json", "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+
+    print(f"\n📊 Statistik padding:")
+    print(f"  • Token asli: {stats['real_tokens']}")
+    print(f"  • Sequence: {stats['sequences_before']} -> {stats['sequences_after']}")
+    print(f"  • Padding waste sebelum: {stats['padding_waste_before']*100:.1f}%")
+    print(f"  • Padding waste sesudah: {stats['padding_waste_after']*100:.1f}%")
+    print(f"\n💾 Tersimpan: {output}")
+
+
+if __name__ == "__main__":
+    main()
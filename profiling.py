@@ -0,0 +1,327 @@
+"""
+Instrumentasi bersama untuk script pipeline data: timer per stage, records/s,
+RSS per stage, opsional cProfile / tracemalloc, dan run report JSON.
+
+Usage (di script):
+    profiler = RunProfiler.from_args("convert_all", args)   # args dari add_profiling_args()
+    with profiler:
+        # waktu producer + jumlah record; timer per batch, bukan per record (overhead ~µs per stage)
+        for batch in profiler.iter("parse", iter_batches(iter_records(path)), len):
+            with profiler.stage("write", records=len(batch)):
+                sink.write_all(batch)
+        profiler.set(records_out=sink.count)
+
+Run report default: run_reports/<script>.json (bisa di-diff antar versi dataset).
+Script tanpa argparse bisa diatur lewat env: PMB_CPROFILE=1, PMB_TRACEMALLOC=1, PMB_RUN_REPORT=path
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_DIR = "run_reports"
+PROFILE_TOP_N = 25
+SNAPSHOT_INTERVAL_S = 0.05   # stage per-record: snapshot memori paling sering tiap 50 ms
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS proses saat ini (Linux /proc), None jika tidak tersedia"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS proses sejak start (ru_maxrss: KB di Linux, byte di macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak * 1024 / 1e6
+
+
+class StageStats:
+    """
+    Statistik satu stage. Memori:
+        rss_start_mb / rss_end_mb : RSS saat stage pertama kali dimulai / snapshot terakhir
+        process_peak_rss_mb       : peak RSS proses (ru_maxrss) saat snapshot terakhir; kumulatif
+                                    sejak proses start, jadi tidak pernah turun antar stage
+        peak_rise_mb              : kenaikan peak proses antara start pertama dan snapshot terakhir
+                                    stage; 0 = stage tidak melewati peak sebelumnya (untuk stage
+                                    yang diselingi stage lain, kenaikan stage lain ikut terhitung)
+    """
+
+    __slots__ = ("name", "seconds", "records", "calls", "rss_start_mb", "rss_end_mb", "peak_start_mb",
+                 "process_peak_rss_mb", "py_peak_mb")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.records = 0
+        self.calls = 0
+        self.rss_start_mb = None
+        self.rss_end_mb = None
+        self.peak_start_mb = None
+        self.process_peak_rss_mb = None
+        self.py_peak_mb = None
+
+    def add(self, n: int = 1) -> None:
+        """Tambah jumlah record yang diproses stage ini"""
+        self.records += n
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "seconds": round(self.seconds, 4),
+            "records": self.records,
+            "records_per_s": round(self.records / self.seconds, 1) if self.seconds and self.records else None,
+            "calls": self.calls,
+            "rss_start_mb": _round(self.rss_start_mb),
+            "rss_end_mb": _round(self.rss_end_mb),
+            "process_peak_rss_mb": _round(self.process_peak_rss_mb),
+            "peak_rise_mb": _round(self.process_peak_rss_mb - self.peak_start_mb)
+            if self.process_peak_rss_mb is not None and self.peak_start_mb is not None else None,
+            "py_peak_mb": _round(self.py_peak_mb),
+        }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+class RunProfiler:
+    """
+    Kumpulkan statistik per stage selama satu run script.
+    Stage dengan nama sama diakumulasi (mis. timer per record di dalam loop).
+    script=None -> tidak menulis report (dipakai sebagai default di fungsi library).
+    """
+
+    def __init__(self, script: Optional[str] = None, report_path: Optional[str] = None,
+                 use_cprofile: bool = False, use_tracemalloc: bool = False):
+        self.script = script
+        self.report_path = report_path or (os.path.join(REPORT_DIR, f"{script}.json") if script else None)
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.stages: Dict[str, StageStats] = {}
+        self.extra: Dict = {}
+        self.files: Dict[str, Dict] = {}
+        self._profile = None
+        self._started = None
+        self._started_at = None
+        self._last_snapshot = 0.0
+
+    @classmethod
+    def from_args(cls, script: str, args: Optional[argparse.Namespace] = None) -> "RunProfiler":
+        """Opsi dari add_profiling_args(), fallback ke env PMB_* untuk script tanpa argparse"""
+        env = os.environ
+        return cls(
+            script,
+            report_path=getattr(args, "run_report", None) or env.get("PMB_RUN_REPORT"),
+            use_cprofile=getattr(args, "cprofile", False) or env.get("PMB_CPROFILE") == "1",
+            use_tracemalloc=getattr(args, "tracemalloc", False) or env.get("PMB_TRACEMALLOC") == "1",
+        )
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self) -> "RunProfiler":
+        self._started = time.perf_counter()
+        self._started_at = datetime.now().isoformat(timespec="seconds")
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.use_cprofile:
+            import cProfile  # import saat dibutuhkan saja, agar startup script tetap cepat
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(status="ok" if exc_type is None else f"error: {exc_type.__name__}")
+        return False
+
+    # ------------------------------------------------------------------
+    # Stage
+    # ------------------------------------------------------------------
+    def _get(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+            stats.rss_start_mb = current_rss_mb()
+            stats.peak_start_mb = max(filter(None, (peak_rss_mb(), stats.rss_start_mb)), default=None)
+        return stats
+
+    def _close(self, stats: StageStats, elapsed: float) -> None:
+        stats.seconds += elapsed
+        stats.calls += 1
+
+    def _snapshot(self, stats: StageStats) -> None:
+        self._last_snapshot = time.perf_counter()
+        stats.rss_end_mb = current_rss_mb()
+        # ru_maxrss bisa tertinggal dari /proc, jaga peak >= RSS saat ini
+        stats.process_peak_rss_mb = max(filter(None, (peak_rss_mb(), stats.rss_end_mb, stats.process_peak_rss_mb)),
+                                        default=None)
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            stats.py_peak_mb = max(stats.py_peak_mb or 0.0, peak)
+
+    @contextmanager
+    def stage(self, name: str, records: int = 0):
+        """Timer stage; `records` (atau stats.add()) dipakai untuk records/s"""
+        stats = self._get(name)
+        stats.records += records
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            self._close(stats, time.perf_counter() - started)
+            if stats.calls == 1 or time.perf_counter() - self._last_snapshot > SNAPSHOT_INTERVAL_S:
+                self._snapshot(stats)
+
+    def iter(self, name: str, iterable: Iterable, count: Optional[Callable[[Any], int]] = None) -> Iterator:
+        """
+        Bungkus iterator: waktu yang dihabiskan producer (parsing / decode) dicatat ke stage `name`.
+        Default satu record per item; `count(item)` untuk item berisi banyak record (mis. satu file)
+        """
+        stats = self._get(name)
+        iterator = iter(iterable)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    self._close(stats, time.perf_counter() - started)
+                    return
+                self._close(stats, time.perf_counter() - started)
+                stats.records += count(item) if count else 1
+                yield item
+        finally:
+            # juga saat consumer berhenti lebih awal (mis. zip)
+            self._snapshot(stats)
+
+    def set(self, **values) -> None:
+        """Nilai tambahan untuk report (jumlah record, threshold, dsb.)"""
+        self.extra.update(values)
+
+    def add_file(self, role: str, path) -> None:
+        """Catat ukuran file input/output (role mis. 'input' atau 'output:train')"""
+        path = str(path)
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        self.files[role] = {"path": path, "bytes": size}
+
+    # ------------------------------------------------------------------
+    # Report
+    # ------------------------------------------------------------------
+    def _profile_top(self):
+        import pstats
+
+        self._profile.disable()
+        prof_path = os.path.splitext(self.report_path)[0] + ".prof"
+        self._profile.dump_stats(prof_path)
+
+        stats = pstats.Stats(self._profile, stream=io.StringIO()).sort_stats("cumulative")
+        top = []
+        for (filename, line, func), (cc, nc, tt, ct, _) in list(stats.stats.items()):
+            top.append({"function": f"{os.path.basename(filename)}:{line}({func})",
+                        "calls": nc, "tottime": round(tt, 4), "cumtime": round(ct, 4)})
+        top.sort(key=lambda x: -x["cumtime"])
+        return prof_path, top[:PROFILE_TOP_N]
+
+    def report(self, status: str = "ok") -> Dict:
+        wall = time.perf_counter() - self._started if self._started else 0.0
+        stage_total = sum(s.seconds for s in self.stages.values())
+        report = {
+            "script": self.script,
+            "argv": sys.argv[1:],
+            "started_at": self._started_at,
+            "status": status,
+            "wall_s": round(wall, 4),
+            "untracked_s": round(max(wall - stage_total, 0.0), 4),
+            "peak_rss_mb": _round(peak_rss_mb()),
+            "python": sys.version.split()[0],
+            "stages": [s.to_dict() for s in self.stages.values()],
+            "files": self.files,
+            "extra": self.extra,
+        }
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            report["py_peak_mb"] = _round(tracemalloc.get_traced_memory()[1] / 1e6)
+        return report
+
+    def finish(self, status: str = "ok") -> Optional[Dict]:
+        report = self.report(status)
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if not self.report_path:
+            if self._profile is not None:
+                self._profile.disable()
+            return report
+
+        directory = os.path.dirname(self.report_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self._profile is not None:
+            report["cprofile"], report["cprofile_top"] = self._profile_top()
+        with open(self.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        print(f"\n⏱️  {self.script}: {report['wall_s']:.2f}s, peak RSS {report['peak_rss_mb']} MB")
+        for stage in report["stages"]:
+            rate = f", {stage['records_per_s']:.0f} rec/s" if stage["records_per_s"] else ""
+            print(f"   • {stage['name']}: {stage['seconds']:.3f}s{rate}")
+        print(f"   📄 Run report: {self.report_path}")
+        return report
+
+
+def add_profiling_args(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("profiling")
+    group.add_argument("--run-report", help=f"Path run report JSON (default: {REPORT_DIR}/<script>.json)")
+    group.add_argument("--cprofile", action="store_true", help="Rekam cProfile (.prof + top fungsi di report)")
+    group.add_argument("--tracemalloc", action="store_true", help="Rekam peak alokasi Python per stage")
+
+
+def diff_reports(old_path: str, new_path: str) -> None:
+    """Bandingkan dua run report per stage"""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+
+    old_stages = {s["name"]: s for s in old["stages"]}
+    print(f"{'stage':24s} {'old s':>9s} {'new s':>9s} {'Δ%':>7s} {'old rec':>9s} {'new rec':>9s}")
+    for stage in new["stages"]:
+        before = old_stages.get(stage["name"], {})
+        old_s = before.get("seconds")
+        delta = f"{(stage['seconds'] / old_s - 1) * 100:+.1f}" if old_s else "-"
+        print(f"{stage['name']:24s} {old_s if old_s is not None else '-':>9} {stage['seconds']:>9} {delta:>7s} "
+              f"{before.get('records', '-'):>9} {stage['records']:>9}")
+    print(f"{'wall':24s} {old['wall_s']:>9} {new['wall_s']:>9}")
+    print(f"{'peak_rss_mb':24s} {old['peak_rss_mb']:>9} {new['peak_rss_mb']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bandingkan dua run report")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+    diff_reports(args.old, args.new)
+
+
+if __name__ == "__main__":
+    main()
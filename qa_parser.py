@@ -0,0 +1,126 @@
+"""
+Parser streaming untuk file teks Q/A (dataset_v*.txt, data/data_group_N(_negative).txt, dll)
+
+Format yang didukung:
+- Prefix "Q:" / "A:" (case-insensitive) dan "Q." / "A." (huruf besar)
+- Jawaban multi-baris (bullet list, kalimat lanjutan) sampai baris kosong atau "Q:" berikutnya
+- Di dalam jawaban yang sedang berjalan, "A." adalah item list (mis. "A. Jalur reguler"),
+  bukan prefix; "Q."/"Q:" tetap memulai pasangan baru, dan "A:" ditambahkan ke jawaban
+  (jawaban yang sedang berjalan tidak pernah diganti)
+- Baris kosong sebagai pemisah, judul bagian / "---" di luar pasangan diabaikan
+
+Dibaca baris per baris (memori konstan), menghasilkan QARecord satu per satu.
+"""
+
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+_PREFIX = re.compile(r"^(?:([QqAa])\s*:|([QA])\.)\s*")
+
+
+class QARecord:
+    """Satu pasangan Q-A beserta asal file dan nomor baris pertanyaan (1-indexed)"""
+
+    __slots__ = ("question", "answer", "source", "line")
+
+    def __init__(self, question: str, answer: str, source: str, line: int):
+        self.question = question
+        self.answer = answer
+        self.source = source
+        self.line = line
+
+    def __repr__(self):
+        return f"QARecord({self.source}:{self.line}, Q={self.question[:40]!r})"
+
+
+def _split_prefix(line: str, in_answer: bool = False):
+    """Return (kind, sisa_teks) dengan kind 'Q', 'A', atau None"""
+    match = _PREFIX.match(line)
+    if not match or (in_answer and match.group(2) == "A"):
+        return None, line
+    kind = (match.group(1) or match.group(2)).upper()
+    return kind, line[match.end():]
+
+
+def iter_qa_records(file_path: str) -> Iterator[QARecord]:
+    """
+    Generator pasangan Q-A dari satu file teks
+
+    Args:
+        file_path: path file Q/A
+
+    Yields:
+        QARecord untuk setiap pasangan yang punya pertanyaan dan jawaban
+    """
+    source = str(file_path)
+    question_lines: List[str] = []
+    answer_lines: Optional[List[str]] = None
+    q_line_num = 0
+
+    def flush():
+        question = " ".join(question_lines).strip()
+        answer = "\n".join(answer_lines).strip() if answer_lines is not None else ""
+        if question and answer:
+            return QARecord(question, answer, source, q_line_num)
+        return None
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_num, raw in enumerate(f, start=1):
+            line = raw.strip()
+
+            if not line:
+                # Baris kosong menutup pasangan yang sudah punya jawaban
+                if answer_lines is not None:
+                    record = flush()
+                    if record:
+                        yield record
+                    question_lines, answer_lines = [], None
+                continue
+
+            kind, text = _split_prefix(line, answer_lines is not None)
+
+            if kind == "Q":
+                if answer_lines is not None:
+                    record = flush()
+                    if record:
+                        yield record
+                question_lines, answer_lines = [text.strip()], None
+                q_line_num = line_num
+            elif kind == "A":
+                if answer_lines is not None:
+                    answer_lines.append(text.strip())
+                elif question_lines:
+                    answer_lines = [text.strip()]
+            elif answer_lines is not None:
+                # Lanjutan jawaban multi-baris (bullet list, dsb)
+                answer_lines.append(line)
+            elif question_lines:
+                question_lines.append(line)
+
+    if answer_lines is not None:
+        record = flush()
+        if record:
+            yield record
+
+
+def iter_qa_files(paths: Iterable[str]) -> Iterator[QARecord]:
+    """Gabungkan beberapa file Q/A secara berurutan"""
+    for path in paths:
+        yield from iter_qa_records(path)
+
+
+def data_group_files(data_dir: str = "data", include_negative: bool = True) -> List[str]:
+    """
+    Daftar file data/data_group_N.txt (dan _negative) terurut berdasarkan N,
+    file positif selalu sebelum pasangan negatifnya
+    """
+    def sort_key(path: Path):
+        number = re.search(r"data_group_(\d+)", path.name)
+        return (int(number.group(1)) if number else 0, path.stem.endswith("_negative"))
+
+    files = [
+        p for p in Path(data_dir).glob("data_group_*.txt")
+        if include_negative or not p.stem.endswith("_negative")
+    ]
+    return [str(p) for p in sorted(files, key=sort_key)]
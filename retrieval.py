@@ -0,0 +1,503 @@
+"""
+Index retrieval atas knowledge base PMB (dataset_v2.txt, data/data_group_*.txt)
+
+uji.json adalah set evaluasi: tidak di-index kecuali diminta eksplisit dengan --include-eval
+(jawaban `expected` yang ter-index akan bocor ke evaluasi RAG).
+
+Struktur index (<index_dir>/):
+    manifest.json            sumber -> signature file + jumlah chunk (rebuild incremental per sumber)
+    sources/<slug>.jsonl     chunk per sumber
+    sources/<slug>.f16       embedding chunk per sumber (float16)
+    meta.json                dim, jumlah chunk, embedder, IVF
+    chunks.jsonl             seluruh chunk (id global)
+    vectors.f16              matriks embedding gabungan, di-memory-map saat query
+    bm25.json                inverted index BM25
+    ivf.npz                  (opsional) centroid k-means + daftar anggota per cluster
+
+Query hybrid = reciprocal rank fusion dari hasil dense (cosine) dan BM25.
+
+Usage:
+    python retrieval.py build
+    python retrieval.py build --embedder hashing --ivf 16
+    python retrieval.py build --sources dataset_v2.txt uji.json --include-eval   # demo, bukan untuk evaluasi
+    python retrieval.py search "kapan gelombang 2 dibuka?" -k 5
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import time
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache, normalize_text
+from qa_parser import iter_qa_records
+
+INDEX_DIR = ".retrieval"
+DEFAULT_SOURCES = ["dataset_v2.txt", "data/data_group_*.txt"]
+# Set evaluasi; hanya di-index jika include_eval=True
+EVAL_SOURCES = ("uji.json",)
+DEFAULT_EMBEDDER = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+HASHING_EMBEDDER = "hashing"
+MAX_CHUNK_CHARS = 600
+CHUNK_VERSION = 1
+RRF_K = 60
+
+
+# ============================================================
+# 🔢 Embedder
+# ============================================================
+
+class HashingEmbedder:
+    """
+    Embedder tanpa dependensi: TF karakter 3-gram di-hash ke `dim` dimensi.
+    API encode() sama dengan SentenceTransformer sehingga bisa dipakai di EmbeddingCache.
+    """
+
+    def __init__(self, dim: int = 512, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+        self.name = f"{HASHING_EMBEDDER}-char{ngram}-{dim}"
+
+    def encode(self, texts, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            text = f" {normalize_text(text).lower()} "
+            cols = [zlib.crc32(text[i:i + self.ngram].encode("utf-8")) % self.dim
+                    for i in range(len(text) - self.ngram + 1)]
+            np.add.at(matrix[row], cols, 1.0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+
+def load_embedder(name: str):
+    if name.startswith(HASHING_EMBEDDER):
+        return HashingEmbedder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+def encode_texts(texts: List[str], embedder, name: str) -> np.ndarray:
+    """Embedding ter-normalisasi; embedder model di-cache di disk lewat EmbeddingCache"""
+    if isinstance(embedder, HashingEmbedder):
+        vectors = embedder.encode(texts)
+    else:
+        vectors = EmbeddingCache(name).encode(texts, embedder, batch_size=32, show_progress_bar=False)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+# ============================================================
+# ✂️ Chunking sumber
+# ============================================================
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFC", text).lower()
+    return re.findall(r"\w+", text)
+
+
+def chunk_text(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """Pecah teks panjang per kalimat menjadi potongan <= max_chars"""
+    if len(text) <= max_chars:
+        return [text]
+    chunks, current = [], ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def iter_source_chunks(path: str, max_chars: int = MAX_CHUNK_CHARS) -> Iterator[Dict]:
+    """Chunk {source, ref, question, text} dari file Q/A .txt atau uji.json (field expected)"""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        for item in items:
+            for piece in chunk_text(item.get("expected", ""), max_chars):
+                if piece:
+                    yield {"source": path, "ref": f"id {item.get('id')}", "question": item["question"], "text": piece}
+        return
+
+    for record in iter_qa_records(path):
+        for piece in chunk_text(record.answer, max_chars):
+            yield {"source": path, "ref": f"line {record.line}", "question": record.question, "text": piece}
+
+
+def chunk_document(chunk: Dict) -> str:
+    """Teks yang di-embed & di-index BM25: pertanyaan + jawaban"""
+    return f"{chunk['question']}\n{chunk['text']}"
+
+
+def expand_sources(patterns: List[str]) -> List[str]:
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(m for m in matches if m not in paths)
+    return paths
+
+
+# ============================================================
+# 📚 BM25
+# ============================================================
+
+class BM25Index:
+    def __init__(self, postings: Dict[str, Tuple[List[int], List[int]]], doc_len: List[int],
+                 k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_len = np.asarray(doc_len, dtype=np.float32)
+        self.avgdl = float(self.doc_len.mean()) if len(doc_len) else 0.0
+        self.postings = {
+            term: (np.asarray(ids, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            for term, (ids, tfs) in postings.items()
+        }
+
+    @classmethod
+    def build(cls, documents: List[List[str]]) -> "BM25Index":
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for doc_id, tokens in enumerate(documents):
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                ids, tfs = postings.setdefault(token, ([], []))
+                ids.append(doc_id)
+                tfs.append(tf)
+        return cls(postings, [len(tokens) for tokens in documents])
+
+    def save(self, path: Path) -> None:
+        data = {
+            "k1": self.k1, "b": self.b,
+            "doc_len": self.doc_len.astype(int).tolist(),
+            "postings": {t: [ids.tolist(), tfs.astype(int).tolist()] for t, (ids, tfs) in self.postings.items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["postings"], data["doc_len"], data["k1"], data["b"])
+
+    def scores(self, tokens: List[str]) -> np.ndarray:
+        n_docs = len(self.doc_len)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokens):
+            if term not in self.postings:
+                continue
+            ids, tfs = self.postings[term]
+            idf = math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[ids] / self.avgdl)
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+
+# ============================================================
+# 🧭 IVF (k-means)
+# ============================================================
+
+def train_ivf(matrix: np.ndarray, n_lists: int, iterations: int = 20, seed: int = 0):
+    """Spherical k-means; return (centroids, order, offsets) dengan anggota cluster c = order[offsets[c]:offsets[c+1]]"""
+    rng = np.random.default_rng(seed)
+    n_lists = min(n_lists, len(matrix))
+    centroids = matrix[rng.choice(len(matrix), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(matrix @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = matrix[assign == c]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+    assign = np.argmax(matrix @ centroids.T, axis=1)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.searchsorted(assign[order], np.arange(n_lists + 1))
+    return centroids.astype(np.float32), order.astype(np.int64), offsets.astype(np.int64)
+
+
+# ============================================================
+# 🏗️ Build incremental
+# ============================================================
+
+def _slug(path: str) -> str:
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:10]
+    return f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', Path(path).stem)}-{digest}"
+
+
+def _file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_json(path: Path, data) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_index(source_patterns: List[str], index_dir: str = INDEX_DIR, embedder_id: str = DEFAULT_EMBEDDER,
+                ivf_lists: int = 0, max_chars: int = MAX_CHUNK_CHARS, force: bool = False,
+                include_eval: bool = False) -> Dict:
+    sources = expand_sources(source_patterns)
+    eval_sources = [p for p in sources if os.path.basename(p) in EVAL_SOURCES]
+    if eval_sources and not include_eval:
+        raise ValueError(f"{', '.join(eval_sources)} adalah set evaluasi; tambahkan --include-eval "
+                         f"jika memang ingin di-index (jawaban expected akan bocor ke evaluasi)")
+
+    root = Path(index_dir)
+    shard_dir = root / "sources"
+    manifest_path = root / "manifest.json"
+    embedder = None
+    name = HashingEmbedder().name if embedder_id.startswith(HASHING_EMBEDDER) else embedder_id
+
+    settings = {"embedder": name, "max_chars": max_chars, "chunk_version": CHUNK_VERSION}
+    manifest = {"settings": settings, "sources": {}}
+    if manifest_path.exists() and not force:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        if previous.get("settings") == settings:
+            manifest = previous
+        else:
+            print("⚠️  Setting index berubah, semua sumber di-index ulang")
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    rebuilt, reused = [], []
+    for path in sources:
+        st = os.stat(path)
+        entry = manifest["sources"].get(path)
+        slug = _slug(path)
+        shard_ok = (shard_dir / f"{slug}.jsonl").exists() and (shard_dir / f"{slug}.f16").exists()
+        if entry and shard_ok:
+            if entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                reused.append(path)
+                continue
+            sha1 = _file_sha1(path)
+            if entry["sha1"] == sha1:
+                entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+                reused.append(path)
+                continue
+
+        if embedder is None:
+            print(f"🔄 Loading embedder: {name}")
+            embedder = load_embedder(name)
+        chunks = list(iter_source_chunks(path, max_chars))
+        vectors = encode_texts([chunk_document(c) for c in chunks], embedder, name) if chunks else np.zeros((0, 0))
+        with open(shard_dir / f"{slug}.jsonl", "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        vectors.astype(np.float16).tofile(shard_dir / f"{slug}.f16")
+        manifest["sources"][path] = {
+            "slug": slug, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+            "sha1": _file_sha1(path), "chunks": len(chunks), "dim": int(vectors.shape[1]) if chunks else None,
+        }
+        rebuilt.append(path)
+        print(f"   ✓ {path}: {len(chunks)} chunk")
+
+    removed = [p for p in manifest["sources"] if p not in sources]
+    for path in removed:
+        slug = manifest["sources"].pop(path)["slug"]
+        for suffix in (".jsonl", ".f16"):
+            (shard_dir / f"{slug}{suffix}").unlink(missing_ok=True)
+
+    meta_path = root / "meta.json"
+    previous_ivf = None
+    if meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as f:
+            previous_ivf = json.load(f).get("ivf_lists")
+    if rebuilt or removed or not meta_path.exists() or previous_ivf != ivf_lists:
+        merge_shards(root, sources, manifest, ivf_lists)
+    _write_json(manifest_path, manifest)
+
+    return {"sources": len(sources), "rebuilt": rebuilt, "reused": reused, "removed": removed}
+
+
+def merge_shards(root: Path, sources: List[str], manifest: Dict, ivf_lists: int) -> None:
+    """Gabungkan shard per sumber -> chunks.jsonl, vectors.f16, bm25.json, ivf.npz"""
+    dims = {e["dim"] for e in manifest["sources"].values() if e["dim"]}
+    if len(dims) > 1:
+        raise ValueError(f"Dimensi embedding antar sumber tidak sama: {dims}")
+    dim = dims.pop() if dims else 0
+
+    documents = []
+    total = 0
+    with open(root / "chunks.jsonl", "w", encoding="utf-8") as chunks_out, \
+            open(root / "vectors.f16", "wb") as vectors_out:
+        for path in sources:
+            slug = manifest["sources"][path]["slug"]
+            with open(root / "sources" / f"{slug}.jsonl", "r", encoding="utf-8") as f:
+                for line in f:
+                    chunk = json.loads(line)
+                    chunk["id"] = total
+                    chunks_out.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+                    documents.append(tokenize(chunk_document(chunk)))
+                    total += 1
+            with open(root / "sources" / f"{slug}.f16", "rb") as f:
+                shutil.copyfileobj(f, vectors_out)
+
+    BM25Index.build(documents).save(root / "bm25.json")
+
+    ivf_path = root / "ivf.npz"
+    if ivf_lists and total:
+        matrix = np.fromfile(root / "vectors.f16", dtype=np.float16).reshape(total, dim).astype(np.float32)
+        centroids, order, offsets = train_ivf(matrix, ivf_lists)
+        np.savez(ivf_path, centroids=centroids, order=order, offsets=offsets)
+    elif ivf_path.exists():
+        ivf_path.unlink()
+
+    _write_json(root / "meta.json", {
+        "embedder": manifest["settings"]["embedder"],
+        "dim": dim,
+        "chunks": total,
+        "ivf_lists": ivf_lists,
+    })
+
+
+# ============================================================
+# 🔍 Query
+# ============================================================
+
+class RetrievalIndex:
+    """Index hasil build_index; vectors di-memory-map, embedder query di-load sekali"""
+
+    def __init__(self, index_dir: str = INDEX_DIR, embedder=None):
+        self.root = Path(index_dir)
+        with open(self.root / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.embedder_name = self.meta["embedder"]
+        self.embedder = embedder or load_embedder(self.embedder_name)
+
+        n, dim = self.meta["chunks"], self.meta["dim"]
+        self.vectors = np.memmap(self.root / "vectors.f16", dtype=np.float16, mode="r", shape=(n, dim)) if n else None
+        with open(self.root / "chunks.jsonl", "r", encoding="utf-8") as f:
+            self.chunks = [json.loads(line) for line in f]
+        self.bm25 = BM25Index.load(self.root / "bm25.json")
+
+        self.ivf = None
+        if (self.root / "ivf.npz").exists():
+            data = np.load(self.root / "ivf.npz")
+            self.ivf = (data["centroids"], data["order"], data["offsets"])
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embedder.encode([query], convert_to_numpy=True), dtype=np.float32)[0]
+        return vector / max(np.linalg.norm(vector), 1e-12)
+
+    def dense_search(self, query_vector: np.ndarray, k: int, nprobe: int = 4) -> List[Tuple[int, float]]:
+        if self.vectors is None:
+            return []
+        if self.ivf is not None:
+            centroids, order, offsets = self.ivf
+            probes = np.argsort(-(centroids @ query_vector))[:nprobe]
+            # urutkan supaya akses memmap sekuensial
+            candidates = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes]))
+        else:
+            candidates = np.arange(len(self.vectors))
+        scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query_vector
+        top = np.argsort(-scores)[:k]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def bm25_search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        scores = self.bm25.scores(tokenize(query))
+        top = np.argsort(-scores)[:k]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def search(self, query: str, k: int = 5, mode: str = "hybrid", nprobe: int = 4) -> List[Dict]:
+        """
+        Top-k chunk untuk query. mode: dense | bm25 | hybrid (reciprocal rank fusion)
+        """
+        depth = max(k * 4, 20)
+        dense = self.dense_search(self.embed_query(query), depth, nprobe) if mode in ("dense", "hybrid") else []
+        sparse = self.bm25_search(query, depth) if mode in ("bm25", "hybrid") else []
+
+        if mode == "dense":
+            ranked = dense[:k]
+        elif mode == "bm25":
+            ranked = sparse[:k]
+        else:
+            fused: Dict[int, float] = {}
+            for results in (dense, sparse):
+                for rank, (chunk_id, _) in enumerate(results):
+                    fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            ranked = sorted(fused.items(), key=lambda x: -x[1])[:k]
+
+        return [dict(self.chunks[chunk_id], score=round(score, 4)) for chunk_id, score in ranked]
+
+    def context_for(self, question: str, k: int = 3) -> List[str]:
+        """Potongan teks rujukan untuk prompt (dedup jawaban yang sama)"""
+        passages = []
+        for hit in self.search(question, k * 2):
+            if hit["text"] not in passages:
+                passages.append(hit["text"])
+            if len(passages) == k:
+                break
+        return passages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index retrieval knowledge base PMB")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build / update index (incremental per sumber)")
+    build.add_argument("--sources", nargs="+", default=DEFAULT_SOURCES)
+    build.add_argument("--embedder", default=DEFAULT_EMBEDDER, help=f"Model sentence-transformers atau '{HASHING_EMBEDDER}'")
+    build.add_argument("--ivf", type=int, default=0, help="Jumlah cluster IVF (0 = brute force)")
+    build.add_argument("--max-chars", type=int, default=MAX_CHUNK_CHARS)
+    build.add_argument("--force", action="store_true")
+    build.add_argument("--include-eval", action="store_true",
+                       help=f"Izinkan set evaluasi ({', '.join(EVAL_SOURCES)}) masuk index")
+
+    search = sub.add_parser("search", help="Query index")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    search.add_argument("--mode", choices=["hybrid", "dense", "bm25"], default="hybrid")
+    search.add_argument("--nprobe", type=int, default=4)
+
+    for p in (build, search):
+        p.add_argument("--index-dir", default=INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        try:
+            result = build_index(args.sources, args.index_dir, args.embedder, args.ivf, args.max_chars, args.force,
+                                 args.include_eval)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"\n✅ Index {args.index_dir}: {result['sources']} sumber "
+              f"({len(result['rebuilt'])} di-index ulang, {len(result['reused'])} dipakai ulang, "
+              f"{len(result['removed'])} dihapus) dalam {time.perf_counter() - started:.2f}s")
+        return
+
+    index = RetrievalIndex(args.index_dir)
+    started = time.perf_counter()
+    hits = index.search(args.query, args.k, args.mode, args.nprobe)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"🔍 {args.query}  ({len(index)} chunk, {elapsed_ms:.2f} ms)")
+    for rank, hit in enumerate(hits, start=1):
+        print(f"\n{rank}. [{hit['score']}] {hit['source']} ({hit['ref']})")
+        print(f"   Q: {hit['question']}")
+        print(f"   A: {hit['text'][:200]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,98 +3,159 @@ Script untuk validasi cosine similarity pasangan Q-A menggunakan sentence-transf
 Mengecek bahwa setiap pasangan Q-A memiliki:
 1. Cosine similarity > 0.85
 2. Tidak identik secara string
+
+Usage:
+    python similarity.py                                  # = score data_v3.txt
+    python similarity.py parse dataset_v3.txt --output pairs.jsonl
+    python similarity.py score dataset_v3.txt             # embed + skor, simpan similarity_results.json
+    python similarity.py report                           # cetak ulang laporan dari similarity_results.json
+    python similarity.py score dataset_v3.txt --backend int8 --threads 4 --check-agreement
+
+sentence-transformers/torch hanya di-import oleh subcommand `score`, dan model
+di-load di background thread selama parsing berjalan (lihat BackgroundModel).
+Run report (timing per stage): run_reports/similarity.json
 """
 
+import argparse
+import json
 import re
+import sys
+import threading
 from typing import List, Tuple, Dict
-from sentence_transformers import SentenceTransformer, util
-import torch
+import numpy as np
+
+from embedding_backend import (
+    AGREEMENT_MARGIN, DEFAULT_MODEL, EmbeddingBackend, add_backend_args, compare_scores
+)
+from embedding_cache import EmbeddingCache
+from profiling import RunProfiler, add_profiling_args
+from qa_parser import iter_qa_records
+
+DATA_FILE = "data_v3.txt"
+RESULTS_FILE = "similarity_results.json"
+REPORT_FILE = "similarity_report_detailed.txt"
+
+SIMILARITY_THRESHOLD = 0.85
+
+# Rentang distribusi similarity: (min inklusif, max eksklusif, label)
+SIMILARITY_RANGES = [
+    (0.0, 0.5, "Sangat rendah (< 0.5)"),
+    (0.5, 0.7, "Rendah (0.5-0.7)"),
+    (0.7, 0.85, "Sedang (0.7-0.85)"),
+    (0.85, 0.95, "Tinggi (0.85-0.95)"),
+    (0.95, 1.01, "Sangat tinggi (≥ 0.95)")
+]
 
 def parse_qa_pairs(file_path: str) -> List[Tuple[str, str, int]]:
     """
-    Parse file data_v3.txt untuk ekstrak pasangan Q-A
+    Parse file data_v3.txt untuk ekstrak pasangan Q-A (termasuk jawaban multi-baris)
     Returns: List of (question, answer, line_number)
     """
-    qa_pairs = []
-
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+    return [(r.question, r.answer, r.line) for r in iter_qa_records(file_path)]
 
-        # Cek apakah baris dimulai dengan "Q:"
-        if line.startswith('Q:'):
-            question = line[2:].strip()  # Hapus "Q:" prefix
-            q_line_num = i + 1  # Line number (1-indexed)
+def score_pairs(question_embeddings, answer_embeddings) -> np.ndarray:
+    """
+    Hitung cosine similarity untuk semua pasangan sekaligus (batched)
+    Kedua matriks dinormalisasi sekali, lalu skor diambil dari dot product per baris
+    Returns: array float32 berukuran (n_pairs,)
+    """
+    q = np.asarray(question_embeddings, dtype=np.float32)
+    a = np.asarray(answer_embeddings, dtype=np.float32)
 
-            # Cari answer di baris berikutnya
-            i += 1
-            if i < len(lines):
-                answer_line = lines[i].strip()
-                if answer_line.startswith('A:'):
-                    answer = answer_line[2:].strip()  # Hapus "A:" prefix
-                    qa_pairs.append((question, answer, q_line_num))
+    q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
 
-        i += 1
+    return np.einsum('ij,ij->i', q, a)
 
-    return qa_pairs
+def similarity_distribution(scores: np.ndarray) -> List[Tuple[str, int]]:
+    """
+    Hitung jumlah skor per rentang SIMILARITY_RANGES (batas bawah inklusif, atas eksklusif)
+    """
+    edges = [SIMILARITY_RANGES[0][0]] + [max_val for _, max_val, _ in SIMILARITY_RANGES]
+    positions = np.searchsorted(np.sort(scores), edges, side='left')
+    counts = np.diff(positions)
+    return [(label, int(count)) for (_, _, label), count in zip(SIMILARITY_RANGES, counts)]
 
-def calculate_similarity_stats(qa_pairs: List[Tuple[str, str, int]], model) -> Dict:
+def refine_borderline(scores: np.ndarray, questions: List[str], answers: List[str], reference_encode,
+                      margin: float) -> np.ndarray:
+    """
+    Hitung ulang dengan model referensi (fp32) pasangan yang skornya dalam ±margin dari threshold
+    Jika selisih backend vs fp32 < margin, keputusan lulus/gagal identik dengan fp32 penuh
+    """
+    idx = np.flatnonzero(np.abs(scores - SIMILARITY_THRESHOLD) <= margin)
+    if len(idx) == 0:
+        return scores
+    texts = [questions[i] for i in idx] + [answers[i] for i in idx]
+    vectors = reference_encode(texts)
+    refined = scores.copy()
+    refined[idx] = score_pairs(vectors[:len(idx)], vectors[len(idx):])
+    print(f"   🎯 {len(idx)} pasangan dalam ±{margin} dari threshold dihitung ulang dengan fp32")
+    return refined
+
+def calculate_similarity_stats(qa_pairs: List[Tuple[str, str, int]], model, cache: EmbeddingCache = None,
+                               profiler: RunProfiler = None, refine=None) -> Dict:
     """
     Hitung cosine similarity untuk semua pasangan Q-A
+    Jika cache diberikan, hanya teks yang belum ada di cache yang di-encode model
+    refine: opsional f(scores, questions, answers) -> scores (mis. refine_borderline)
     """
+    profiler = profiler or RunProfiler()
     print(f"\nMemproses {len(qa_pairs)} pasangan Q-A...")
     print("Menghitung embeddings...")
 
     questions = [qa[0] for qa in qa_pairs]
     answers = [qa[1] for qa in qa_pairs]
 
-    # Generate embeddings
-    question_embeddings = model.encode(questions, convert_to_tensor=True, show_progress_bar=True)
-    answer_embeddings = model.encode(answers, convert_to_tensor=True, show_progress_bar=True)
-
-    # Hitung cosine similarity untuk setiap pasangan
-    similarities = []
-    for i in range(len(qa_pairs)):
-        sim = util.cos_sim(question_embeddings[i], answer_embeddings[i]).item()
-        similarities.append(sim)
-
-    # Analisis hasil
-    results = {
-        'total_pairs': len(qa_pairs),
-        'similarities': similarities,
-        'min_similarity': min(similarities),
-        'max_similarity': max(similarities),
-        'avg_similarity': sum(similarities) / len(similarities),
-        'pairs_above_085': sum(1 for s in similarities if s > 0.85),
-        'pairs_below_085': [],
-        'identical_pairs': [],
-        'all_results': []
-    }
-
-    # Identifikasi pasangan bermasalah
-    for i, (q, a, line_num) in enumerate(qa_pairs):
-        sim = similarities[i]
-        is_identical = (q.lower().strip() == a.lower().strip())
-
-        result = {
+    # Generate embeddings: pertanyaan + jawaban dalam satu panggilan, sehingga
+    # batch yang diurutkan per panjang mencakup kedua kelompok teks
+    with profiler.stage("embed", records=len(questions) + len(answers)):
+        if cache is not None:
+            embeddings = cache.encode(questions + answers, model, show_progress_bar=True)
+            print(f"   Cache: {cache.hits} hit, {cache.misses} miss")
+            profiler.set(cache_hits=cache.hits, cache_misses=cache.misses)
+        else:
+            embeddings = model.encode(questions + answers, convert_to_numpy=True, show_progress_bar=True)
+        question_embeddings, answer_embeddings = embeddings[:len(questions)], embeddings[len(questions):]
+
+    with profiler.stage("score", records=len(qa_pairs)):
+        # Hitung cosine similarity untuk semua pasangan dalam satu operasi
+        scores = score_pairs(question_embeddings, answer_embeddings)
+        if refine is not None:
+            scores = refine(scores, questions, answers)
+
+        # Flag validasi dihitung dari array skor
+        identical = np.array([q.lower().strip() == a.lower().strip() for q, a in zip(questions, answers)], dtype=bool)
+        above = scores > SIMILARITY_THRESHOLD
+        passes = above & ~identical
+
+    similarities = scores.tolist()
+    all_results = [
+        {
             'line': line_num,
             'question': q,
             'answer': a,
             'similarity': sim,
             'is_identical': is_identical,
-            'passes': sim > 0.85 and not is_identical
+            'passes': passed
         }
+        for (q, a, line_num), sim, is_identical, passed
+        in zip(qa_pairs, similarities, identical.tolist(), passes.tolist())
+    ]
 
-        results['all_results'].append(result)
-
-        if sim <= 0.85:
-            results['pairs_below_085'].append(result)
-
-        if is_identical:
-            results['identical_pairs'].append(result)
+    # Analisis hasil
+    results = {
+        'total_pairs': len(qa_pairs),
+        'similarities': similarities,
+        'min_similarity': float(scores.min()),
+        'max_similarity': float(scores.max()),
+        'avg_similarity': float(scores.mean()),
+        'pairs_above_085': int(above.sum()),
+        'pairs_passed': int(passes.sum()),
+        'pairs_below_085': [all_results[i] for i in np.flatnonzero(~above)],
+        'identical_pairs': [all_results[i] for i in np.flatnonzero(identical)],
+        'distribution': similarity_distribution(scores),
+        'all_results': all_results
+    }
 
     return results
 
@@ -118,7 +179,7 @@ def print_report(results: Dict):
     print(f"  Pasangan identik (string): {len(results['identical_pairs'])}")
 
     # Hitung pasangan yang LULUS validasi
-    passed = sum(1 for r in results['all_results'] if r['passes'])
+    passed = results['pairs_passed']
     print(f"\n🎯 HASIL AKHIR:")
     print(f"  Pasangan LULUS (similarity > 0.85 DAN tidak identik): {passed}/{results['total_pairs']} ({passed/results['total_pairs']*100:.1f}%)")
 
@@ -148,16 +209,7 @@ def print_report(results: Dict):
 
     # Distribusi similarity
     print(f"\n📈 DISTRIBUSI SIMILARITY:")
-    ranges = [
-        (0.0, 0.5, "Sangat rendah (< 0.5)"),
-        (0.5, 0.7, "Rendah (0.5-0.7)"),
-        (0.7, 0.85, "Sedang (0.7-0.85)"),
-        (0.85, 0.95, "Tinggi (0.85-0.95)"),
-        (0.95, 1.01, "Sangat tinggi (≥ 0.95)")
-    ]
-
-    for min_val, max_val, label in ranges:
-        count = sum(1 for s in results['similarities'] if min_val <= s < max_val)
+    for label, count in results['distribution']:
         percentage = count / results['total_pairs'] * 100
         bar = '█' * int(percentage / 2)
         print(f"  {label:25} {count:4d} ({percentage:5.1f}%) {bar}")
@@ -205,11 +257,56 @@ def save_detailed_report(results: Dict, output_file: str):
 
     print(f"\n💾 Laporan detail disimpan ke: {output_file}")
 
-def main():
-    # Path file
-    data_file = "data_v3.txt"
-    report_file = "similarity_report_detailed.txt"
+class BackgroundModel:
+    """
+    EmbeddingBackend yang di-load di thread terpisah
+    start() memulai load (import torch + bobot model) tanpa memblokir; encode() pertama
+    menunggu load selesai. Jika semua embedding ada di cache, encode() tidak pernah dipanggil.
+    """
 
+    def __init__(self, encoder: EmbeddingBackend):
+        self.encoder = encoder
+        self._model = None
+        self._error = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            self._model = self.encoder.load()
+        except BaseException as e:  # diteruskan ke thread pemanggil encode()
+            self._error = e
+
+    def start(self) -> "BackgroundModel":
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+                self._thread.start()
+        return self
+
+    def get(self):
+        self.start()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._model
+
+    def encode(self, texts, **kwargs):
+        return self.get().encode(texts, **kwargs)
+
+
+def save_results(results: Dict, output_file: str):
+    """Simpan hasil skor (tanpa embedding) agar laporan bisa dicetak ulang tanpa model"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False)
+
+
+def load_results(input_file: str) -> Dict:
+    with open(input_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_header(data_file: str):
     print("="*80)
     print("VALIDASI COSINE SIMILARITY PASANGAN Q-A")
     print("="*80)
@@ -218,28 +315,151 @@ def main():
     print(f"  1. Cosine similarity > 0.85")
     print(f"  2. Tidak identik secara string (Q ≠ A)")
 
-    # Load model
-    print(f"\n🔄 Loading model sentence-transformers...")
-    model_name = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2'
-    print(f"   Model: {model_name}")
-    model = SentenceTransformer(model_name)
-    print("   ✓ Model loaded")
+
+def parse_command(args, profiler: RunProfiler):
+    print(f"📖 Parsing file {args.data_file}...")
+    profiler.add_file("input", args.data_file)
+    with profiler.stage("parse") as stage:
+        qa_pairs = parse_qa_pairs(args.data_file)
+        stage.add(len(qa_pairs))
+    print(f"   ✓ Ditemukan {len(qa_pairs)} pasangan Q-A")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for question, answer, line_num in qa_pairs:
+                f.write(json.dumps({"line": line_num, "question": question, "answer": answer}, ensure_ascii=False) + "\n")
+        print(f"💾 Pasangan Q-A disimpan ke: {args.output}")
+    else:
+        for question, answer, line_num in qa_pairs[:5]:
+            print(f"   [{line_num}] Q: {question[:70]} | A: {answer[:70]}")
+    profiler.set(pairs=len(qa_pairs))
+
+
+def score_command(args, profiler: RunProfiler):
+    print_header(args.data_file)
+    profiler.add_file("input", args.data_file)
+
+    # Load model dimulai sekarang, paralel dengan parsing
+    encoder = EmbeddingBackend(args.model, args.backend, args.threads, args.batch_size)
+    model = BackgroundModel(encoder)
+    if not args.no_prefetch:
+        model.start()
 
     # Parse file
-    print(f"\n📖 Parsing file {data_file}...")
-    qa_pairs = parse_qa_pairs(data_file)
+    print(f"\n📖 Parsing file {args.data_file}...")
+    with profiler.stage("parse") as stage:
+        qa_pairs = parse_qa_pairs(args.data_file)
+        stage.add(len(qa_pairs))
     print(f"   ✓ Ditemukan {len(qa_pairs)} pasangan Q-A")
 
+    # Model hanya ditunggu jika ada teks yang belum ada di cache
+    cache = EmbeddingCache(encoder.name)
+    questions = [qa[0] for qa in qa_pairs]
+    answers = [qa[1] for qa in qa_pairs]
+    n_missing = len(cache.missing(questions + answers))
+
+    if n_missing:
+        print(f"\n🔄 Loading model sentence-transformers ({n_missing} teks belum ada di cache)...")
+        print(f"   Model: {args.model} (backend {args.backend}, threads {args.threads or 'auto'})")
+        with profiler.stage("load_model"):
+            model.get()
+        print("   ✓ Model loaded")
+    else:
+        print(f"\n⚡ Semua embedding tersedia di cache, model tidak perlu di-load")
+
+    # Backend non-fp32: model & cache fp32 sebagai referensi, di-load hanya jika dibutuhkan
+    refine = None
+    reference_encode = None
+    if args.backend != "fp32":
+        reference_cache = EmbeddingCache(args.model)
+        reference_model = BackgroundModel(EmbeddingBackend(args.model, "fp32", args.threads, args.batch_size))
+        reference_encode = lambda texts: reference_cache.encode(texts, reference_model)
+        if args.fp32_margin > 0:
+            refine = lambda scores, q, a: refine_borderline(scores, q, a, reference_encode, args.fp32_margin)
+
     # Hitung similarity
-    results = calculate_similarity_stats(qa_pairs, model)
+    results = calculate_similarity_stats(qa_pairs, model, cache, profiler, refine)
+    results['backend'] = args.backend
+
+    if args.check_agreement and reference_encode is not None:
+        with profiler.stage("agreement", records=len(qa_pairs)):
+            reference = reference_encode(questions + answers)
+            reference_scores = score_pairs(reference[:len(questions)], reference[len(questions):])
+            raw = cache.encode(questions + answers, model)
+            raw_scores = score_pairs(raw[:len(questions)], raw[len(questions):])
+            results['agreement'] = {
+                "raw": compare_scores(reference_scores, raw_scores, SIMILARITY_THRESHOLD),
+                "final": compare_scores(reference_scores, np.array(results['similarities']), SIMILARITY_THRESHOLD),
+            }
+        raw, final = results['agreement']['raw'], results['agreement']['final']
+        print(f"\n🔬 Kesepakatan {args.backend} vs fp32 ({raw['pairs']} pasangan):")
+        print(f"   Selisih skor maks {raw['max_abs_diff']:.4f}, rata-rata {raw['mean_abs_diff']:.4f}, "
+              f"pearson {raw['pearson']:.4f}")
+        print(f"   Keputusan berubah sebelum koreksi: {raw['flips']}, setelah koreksi margin: {final['flips']}")
+        if not final['agree']:
+            print(f"   ⚠️  Naikkan --fp32-margin (sekarang {args.fp32_margin}) di atas {raw['max_abs_diff']:.4f}")
+        profiler.set(agreement_flips=final['flips'], max_abs_diff=raw['max_abs_diff'])
 
     # Print laporan
     print_report(results)
 
-    # Simpan laporan detail
-    save_detailed_report(results, report_file)
+    # Simpan hasil skor + laporan detail
+    with profiler.stage("write_report", records=len(qa_pairs)):
+        save_results(results, args.results)
+        save_detailed_report(results, args.report_file)
+    print(f"💾 Hasil skor disimpan ke: {args.results} (cetak ulang: python similarity.py report)")
+    profiler.set(pairs=results['total_pairs'], passed=results['pairs_passed'],
+                 avg_similarity=round(results['avg_similarity'], 4), model_loaded=n_missing > 0)
 
     print(f"\n✅ Validasi selesai!")
 
+
+def report_command(args, profiler: RunProfiler):
+    with profiler.stage("load_results") as stage:
+        results = load_results(args.results)
+        stage.add(results['total_pairs'])
+    print_report(results)
+    if args.report_file:
+        with profiler.stage("write_report", records=results['total_pairs']):
+            save_detailed_report(results, args.report_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validasi cosine similarity pasangan Q-A")
+    sub = parser.add_subparsers(dest="command")
+
+    p_parse = sub.add_parser("parse", help="Parse file Q-A saja (tanpa model)")
+    p_parse.add_argument("data_file", nargs="?", default=DATA_FILE)
+    p_parse.add_argument("--output", help="Tulis pasangan Q-A ke JSONL")
+
+    p_score = sub.add_parser("score", help="Embed + hitung similarity, simpan hasil & laporan")
+    p_score.add_argument("data_file", nargs="?", default=DATA_FILE)
+    p_score.add_argument("--model", default=DEFAULT_MODEL)
+    p_score.add_argument("--results", default=RESULTS_FILE)
+    p_score.add_argument("--report-file", default=REPORT_FILE)
+    p_score.add_argument("--no-prefetch", action="store_true",
+                         help="Jangan load model di background selama parsing")
+    add_backend_args(p_score)
+    p_score.add_argument("--fp32-margin", type=float, default=AGREEMENT_MARGIN,
+                         help="Backend non-fp32: pasangan dalam ±margin dari threshold dihitung ulang dengan fp32 (0 = off)")
+    p_score.add_argument("--check-agreement", action="store_true",
+                         help="Bandingkan semua skor dengan fp32 (load model fp32 jika belum di cache)")
+
+    p_report = sub.add_parser("report", help="Cetak laporan dari hasil skor tersimpan (tanpa model)")
+    p_report.add_argument("--results", default=RESULTS_FILE)
+    p_report.add_argument("--report-file", help="Tulis ulang laporan detail ke file ini")
+
+    for command_parser in (p_parse, p_score, p_report):
+        add_profiling_args(command_parser)
+
+    # tanpa subcommand -> perilaku lama (score dengan default)
+    args = parser.parse_args(sys.argv[1:] or ["score"])
+    if args.command is None:
+        parser.error("subcommand diperlukan: parse, score, atau report")
+
+    handlers = {"parse": parse_command, "score": score_command, "report": report_command}
+    with RunProfiler.from_args(f"similarity_{args.command}", args) as profiler:
+        handlers[args.command](args, profiler)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,256 @@
+"""
+Split train/eval/test deterministik, per grup pertanyaan dasar, stratified per topic
+
+- Semua parafrase satu pertanyaan dasar (variasi di variants/*.json, atau record dengan
+  jawaban yang sama) selalu masuk split yang sama -> tidak ada kebocoran parafrase
+- Grup baru dipilih lewat hash stabil grup, dengan bobot sesuai kekurangan tiap split
+  pada topic-nya, sehingga proporsi per topic mengikuti rasio
+- Satu pass streaming; state (grup -> split, hitungan per topic) disimpan terpisah,
+  sehingga data baru bisa di-append tanpa mengubah assignment lama
+  (--check-stability memverifikasi ini: load state + append tidak memindahkan grup lama)
+
+Usage:
+    python splitter.py dataset_gemma_fix.jsonl --output-prefix data/pmb
+    python splitter.py data_baru.jsonl --output-prefix data/pmb --append
+    python splitter.py "variants/variations_q*_styled.json" --output-prefix data/pmb_variants
+    python splitter.py dataset.json --output-prefix /tmp/pmb --check-stability
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from convert_all import format_item, unique_files
+from dataset_store import iter_source_records, record_topics
+from embedding_cache import normalize_text
+from gemma_format import record_answer, record_question
+from jsonl_io import JsonlWriter
+
+SPLITS = ("train", "eval", "test")
+DEFAULT_RATIOS = (0.7, 0.15, 0.15)
+NO_TOPIC = "_tanpa_topic"
+STATE_VERSION = 1
+
+
+def stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+
+
+def group_key(record: Dict, group_hint: Optional[str] = None, group_by: str = "auto") -> str:
+    """
+    Kunci grup pertanyaan dasar:
+        auto     : pertanyaan dasar (variants) jika diketahui, selain itu jawaban
+                   (semua parafrase berbagi jawaban yang sama), fallback pertanyaan
+        answer   : selalu jawaban
+        question : pertanyaan itu sendiri (tanpa pengelompokan parafrase)
+    """
+    if group_by == "auto" and group_hint:
+        return "base:" + normalize_text(group_hint).lower()
+    if group_by in ("auto", "answer"):
+        answer = record_answer(record)
+        if answer:
+            return "answer:" + normalize_text(answer).lower()
+    question = record_question(record) or json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return "question:" + normalize_text(question).lower()
+
+
+def iter_split_records(path: str) -> Iterator[Tuple[Dict, Optional[str]]]:
+    """(record, pertanyaan dasar) dari dataset apa pun; file variasi diekspansi seperti convert_all.py"""
+    for record in iter_source_records(path):
+        if "variations" in record:
+            base = record.get("question", "").strip()
+            for formatted in format_item(record):
+                yield formatted, base
+        else:
+            yield record, None
+
+
+# ============================================================
+# ✂️ Splitter
+# ============================================================
+
+class GroupSplitter:
+    """Assignment grup -> split yang stabil; state bisa disimpan & di-load untuk append"""
+
+    def __init__(self, ratios: Sequence[float] = DEFAULT_RATIOS, seed: str = "pmb"):
+        total = sum(ratios)
+        self.ratios = [r / total for r in ratios]
+        self.seed = seed
+        self.groups: Dict[str, int] = {}
+        self.counts: Dict[str, List[int]] = {}
+
+    def _digest(self, key: str) -> str:
+        return hashlib.sha1(f"{self.seed}\0{key}".encode("utf-8")).hexdigest()[:16]
+
+    def _choose(self, topic: str, digest: str) -> int:
+        counts = self.counts.setdefault(topic, [0] * len(self.ratios))
+        total = sum(counts) + 1
+        weights = [max(r * total - c, 0.0) for r, c in zip(self.ratios, counts)]
+        if not any(weights):
+            weights = list(self.ratios)
+        # titik acak deterministik dari hash grup, dipetakan ke bobot kumulatif
+        point = int(digest, 16) / 16 ** len(digest) * sum(weights)
+        for split, weight in enumerate(weights):
+            point -= weight
+            if point < 0:
+                return split
+        return len(weights) - 1
+
+    def assign(self, record: Dict, group_hint: Optional[str] = None, group_by: str = "auto") -> int:
+        topic = record_topics(record)[0] or NO_TOPIC
+        digest = self._digest(group_key(record, group_hint, group_by))
+        split = self.groups.get(digest)
+        if split is None:
+            split = self._choose(topic, digest)
+            self.groups[digest] = split
+        self.counts.setdefault(topic, [0] * len(self.ratios))[split] += 1
+        return split
+
+    def split_list(self, records: List[Dict], group_by: str = "auto") -> List[List[Dict]]:
+        """Versi in-memory (dipakai notebook): return [train, eval, test]"""
+        result = [[] for _ in self.ratios]
+        for record in records:
+            result[self.assign(record, group_by=group_by)].append(record)
+        return result
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": STATE_VERSION,
+                "ratios": self.ratios,
+                "seed": self.seed,
+                "counts": self.counts,
+                "groups": self.groups,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "GroupSplitter":
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        splitter = cls(state["ratios"], state["seed"])
+        splitter.counts = state["counts"]
+        splitter.groups = state["groups"]
+        return splitter
+
+
+def check_stability(pairs: List[Tuple[Dict, Optional[str]]], ratios: Sequence[float] = DEFAULT_RATIOS,
+                    group_by: str = "auto", seed: str = "pmb", new_fraction: float = 0.2) -> Dict[str, int]:
+    """
+    Simulasi --append: split bagian awal data, simpan & load state, append sisanya, lalu
+    assign ulang bagian awal. Jumlah record lama yang pindah split harus 0
+    """
+    cut = len(pairs) - int(len(pairs) * new_fraction)
+    old, new = pairs[:cut], pairs[cut:]
+
+    splitter = GroupSplitter(ratios, seed)
+    baseline = [splitter.assign(record, base, group_by) for record, base in old]
+    fd, state_path = tempfile.mkstemp(suffix=".split_state.json")
+    os.close(fd)
+    try:
+        splitter.save(state_path)
+        splitter = GroupSplitter.load(state_path)
+    finally:
+        os.unlink(state_path)
+    for record, base in new:
+        splitter.assign(record, base, group_by)
+    groups_before = len(splitter.groups)
+    again = [splitter.assign(record, base, group_by) for record, base in old]
+    return {
+        "records": len(old),
+        "appended": len(new),
+        "moved": sum(a != b for a, b in zip(baseline, again)),
+        "new_groups_on_reassign": len(splitter.groups) - groups_before,
+    }
+
+
+def split_files(inputs: List[str], output_prefix: str, ratios: Sequence[float] = DEFAULT_RATIOS,
+                append: bool = False, group_by: str = "auto", seed: str = "pmb") -> Dict:
+    """Satu pass streaming: setiap record langsung ditulis ke <prefix>_<split>.jsonl"""
+    state_path = f"{output_prefix}.split_state.json"
+    if append:
+        if not os.path.exists(state_path):
+            raise FileNotFoundError(f"State {state_path} tidak ada; jalankan tanpa --append dulu")
+        splitter = GroupSplitter.load(state_path)
+    else:
+        splitter = GroupSplitter(ratios, seed)
+
+    directory = os.path.dirname(output_prefix)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    outputs = [f"{output_prefix}_{name}.jsonl" for name in SPLITS]
+    groups_before = len(splitter.groups)
+    writers = [JsonlWriter(path, "a" if append else "w") for path in outputs]
+    for writer in writers:
+        writer.__enter__()
+    try:
+        for path in inputs:
+            for record, base in iter_split_records(path):
+                writers[splitter.assign(record, base, group_by)].write(record)
+    finally:
+        for writer in writers:
+            writer.__exit__(None, None, None)
+
+    splitter.save(state_path)
+    return {
+        "outputs": dict(zip(SPLITS, outputs)),
+        "written": dict(zip(SPLITS, (w.count for w in writers))),
+        "new_groups": len(splitter.groups) - groups_before,
+        "groups": len(splitter.groups),
+        "counts": splitter.counts,
+        "ratios": splitter.ratios,
+        "state": state_path,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split train/eval/test stabil per grup & topic")
+    parser.add_argument("inputs", nargs="+", help="File dataset (glob boleh)")
+    parser.add_argument("--output-prefix", required=True, help="mis. data/pmb -> data/pmb_train.jsonl, ...")
+    parser.add_argument("--ratios", type=float, nargs=3, default=list(DEFAULT_RATIOS), metavar=("TRAIN", "EVAL", "TEST"))
+    parser.add_argument("--group-by", choices=["auto", "answer", "question"], default="auto")
+    parser.add_argument("--seed", default="pmb")
+    parser.add_argument("--append", action="store_true", help="Tambahkan data baru ke split yang sudah ada")
+    parser.add_argument("--check-stability", action="store_true",
+                        help="Cek load state + append tidak memindahkan record lama (exit 1 jika berubah)")
+    args = parser.parse_args()
+
+    inputs = unique_files([p for pattern in args.inputs for p in (sorted(glob.glob(pattern)) or [pattern])])
+    if args.check_stability:
+        pairs = [pair for path in inputs for pair in iter_split_records(path)]
+        result = check_stability(pairs, args.ratios, args.group_by, args.seed)
+        print(f"🔁 {result['records']} record lama, {result['appended']} record di-append setelah load state: "
+              f"{result['moved']} record lama pindah split")
+        if result["moved"] or result["new_groups_on_reassign"]:
+            sys.exit(1)
+        print("✅ Assignment split stabil")
+        return
+
+    result = split_files(inputs, args.output_prefix, args.ratios, args.append, args.group_by, args.seed)
+
+    print("=" * 60)
+    print(f"✂️  SPLIT {'(APPEND) ' if args.append else ''}{len(inputs)} file")
+    print("=" * 60)
+    written = result["written"]
+    total = sum(written.values()) or 1
+    for name in SPLITS:
+        print(f"   • {name:5s}: {written[name]:5d} record ({written[name] / total * 100:.1f}%) -> {result['outputs'][name]}")
+    print(f"   • Grup: {result['groups']} ({result['new_groups']} baru)")
+
+    print("\n📊 Distribusi per topic (kumulatif train/eval/test):")
+    for topic, counts in sorted(result["counts"].items(), key=lambda x: -sum(x[1]))[:15]:
+        n = sum(counts)
+        shares = " / ".join(f"{c / n * 100:.0f}%" for c in counts)
+        print(f"   • {topic}: {n} ({shares})")
+    print(f"\n💾 State: {result['state']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Utilitas tokenizer lokal (file tokenizer.json Gemma) untuk statistik panjang token
+
+- Tokenisasi batch via `tokenizers` (Rust, encode_batch)
+- Cache jumlah token per hash teks, otomatis invalid jika file tokenizer berubah
+"""
+
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+TOKEN_CACHE_FILE = ".token_cache.json"
+DEFAULT_BATCH_SIZE = 256
+
+
+def tokenizer_file(tokenizer_path: str) -> Path:
+    """tokenizer.json dari path file atau folder model"""
+    path = Path(tokenizer_path)
+    return path / "tokenizer.json" if path.is_dir() else path
+
+
+def load_tokenizer(tokenizer_path: str):
+    """
+    Load tokenizer cepat dari tokenizer.json (atau folder model yang berisi tokenizer.json)
+    """
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        raise ImportError("Mode exact membutuhkan paket tokenizers: pip install tokenizers")
+
+    return Tokenizer.from_file(str(tokenizer_file(tokenizer_path)))
+
+
+def tokenizer_fingerprint(tokenizer_path: str) -> str:
+    """Hash file tokenizer.json, dipakai sebagai id TokenCountCache"""
+    return file_fingerprint(tokenizer_file(tokenizer_path))
+
+
+def file_fingerprint(path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def text_hash(text: str, add_special_tokens: bool) -> str:
+    return hashlib.sha1(f"{int(add_special_tokens)}\0{text}".encode("utf-8")).hexdigest()
+
+
+class TokenCountCache:
+    """Cache {hash teks: jumlah token} untuk satu tokenizer, disimpan sebagai JSON"""
+
+    def __init__(self, tokenizer_id: str, path: str = TOKEN_CACHE_FILE):
+        self.tokenizer_id = tokenizer_id
+        self.path = path
+        self.counts: Dict[str, int] = {}
+        self.dirty = False
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("tokenizer") == tokenizer_id:
+                self.counts = data.get("counts", {})
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"tokenizer": self.tokenizer_id, "counts": self.counts}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def encode_batch(tokenizer, texts: Sequence[str], add_special_tokens: bool = False) -> List[List[int]]:
+    """Token ids untuk sekumpulan teks dalam satu panggilan batch"""
+    return [enc.ids for enc in tokenizer.encode_batch(list(texts), add_special_tokens=add_special_tokens)]
+
+
+def count_tokens(tokenizer, texts: Sequence[str], cache: TokenCountCache = None,
+                 add_special_tokens: bool = False) -> List[int]:
+    """
+    Jumlah token per teks; hanya teks yang belum ada di cache yang ditokenisasi (batch)
+    """
+    keys = [text_hash(t, add_special_tokens) for t in texts]
+    counts = cache.counts if cache is not None else {}
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in counts and key not in missing:
+            missing[key] = text
+
+    if missing:
+        encoded = tokenizer.encode_batch(list(missing.values()), add_special_tokens=add_special_tokens)
+        for key, enc in zip(missing, encoded):
+            counts[key] = len(enc.ids)
+        if cache is not None:
+            cache.dirty = True
+
+    return [counts[k] for k in keys]
+
+
+def percentiles(values: Sequence[int], points=(50, 90, 95, 99)) -> Dict[str, float]:
+    """Percentile sederhana (nearest-rank) tanpa dependensi numpy"""
+    if not values:
+        return {f"p{p}": 0 for p in points}
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        result[f"p{p}"] = ordered[rank - 1]
+    result["max"] = ordered[-1]
+    return result
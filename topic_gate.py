@@ -0,0 +1,302 @@
+"""
+Gate cepat untuk pertanyaan di luar topik (tanpa memanggil LLM)
+
+Logistic regression atas fitur n-gram yang di-hash (kata, bigram kata, karakter 3-gram),
+dilatih dari data/out_of_topics*.txt (label 1) vs pertanyaan PMB (label 0):
+dataset_v2.txt, data/data_group_*.txt, uji.json, variants/*.json.
+
+Inferensi murni Python (lookup dict bobot), < 1 ms per pertanyaan di CPU.
+Jika probabilitas off-topic >= threshold, jawaban penolakan dari pertanyaan off-topic
+terdekat di data training langsung dikembalikan.
+
+Usage:
+    python topic_gate.py train                      # -> topic_gate.json
+    python topic_gate.py bench                      # precision/recall + latency di data hold-out
+    python topic_gate.py check "cara memasak nasi goreng"
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from answer_cache import VARIANTS_PATTERN, DatasetSource
+from embedding_cache import normalize_text
+from qa_parser import data_group_files, iter_qa_files
+from tokenizer_utils import percentiles
+
+GATE_FILE = "topic_gate.json"
+OFF_TOPIC_FILES = ["data/out_of_topics.txt", "data/out_of_topics_extended.txt"]
+IN_TOPIC_FILES = ["dataset_v2.txt"]
+UJI_FILE = "uji.json"
+NUM_FEATURES = 1 << 18
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_GENERATION_MS = 1500.0
+HOLDOUT_FRACTION = 0.2
+
+
+# ============================================================
+# 🔢 Fitur
+# ============================================================
+
+def extract_features(text: str, num_features: int = NUM_FEATURES) -> List[int]:
+    """Indeks fitur hash (unik) untuk kata, bigram kata, dan karakter 3-gram"""
+    text = normalize_text(text).lower()
+    words = re.findall(r"\w+", text)
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    padded = f" {' '.join(words)} "
+    grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return list({zlib.crc32(g.encode("utf-8")) % num_features for g in grams})
+
+
+# ============================================================
+# 📖 Data
+# ============================================================
+
+def load_training_data() -> Tuple[List[Tuple[str, int]], Dict[str, str]]:
+    """
+    Return ([(pertanyaan, label)], {pertanyaan off-topic: jawaban penolakan})
+    label 1 = di luar topik
+    """
+    refusals = {}
+    samples = []
+    for record in iter_qa_files(p for p in OFF_TOPIC_FILES if os.path.exists(p)):
+        refusals[record.question] = record.answer
+        samples.append((record.question, 1))
+
+    in_topic = {r.question for r in iter_qa_files(IN_TOPIC_FILES + data_group_files())}
+    if os.path.exists(UJI_FILE):
+        with open(UJI_FILE, "r", encoding="utf-8") as f:
+            in_topic.update(item["question"] for item in json.load(f))
+    in_topic.update(q for q, _ in DatasetSource(VARIANTS_PATTERN).load())
+    samples.extend((q, 0) for q in sorted(in_topic - set(refusals)))
+    return samples, refusals
+
+
+def split_holdout(samples: List[Tuple[str, int]], fraction: float = HOLDOUT_FRACTION):
+    """Split stabil berbasis hash teks (sama di setiap run)"""
+    train, holdout = [], []
+    for sample in samples:
+        bucket = zlib.crc32(normalize_text(sample[0]).lower().encode("utf-8")) % 1000
+        (holdout if bucket < fraction * 1000 else train).append(sample)
+    return train, holdout
+
+
+# ============================================================
+# 🧠 Model
+# ============================================================
+
+def _sigmoid(z: float) -> float:
+    if z >= 0:
+        return 1 / (1 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1 + e)
+
+
+class TopicGate:
+    def __init__(self, weights: Dict[int, float], bias: float, threshold: float = DEFAULT_THRESHOLD,
+                 refusals: Optional[Dict[str, str]] = None, num_features: int = NUM_FEATURES):
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+        self.num_features = num_features
+        self.refusals = refusals or {}
+        self.default_refusal = next(iter(self.refusals.values()), "Maaf, pertanyaan Anda di luar topik PMB UNSIQ.")
+
+        # inverted index fitur -> pertanyaan off-topic, untuk memilih penolakan yang paling relevan
+        self._refusal_questions = list(self.refusals)
+        self._refusal_index: Dict[int, List[int]] = {}
+        for idx, question in enumerate(self._refusal_questions):
+            for feature in extract_features(question, num_features):
+                self._refusal_index.setdefault(feature, []).append(idx)
+
+    @classmethod
+    def train(cls, samples: List[Tuple[str, int]], refusals: Dict[str, str], epochs: int = 15,
+              learning_rate: float = 0.5, l2: float = 1e-5, seed: int = 0, **kwargs) -> "TopicGate":
+        """SGD logistic regression; kelas off-topic diberi bobot seimbang dengan kelas in-topic"""
+        featurized = [(extract_features(text), label) for text, label in samples]
+        n_pos = sum(label for _, label in featurized) or 1
+        pos_weight = (len(featurized) - n_pos) / n_pos
+
+        weights: Dict[int, float] = {}
+        bias = 0.0
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(featurized)
+            lr = learning_rate / (1 + epoch)
+            for features, label in featurized:
+                scale = 1 / math.sqrt(len(features) or 1)
+                z = bias + scale * sum(weights.get(f, 0.0) for f in features)
+                grad = (_sigmoid(z) - label) * (pos_weight if label else 1.0)
+                step = lr * grad
+                bias -= step
+                for f in features:
+                    w = weights.get(f, 0.0)
+                    weights[f] = w - step * scale - lr * l2 * w
+        return cls(weights, bias, refusals=refusals, **kwargs)
+
+    def probability(self, text: str) -> float:
+        """Probabilitas pertanyaan di luar topik"""
+        features = extract_features(text, self.num_features)
+        scale = 1 / math.sqrt(len(features) or 1)
+        weights = self.weights
+        return _sigmoid(self.bias + scale * sum(weights.get(f, 0.0) for f in features))
+
+    def nearest_refusal(self, text: str) -> str:
+        votes: Dict[int, int] = {}
+        for feature in extract_features(text, self.num_features):
+            for idx in self._refusal_index.get(feature, ()):
+                votes[idx] = votes.get(idx, 0) + 1
+        if not votes:
+            return self.default_refusal
+        best = max(votes, key=votes.get)
+        return self.refusals[self._refusal_questions[best]]
+
+    def check(self, text: str) -> Optional[Dict]:
+        """Return {"answer", "off_topic_prob"} jika pertanyaan ditolak, None jika diteruskan ke model"""
+        prob = self.probability(text)
+        if prob < self.threshold:
+            return None
+        return {"answer": self.nearest_refusal(text), "off_topic_prob": round(prob, 4)}
+
+    def save(self, path: str = GATE_FILE) -> None:
+        data = {
+            "num_features": self.num_features,
+            "threshold": self.threshold,
+            "bias": self.bias,
+            # bobot sangat kecil dibuang supaya file tetap ringkas
+            "weights": {str(f): round(w, 5) for f, w in self.weights.items() if abs(w) >= 1e-4},
+            "refusals": self.refusals,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = GATE_FILE, threshold: Optional[float] = None) -> "TopicGate":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        weights = {int(f): w for f, w in data["weights"].items()}
+        return cls(weights, data["bias"], threshold if threshold is not None else data["threshold"],
+                   data["refusals"], data["num_features"])
+
+
+# ============================================================
+# 📊 Benchmark
+# ============================================================
+
+def reference_generation_ms(report_file: str = "eval_report.json") -> Optional[float]:
+    """Latency p50 generate dari laporan eval_runner.py (jika ada)"""
+    if not os.path.exists(report_file):
+        return None
+    with open(report_file, "r", encoding="utf-8") as f:
+        report = json.load(f).get("report", {})
+    return report.get("performance", {}).get("latency_ms", {}).get("p50") or None
+
+
+def benchmark(gate: TopicGate, holdout: List[Tuple[str, int]], generation_ms: float) -> Dict:
+    tp = fp = fn = tn = 0
+    timings_us = []
+    for text, label in holdout:
+        started = time.perf_counter()
+        refused = gate.check(text) is not None
+        timings_us.append((time.perf_counter() - started) * 1e6)
+        if refused and label:
+            tp += 1
+        elif refused:
+            fp += 1
+        elif label:
+            fn += 1
+        else:
+            tn += 1
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    gate_ms = sum(timings_us) / len(timings_us) / 1000 if timings_us else 0.0
+    off_topic = tp + fn
+    return {
+        "threshold": gate.threshold,
+        "holdout": {"off_topic": off_topic, "in_topic": fp + tn},
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        # biaya: pertanyaan PMB valid yang ditolak (bukan penghematan, jawaban hilang)
+        "false_refusals": fp,
+        "false_refusal_rate": round(fp / (fp + tn), 4) if fp + tn else 0.0,
+        "gate_latency_us": percentiles([round(t, 1) for t in timings_us]),
+        "generation_ms": generation_ms,
+        # per pertanyaan off-topic: generate dihindari, dibayar dengan waktu gate
+        "saved_ms_per_off_topic_request": round(recall * generation_ms - gate_ms, 2),
+        # per request rata-rata di hold-out: semua request membayar gate, hanya off-topic yang
+        # ditolak dengan benar dihitung hemat (salah tolak dilaporkan terpisah sebagai biaya)
+        "saved_ms_per_request": round((tp * generation_ms) / len(holdout) - gate_ms, 2) if holdout else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gate pertanyaan di luar topik PMB")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="Latih gate dari seluruh data")
+    bench = sub.add_parser("bench", help="Latih di split train, ukur di hold-out")
+    bench.add_argument("--generation-ms", type=float,
+                       help=f"Latency generate pembanding (default: p50 eval_report.json atau {DEFAULT_GENERATION_MS})")
+    check = sub.add_parser("check", help="Cek pertanyaan dengan gate tersimpan")
+    check.add_argument("questions", nargs="+")
+    for p in (train, bench, check):
+        p.add_argument("--gate-file", default=GATE_FILE)
+        p.add_argument("--threshold", type=float, default=None)
+    args = parser.parse_args()
+    threshold = args.threshold if args.threshold is not None else DEFAULT_THRESHOLD
+
+    if args.command == "check":
+        gate = TopicGate.load(args.gate_file, args.threshold)
+        for question in args.questions:
+            started = time.perf_counter()
+            prob = gate.probability(question)
+            result = gate.check(question)
+            elapsed_us = (time.perf_counter() - started) * 1e6
+            status = "🚫 ditolak" if result else "✅ diteruskan"
+            print(f"{status} ({prob:.3f}, {elapsed_us:.0f} µs) {question}")
+            if result:
+                print(f"   {result['answer']}")
+        return
+
+    samples, refusals = load_training_data()
+    n_off = sum(label for _, label in samples)
+    print(f"📖 {len(samples)} pertanyaan ({n_off} off-topic, {len(samples) - n_off} in-topic)")
+
+    if args.command == "train":
+        started = time.perf_counter()
+        gate = TopicGate.train(samples, refusals, threshold=threshold)
+        gate.save(args.gate_file)
+        print(f"✅ Gate dilatih dalam {time.perf_counter() - started:.1f}s -> {args.gate_file}")
+        return
+
+    train_set, holdout = split_holdout(samples)
+    gate = TopicGate.train(train_set, {q: a for q, a in refusals.items()}, threshold=threshold)
+    generation_ms = args.generation_ms or reference_generation_ms() or DEFAULT_GENERATION_MS
+    result = benchmark(gate, holdout, generation_ms)
+
+    print(f"\n📊 Hold-out: {result['holdout']['off_topic']} off-topic, {result['holdout']['in_topic']} in-topic "
+          f"(threshold {result['threshold']})")
+    print(f"  • Precision: {result['precision']:.4f}")
+    print(f"  • Recall:    {result['recall']:.4f}")
+    print(f"  • F1:        {result['f1']:.4f}")
+    print(f"  • Salah tolak (in-topic): {result['false_refusals']} "
+          f"({result['false_refusal_rate'] * 100:.2f}% pertanyaan PMB valid tidak dijawab)")
+    lat = result["gate_latency_us"]
+    print(f"  • Latency gate p50/p99: {lat['p50']} / {lat['p99']} µs")
+    print(f"  • Hemat per request off-topic: {result['saved_ms_per_off_topic_request']} ms "
+          f"(generate {generation_ms:g} ms)")
+    print(f"  • Hemat rata-rata per request hold-out: {result['saved_ms_per_request']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Filter kualitas parafrase di variants/variations_q*_styled.json
+
+Per item (pertanyaan dasar + variasinya), semua teks di-embed dalam satu batch, lalu:
+    1. drift     : variasi dengan cosine ke pertanyaan dasar < --min-similarity dibuang
+    2. redundan  : variasi dipilih greedy max-marginal-relevance (MMR); kandidat yang
+                   cosine-nya ke teks terpilih (termasuk pertanyaan dasar) > --max-redundancy dibuang
+File input yang isinya identik (mis. "variations_q29_styled copy.json") hanya diproses sekali.
+
+Hasil: file variasi terfilter dengan nama sama di --output-dir + laporan JSON,
+siap dikonversi dengan convert_all.py.
+
+Usage:
+    python variant_filter.py
+    python variant_filter.py --embedder hashing --min-similarity 0.5 --max-redundancy 0.9
+    cd variants_filtered && python ../convert_all.py
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from convert_all import load_variant_file, unique_files
+from embedding_cache import normalize_text
+from retrieval import DEFAULT_EMBEDDER, HashingEmbedder, encode_texts, load_embedder
+
+INPUT_PATTERN = "variants/variations_q*_styled.json"
+OUTPUT_DIR = "variants_filtered"
+REPORT_FILE = "variant_filter_report.json"
+MIN_SIMILARITY = 0.6
+MAX_REDUNDANCY = 0.95
+MMR_LAMBDA = 0.7
+
+
+def variation_question(variation) -> str:
+    return (variation.get("question", "") if isinstance(variation, dict) else variation).strip()
+
+
+def mmr_select(base_sim: np.ndarray, pair_sim: np.ndarray, candidates: List[int],
+               max_redundancy: float, mmr_lambda: float = MMR_LAMBDA):
+    """
+    Greedy MMR atas kandidat (indeks ke pair_sim, 0 = pertanyaan dasar yang selalu terpilih)
+    Return (terpilih sesuai urutan MMR, [(dibuang, skor redundansi)])
+    """
+    selected = [0]
+    kept, dropped = [], []
+    remaining = list(candidates)
+    while remaining:
+        redundancy = pair_sim[np.ix_(remaining, selected)].max(axis=1)
+        scores = mmr_lambda * base_sim[remaining] - (1 - mmr_lambda) * redundancy
+        best = int(np.argmax(scores))
+        idx = remaining.pop(best)
+        if redundancy[best] > max_redundancy:
+            dropped.append((idx, float(redundancy[best])))
+        else:
+            kept.append(idx)
+            selected.append(idx)
+    return kept, dropped
+
+
+def filter_item(item: Dict, vectors: np.ndarray, min_similarity: float, max_redundancy: float,
+                min_keep: int = 1) -> Dict:
+    """
+    vectors: embedding ter-normalisasi [pertanyaan dasar, variasi...]
+    Return {"item": item terfilter, "drift": [...], "redundant": [...]}
+    """
+    variations = item.get("variations", [])
+    pair_sim = vectors @ vectors.T
+    base_sim = pair_sim[0]
+
+    # indeks 1..n = variasi; duplikat persis (setelah normalisasi) langsung dianggap redundan
+    seen = {normalize_text(item.get("question", "")).lower()}
+    candidates, drift, redundant = [], [], []
+    for i, variation in enumerate(variations, start=1):
+        key = normalize_text(variation_question(variation)).lower()
+        if not key or key in seen:
+            redundant.append((i, 1.0))
+            continue
+        seen.add(key)
+        if base_sim[i] < min_similarity:
+            drift.append((i, float(base_sim[i])))
+        else:
+            candidates.append(i)
+
+    # jangan sampai item kehilangan semua variasi: ambil kembali yang paling mirip
+    if len(candidates) < min_keep and drift:
+        drift.sort(key=lambda x: -x[1])
+        rescued = drift[:min_keep - len(candidates)]
+        drift = drift[len(rescued):]
+        candidates.extend(i for i, _ in rescued)
+
+    kept, mmr_dropped = mmr_select(base_sim, pair_sim, candidates, max_redundancy)
+    redundant.extend(mmr_dropped)
+
+    filtered = dict(item)
+    filtered["variations"] = [variations[i - 1] for i in sorted(kept)]
+
+    def describe(entries):
+        return [{"question": variation_question(variations[i - 1]), "score": round(score, 4)} for i, score in entries]
+
+    return {"item": filtered, "drift": describe(drift), "redundant": describe(redundant)}
+
+
+def filter_files(paths: List[str], output_dir: str, embedder_id: str, min_similarity: float,
+                 max_redundancy: float, min_keep: int = 1) -> Dict:
+    paths = unique_files(paths)
+    loaded = [(path, load_variant_file(path)) for path in paths]
+
+    # satu batch embedding untuk semua pertanyaan dasar + variasi di semua file
+    texts = []
+    for _, items in loaded:
+        for item in items:
+            texts.append(item.get("question", ""))
+            texts.extend(variation_question(v) for v in item.get("variations", []))
+    unique_texts = list(dict.fromkeys(texts))
+
+    name = HashingEmbedder().name if embedder_id.startswith("hashing") else embedder_id
+    started = time.perf_counter()
+    embedder = load_embedder(name)
+    matrix = encode_texts(unique_texts, embedder, name) if unique_texts else np.zeros((0, 0))
+    row = {text: i for i, text in enumerate(unique_texts)}
+    embed_s = time.perf_counter() - started
+
+    os.makedirs(output_dir, exist_ok=True)
+    report = {"files": [], "totals": {"items": 0, "records_before": 0, "records_after": 0, "drift": 0, "redundant": 0}}
+    totals = report["totals"]
+    for path, items in loaded:
+        filtered_items, file_report = [], {"file": path, "items": []}
+        for item in items:
+            item_texts = [item.get("question", "")] + [variation_question(v) for v in item.get("variations", [])]
+            vectors = matrix[[row[t] for t in item_texts]]
+            result = filter_item(item, vectors, min_similarity, max_redundancy, min_keep)
+            filtered_items.append(result["item"])
+
+            before = 1 + len(item.get("variations", []))
+            after = 1 + len(result["item"]["variations"])
+            totals["items"] += 1
+            totals["records_before"] += before
+            totals["records_after"] += after
+            totals["drift"] += len(result["drift"])
+            totals["redundant"] += len(result["redundant"])
+            file_report["items"].append({
+                "question": item.get("question", ""), "before": before, "after": after,
+                "drift": result["drift"], "redundant": result["redundant"],
+            })
+
+        output = os.path.join(output_dir, os.path.basename(path))
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(filtered_items[0] if len(filtered_items) == 1 else filtered_items, f, ensure_ascii=False, indent=2)
+        report["files"].append(file_report)
+
+    report["settings"] = {
+        "embedder": name, "min_similarity": min_similarity, "max_redundancy": max_redundancy,
+        "min_keep": min_keep, "files": len(paths), "embed_seconds": round(embed_s, 2),
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter parafrase drift/redundan di file variasi")
+    parser.add_argument("--input-pattern", default=INPUT_PATTERN)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--report", default=REPORT_FILE)
+    parser.add_argument("--embedder", default=DEFAULT_EMBEDDER, help="Model sentence-transformers atau 'hashing'")
+    parser.add_argument("--min-similarity", type=float, default=MIN_SIMILARITY, help="Cosine minimum ke pertanyaan dasar")
+    parser.add_argument("--max-redundancy", type=float, default=MAX_REDUNDANCY, help="Cosine maksimum antar variasi")
+    parser.add_argument("--min-keep", type=int, default=1, help="Variasi minimum yang dipertahankan per item")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.input_pattern))
+    print(f"📂 {len(paths)} file variasi dari {args.input_pattern}")
+    report = filter_files(paths, args.output_dir, args.embedder, args.min_similarity, args.max_redundancy, args.min_keep)
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    totals = report["totals"]
+    before, after = totals["records_before"], totals["records_after"]
+    print(f"\n📊 {totals['items']} pertanyaan dasar (semua tetap ada), {report['settings']['files']} file unik")
+    print(f"  • Record sebelum: {before}")
+    print(f"  • Record sesudah: {after} (-{(1 - after / before) * 100 if before else 0:.1f}% waktu per epoch)")
+    print(f"  • Dibuang karena drift (< {args.min_similarity}): {totals['drift']}")
+    print(f"  • Dibuang karena redundan (> {args.max_redundancy}): {totals['redundant']}")
+    print(f"\n💾 File terfilter: {args.output_dir}/   Laporan: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
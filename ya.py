@@ -1,16 +1,20 @@
-import json, glob
+import glob
+
+from jsonl_io import JsonlWriter, iter_batches, iter_records
+from profiling import RunProfiler
 
 # Gabungkan semua file JSON batch kamu
 files = glob.glob("dataset.json")  # atau pakai "datasets_unsiq/*.json" jika banyak file
-merged = []
-
-for f in files:
-    with open(f, encoding="utf-8") as infile:  # tambahkan encoding UTF-8
-        merged.extend(json.load(infile))
 
-# Tulis ke JSONL untuk training
-with open("unsiq_full.jsonl", "w", encoding="utf-8") as f:
-    for d in merged:
-        f.write(json.dumps(d, ensure_ascii=False) + "\n")
+# Tulis ke JSONL untuk training (streaming, tanpa menampung semua record)
+# Run report: run_reports/ya.json
+with RunProfiler.from_args("ya") as profiler:
+    with JsonlWriter("unsiq_full.jsonl") as sink:
+        for f in files:
+            profiler.add_file(f"input:{f}", f)
+            for batch in profiler.iter("parse", iter_batches(iter_records(f)), len):
+                with profiler.stage("write", records=len(batch)):
+                    sink.write_all(batch)
 
-print("✅ Dataset lengkap siap training: unsiq_full.jsonl")
+    print("✅ Dataset lengkap siap training: unsiq_full.jsonl")
+    profiler.add_file("output", "unsiq_full.jsonl")